@@ -8,10 +8,11 @@ import os
 import cv2
 import base64
 import numpy as np
-import json
 import time
+import uuid
 import csv
 import sys
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
 from flask import Flask, request, jsonify, send_from_directory, render_template_string, redirect, send_file, abort
@@ -20,7 +21,23 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
-from threading import Lock
+from threading import Lock, Thread
+
+from inference_batcher import MicroBatcher
+from image_io import AsyncFileWriter, decode_image_bytes
+from prediction_cache import PredictionCache, content_digest
+from model_registry import ModelRegistry, load_model
+from stage_timing import StageTimer
+from job_queue import JobQueue
+from openness_store import OpennessStore, extraction_tag
+import blink_analysis
+from cataract_features import default_engine as cataract_metric_engine, roi_sweep, DEFAULT_SWEEP_SCALES, DEFAULT_SWEEP_OFFSETS
+from cataract_inference import (
+    ARTIFACTS_DIR as CATARACT_ARTIFACTS_DIR,
+    preprocess_for_mobilenet,
+    probs_to_prediction,
+    is_cataract_risk_label,
+)
 
 # ============== APP SETUP ==============
 BASE_DIR = Path(__file__).resolve().parent
@@ -33,6 +50,31 @@ app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max
 app.config['UPLOAD_FOLDER'] = str(PROJECT_DIR / 'uploads')
 
 CORS(app)
+
+# Per-stage latency spans (p50/p95/p99 at /api/stats/latency, per-request
+# breakdown in the Server-Timing response header). NAYAN_STAGE_TIMING=0 disables.
+stage_timer = StageTimer(
+    window=int(os.environ.get('NAYAN_TIMING_WINDOW', '2048')),
+    enabled=os.environ.get('NAYAN_STAGE_TIMING', '1') == '1',
+)
+
+
+@app.before_request
+def _begin_stage_timing():
+    request.environ['nayan.t0'] = time.perf_counter()
+    stage_timer.begin_request()
+
+
+@app.after_request
+def _add_server_timing(response):
+    spans = stage_timer.end_request()
+    if spans:
+        total_ms = (time.perf_counter() - request.environ['nayan.t0']) * 1000.0
+        stage_timer.record(f'request.{request.endpoint}', total_ms)
+        spans.append(('total', total_ms))
+        response.headers['Server-Timing'] = StageTimer.server_timing_header(spans)
+    return response
+
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
@@ -42,110 +84,220 @@ socketio = SocketIO(
 
 # ============== CATARACT (DL MODEL) ==============
 # Lazily loaded so the server can still start even if TensorFlow isn't installed.
-_CATARACT_MODEL = None
-_CATARACT_CLASS_NAMES = None
+# NAYAN_CATARACT_BACKEND selects the engine: keras (default), tflite, onnx or auto.
+# tflite/onnx serve predictions without importing TensorFlow at all.
+CATARACT_BACKEND = os.environ.get('NAYAN_CATARACT_BACKEND', 'keras')
 _cataract_model_lock = Lock()
 
+# Model registry: live / previous / candidate versions for hot-swap and rollback
+# (see /api/models/cataract). NAYAN_SHADOW_FRACTION of live predictions are also
+# scored by a staged candidate on a background thread, for agreement stats.
+_cataract_models = ModelRegistry(
+    shadow_fraction=float(os.environ.get('NAYAN_SHADOW_FRACTION', '0')),
+    shadow_queue_size=int(os.environ.get('NAYAN_SHADOW_QUEUE', '32')),
+)
+
+# Micro-batching: concurrent uploads share one forward pass.
+# NAYAN_BATCH_MAX_SIZE=1 (or NAYAN_BATCHING=0) restores one predict() per request.
+CATARACT_BATCHING = os.environ.get('NAYAN_BATCHING', '1') == '1'
+CATARACT_BATCH_MAX_SIZE = int(os.environ.get('NAYAN_BATCH_MAX_SIZE', '8'))
+CATARACT_BATCH_MAX_WAIT_MS = float(os.environ.get('NAYAN_BATCH_MAX_WAIT_MS', '5'))
+
+# Eager warm-up: load the model on a background thread at boot and run a few dummy
+# predictions so the first real upload doesn't pay for import/load/graph tracing.
+CATARACT_WARMUP = os.environ.get('NAYAN_MODEL_WARMUP', '1') == '1'
+CATARACT_WARMUP_RUNS = int(os.environ.get('NAYAN_WARMUP_RUNS', '3'))
+
+# Model lifecycle for /api/ready: not_loaded -> loading -> loaded -> warming -> ready (or failed)
+_cataract_model_status = {
+    'state': 'not_loaded',
+    'backend': CATARACT_BACKEND,
+    'model_version': None,
+    'load_seconds': None,
+    'warmup_ms': [],
+    'error': None,
+    'ready_at': None,
+}
+_cataract_status_lock = Lock()
+
+
+def _set_cataract_model_status(**fields):
+    with _cataract_status_lock:
+        _cataract_model_status.update(fields)
+
+
+def get_cataract_model_status() -> dict:
+    with _cataract_status_lock:
+        status = dict(_cataract_model_status)
+        status['warmup_ms'] = list(status['warmup_ms'])
+    return status
+
+
+# Reduced-resolution decode for DL inputs that arrive as bytes or a path (feature
+# cache hits): oversized phone JPEGs are decoded at 1/2, 1/4 or 1/8 scale, keeping
+# the shorter side >= this many pixels (e.g. 640 still covers the 224 px model
+# input). 0 = full decode (default). A fresh upload is decoded once at full
+# resolution, since contrast / sharpness / edge need it, and the DL stage reuses that frame.
+CATARACT_DECODE_MIN_SIDE = int(os.environ.get('NAYAN_DECODE_MIN_SIDE', '0'))
+
+# Content-hash cache: byte-identical re-uploads reuse features + DL output.
+# DL entries are keyed by the model fingerprint, so a new artifact never hits stale rows;
+# only full-resolution DL results are cached.
+# Bump CATARACT_FEATURES_VERSION whenever extract_cataract_features changes its output.
+CATARACT_FEATURES_VERSION = 'v3'
+_prediction_cache = PredictionCache(
+    os.environ.get('NAYAN_CACHE_DB', str(BASE_DIR / 'prediction_cache.db')),
+    max_entries=int(os.environ.get('NAYAN_CACHE_MAX_ENTRIES', '1024')),
+    enabled=os.environ.get('NAYAN_CACHE', '1') == '1',
+)
 
-def _load_cataract_dl_model():
-    """Load cataract DL model + labels once (thread-safe)."""
-    global _CATARACT_MODEL, _CATARACT_CLASS_NAMES
 
-    if _CATARACT_MODEL is not None and _CATARACT_CLASS_NAMES is not None:
+def _load_cataract_dl_model():
+    """Load the boot cataract DL model + labels into the registry once (thread-safe)."""
+    if _cataract_models.live is not None:
         return
 
     with _cataract_model_lock:
-        if _CATARACT_MODEL is not None and _CATARACT_CLASS_NAMES is not None:
+        if _cataract_models.live is not None:
             return
 
-        # If you faced Windows Keras 3 overflow issues, keep this ON.
-        # Must be set before importing TensorFlow in some environments.
-        os.environ.setdefault("TF_USE_LEGACY_KERAS", "1")
-
+        _set_cataract_model_status(state='loading', error=None)
         try:
-            import tensorflow as tf  # type: ignore
+            model = load_model(CATARACT_BACKEND, CATARACT_ARTIFACTS_DIR, warmup_runs=0)
         except Exception as e:
-            raise RuntimeError(
-                "TensorFlow is not installed (required for DL cataract). "
-                "Install backend requirements and try again. "
-                f"Original error: {e}"
-            )
+            _set_cataract_model_status(state='failed', error=str(e))
+            raise
+
+        _cataract_models.set_live(model)
+        print(f"Cataract model version: {model.version}")
+        _set_cataract_model_status(
+            state='loaded',
+            backend=model.backend.name,
+            model_version=model.version,
+            load_seconds=model.load_seconds,
+        )
+        _prediction_cache.invalidate_other_versions('dl', model.version)
 
-        artifacts_dir = BASE_DIR / 'catract' / 'artifacts'
-        labels_path = artifacts_dir / 'labels.json'
 
-        if not labels_path.exists():
-            raise FileNotFoundError(f"labels.json not found at: {labels_path}")
+def _predict_cataract_batch(x: np.ndarray) -> np.ndarray:
+    """Run one forward pass of the live model over an (N, 224, 224, 3) float32 batch."""
+    return _cataract_models.live.predict_batch(x)
 
-        # Try loading .h5 first (more stable), then .keras
-        model_path_h5 = artifacts_dir / 'cataract_mobilenetv2.h5'
-        model_path_keras = artifacts_dir / 'cataract_mobilenetv2.keras'
-        
-        model_loaded = False
-        last_error = None
-        
-        # Try .h5 format first
-        if model_path_h5.exists():
-            try:
-                print(f"Loading model from {model_path_h5}")
-                _CATARACT_MODEL = tf.keras.models.load_model(str(model_path_h5), compile=False)
-                model_loaded = True
-                print("Successfully loaded .h5 model")
-            except Exception as e:
-                print(f"Failed to load .h5 model: {e}")
-                last_error = e
-        
-        # Try .keras format if .h5 failed or doesn't exist
-        if not model_loaded and model_path_keras.exists():
-            try:
-                print(f"Loading model from {model_path_keras}")
-                _CATARACT_MODEL = tf.keras.models.load_model(str(model_path_keras), compile=False)
-                model_loaded = True
-                print("Successfully loaded .keras model")
-            except Exception as e:
-                print(f"Failed to load .keras model: {e}")
-                last_error = e
-        
-        if not model_loaded:
-            error_msg = f"Could not load model. Tried: {model_path_h5}, {model_path_keras}"
-            if last_error:
-                error_msg += f". Last error: {last_error}"
-            raise FileNotFoundError(error_msg)
-
-        _CATARACT_CLASS_NAMES = json.loads(labels_path.read_text(encoding='utf-8')).get('class_names')
-        if not _CATARACT_CLASS_NAMES:
-            raise ValueError("labels.json missing 'class_names'")
-
-
-def _preprocess_for_cataract_mobilenet(frame_bgr: np.ndarray) -> np.ndarray:
-    """Match preprocessing from backend/catract/mobile_cataract_server_dl.py.
-
-    IMPORTANT: model already applies preprocess_input internally.
-    Feed raw RGB in [0, 255] as float32.
-    """
-    rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    rgb = cv2.resize(rgb, (224, 224), interpolation=cv2.INTER_AREA)
-    x = rgb.astype(np.float32)
-    return np.expand_dims(x, axis=0)
+
+_cataract_batcher = MicroBatcher(
+    _predict_cataract_batch,
+    max_batch_size=CATARACT_BATCH_MAX_SIZE,
+    max_wait_ms=CATARACT_BATCH_MAX_WAIT_MS,
+    name='cataract',
+)
 
 
-def predict_cataract_dl(image_path: str):
-    """Return (pred_label, conf_percent, probs_map)."""
+def _as_bgr_frame(image, min_side=None):
+    """Accept a decoded BGR array, encoded image bytes or a file path."""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode_image_bytes(bytes(image), min_side=min_side)
+    try:
+        data = Path(image).read_bytes()
+    except OSError:
+        return None
+    return decode_image_bytes(data, min_side=min_side)
+
+
+def predict_cataract_dl(image, digest=None):
+    """Return (pred_label, conf_percent, probs_map, model_version).
+
+    `image` may be an already-decoded BGR array (preferred, avoids a second
+    decode), the raw upload bytes, or a path on disk. Pass `digest` (the
+    content hash of the upload bytes) to use the prediction cache with a
+    decoded array; bytes and paths are hashed here. `model_version` is the
+    fingerprint of the model snapshot that produced the label (also on cache
+    hits), even if the live model is swapped meanwhile.
+    """
     _load_cataract_dl_model()
+    # One consistent model for cache key, forward pass and class names, even if
+    # /api/models/cataract swaps the live model while this request is in flight.
+    generation, model = _cataract_models.snapshot()
 
-    frame = cv2.imread(image_path)
+    if digest is None and not isinstance(image, np.ndarray):
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = bytes(image)
+        else:
+            image = Path(image).read_bytes()
+        digest = content_digest(image)
+
+    if digest is not None:
+        cached = _prediction_cache.get('dl', digest, model.version)
+        if cached is not None:
+            return cached['label'], cached['confidence'], cached['probs'], model.version
+
+    # Bytes and paths may take the reduced decode; its output is not cached.
+    reduced = CATARACT_DECODE_MIN_SIDE if not isinstance(image, np.ndarray) else 0
+    frame = _as_bgr_frame(image, min_side=reduced)
     if frame is None:
         raise ValueError("Failed to read image")
 
-    x = _preprocess_for_cataract_mobilenet(frame)
-    probs = _CATARACT_MODEL.predict(x, verbose=0)[0]
+    with stage_timer.span('cataract.preprocess'):
+        x = preprocess_for_mobilenet(frame)
+    with stage_timer.span('cataract.model'):
+        if CATARACT_BATCHING:
+            probs = _cataract_batcher.predict(x[0])
+        else:
+            probs = model.predict_batch(x)[0]
+    if _cataract_models.generation != generation:
+        # A swap landed mid-flight and the batch may have run on the other model.
+        probs = model.predict_batch(x)[0]
+    _cataract_models.maybe_shadow(x, probs, model, tag=digest[:12] if digest else None)
+
+    pred_label, conf_percent, probs_map = probs_to_prediction(probs, model.class_names)
+    if digest is not None and not reduced:
+        _prediction_cache.put('dl', digest, model.version, {
+            'label': pred_label,
+            'confidence': conf_percent,
+            'probs': probs_map,
+        })
+    return pred_label, conf_percent, probs_map, model.version
+
+
+def warm_up_cataract_model(runs=CATARACT_WARMUP_RUNS):
+    """Load the model and push dummy images through the live prediction path."""
+    try:
+        _load_cataract_dl_model()
+    except Exception as e:
+        print(f"[WARMUP] Cataract model failed to load: {e}")
+        return
+
+    _set_cataract_model_status(state='warming')
+    dummy = np.zeros((1, 224, 224, 3), dtype=np.float32)
+    latencies = []
+    try:
+        for _ in range(max(1, runs)):
+            t0 = time.perf_counter()
+            if CATARACT_BATCHING:
+                _cataract_batcher.predict(dummy[0])
+            else:
+                _predict_cataract_batch(dummy)
+            latencies.append(round((time.perf_counter() - t0) * 1000.0, 2))
+        # Also trace the largest batch shape the batcher can produce.
+        if CATARACT_BATCHING and CATARACT_BATCH_MAX_SIZE > 1:
+            _predict_cataract_batch(np.repeat(dummy, CATARACT_BATCH_MAX_SIZE, axis=0))
+    except Exception as e:
+        print(f"[WARMUP] Cataract warm-up prediction failed: {e}")
+        _set_cataract_model_status(state='failed', error=str(e), warmup_ms=latencies)
+        return
+    finally:
+        # Dummy batches would skew the batch-size / latency figures in /api/stats/inference.
+        _cataract_batcher.reset_stats()
+
+    _set_cataract_model_status(state='ready', warmup_ms=latencies, ready_at=datetime.now().isoformat())
+    print(f"[WARMUP] Cataract model ready, warm-up latencies (ms): {latencies}")
 
-    idx = int(np.argmax(probs))
-    pred_label = str(_CATARACT_CLASS_NAMES[idx])
-    conf_percent = float(probs[idx]) * 100.0
 
-    probs_map = {str(_CATARACT_CLASS_NAMES[i]): float(probs[i]) for i in range(len(_CATARACT_CLASS_NAMES))}
-    return pred_label, conf_percent, probs_map
+def start_cataract_warmup() -> Thread:
+    thread = Thread(target=warm_up_cataract_model, name='cataract-warmup', daemon=True)
+    thread.start()
+    return thread
 
 
 # ============== FRONTEND SERVING (OPTIONAL) ==============
@@ -247,6 +399,9 @@ os.makedirs(PROJECT_DIR / 'uploads' / 'glaucoma', exist_ok=True)
 os.makedirs(PROJECT_DIR / 'uploads' / 'camera', exist_ok=True)
 os.makedirs(PROJECT_DIR / 'debug', exist_ok=True)
 
+# Uploads are written to disk in the background once they have been analysed.
+_upload_writer = AsyncFileWriter(max_workers=2, name='upload-writer')
+
 # Database
 DB_PATH = 'nayan_ai.db'
 db_lock = Lock()
@@ -292,9 +447,15 @@ def init_db():
             edge_strength REAL,
             label TEXT,
             confidence REAL,
+            model_version TEXT,
             timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(patient_id) REFERENCES patients(id)
         )''')
+        # Older databases predate model_version (written by uploads and rescore_cataract_uploads.py,
+        # which runs the same migration in ensure_model_version_column()).
+        cataract_columns = {row[1] for row in c.execute('PRAGMA table_info(cataract_results)')}
+        if 'model_version' not in cataract_columns:
+            c.execute('ALTER TABLE cataract_results ADD COLUMN model_version TEXT')
         
         # Dry eye screening results
         c.execute('''CREATE TABLE IF NOT EXISTS dryeye_results (
@@ -471,34 +632,15 @@ def get_patient(patient_id):
     return jsonify({'success': False, 'message': 'Patient not found'}), 404
 
 # ============== CATARACT SCREENING ==============
-def extract_cataract_features(image_path):
-    """Extract features from cataract image"""
-    frame = cv2.imread(image_path)
+def extract_cataract_features(image):
+    """Extract features from cataract image (BGR array, encoded bytes or path)"""
+    frame = _as_bgr_frame(image)
     if frame is None:
         return None
     
-    # Convert to grayscale
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Apply CLAHE
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    gray = clahe.apply(gray)
-    gray = cv2.GaussianBlur(gray, (5, 5), 0)
-    
-    # Extract ROI (center 25%)
-    h, w = gray.shape[:2]
-    rh, rw = int(h * 0.25), int(w * 0.25)
-    y1 = (h - rh) // 2
-    x1 = (w - rw) // 2
-    roi = gray[y1:y1+rh, x1:x1+rw]
-    
-    # Compute features
-    C = float(np.std(roi))  # Contrast
-    lap = cv2.Laplacian(roi, cv2.CV_64F)
-    S = float(lap.var())  # Sharpness
-    gx = cv2.Sobel(roi, cv2.CV_64F, 1, 0, ksize=3)
-    gy = cv2.Sobel(roi, cv2.CV_64F, 0, 1, ksize=3)
-    E = float(np.mean(np.sqrt(gx*gx + gy*gy)))  # Edge
+    # Contrast / sharpness / edge of the centre 25% ROI after CLAHE + blur.
+    # The engine only filters a tile-aligned crop around the ROI (see cataract_features.py).
+    C, S, E = cataract_metric_engine.compute(frame)
     
     # Classify
     Tc, Ts = 22.0, 120.0
@@ -542,33 +684,45 @@ def upload_cataract():
         cataract_dir = PROJECT_DIR / 'uploads' / 'cataract'
         os.makedirs(cataract_dir, exist_ok=True)
 
-        filename = secure_filename(f"cataract_{int(time.time())}.jpg")
+        # Millisecond time + random suffix: concurrent uploads never share a file
+        # (or a pending background write).
+        filename = secure_filename(f"cataract_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}.jpg")
         filepath = str(cataract_dir / filename)
         
-        print(f"[CATARACT] Saving file to: {filepath}")
-        file.save(filepath)
-        
-        # Verify file was saved
-        if not os.path.exists(filepath):
-            return jsonify({'success': False, 'message': f'Failed to save file to {filepath}'}), 500
-        
-        print(f"[CATARACT] File saved successfully, size: {os.path.getsize(filepath)} bytes")
+        with stage_timer.span('cataract.read'):
+            image_bytes = file.read()
+            digest = content_digest(image_bytes)
+        print(f"[CATARACT] Received {filename}, size: {len(image_bytes)} bytes")
         
         # Compute basic image metrics for the UI (contrast/sharpness) but use DL for classification.
-        print(f"[CATARACT] Computing image metrics from {filepath}")
-        features = extract_cataract_features(filepath)
-        if not features:
-            return jsonify({'success': False, 'message': 'Failed to process image. Image may be corrupted or unreadable.'}), 400
+        # A byte-identical earlier upload skips decoding entirely.
+        frame = None
+        with stage_timer.span('cataract.cache_lookup'):
+            features = _prediction_cache.get('features', digest, CATARACT_FEATURES_VERSION)
+        if features is None:
+            # Decode once, in memory, at full resolution; the metrics and the DL
+            # stage share this array.
+            with stage_timer.span('cataract.decode'):
+                frame = decode_image_bytes(image_bytes)
+            with stage_timer.span('cataract.features'):
+                features = extract_cataract_features(frame) if frame is not None else None
+            if not features:
+                return jsonify({'success': False, 'message': 'Failed to process image. Image may be corrupted or unreadable.'}), 400
+            _prediction_cache.put('features', digest, CATARACT_FEATURES_VERSION, features)
+        else:
+            print("[CATARACT] Metrics served from cache")
 
         print(f"[CATARACT] Metrics computed: {features}")
 
         # DL prediction (primary method)
         try:
-            print(f"[CATARACT] Running DL model on {filepath}")
-            pred_label, conf_percent, probs_map = predict_cataract_dl(filepath)
+            with stage_timer.span('cataract.inference'):
+                pred_label, conf_percent, probs_map, model_version = predict_cataract_dl(
+                    frame if frame is not None else image_bytes, digest=digest
+                )
 
             # Map model class name to UI label
-            is_risk = pred_label.strip().lower() == 'cataract'
+            is_risk = is_cataract_risk_label(pred_label)
             features['label'] = 'Possible Cataract Risk' if is_risk else 'Normal'
             features['confidence'] = conf_percent
             features['dl_pred_label'] = pred_label
@@ -586,15 +740,19 @@ def upload_cataract():
                 'message': f'Deep Learning model unavailable. Please contact administrator. Error: {str(dl_error)}'
             }), 503
         
+        # Persist the original upload bytes off the critical path.
+        with stage_timer.span('cataract.persist'):
+            _upload_writer.write(filepath, image_bytes)
+        
         # Save to database
-        with db_lock:
+        with stage_timer.timed_lock(db_lock, 'cataract.db_lock_wait'), stage_timer.span('cataract.db_insert'):
             conn = sqlite3.connect(DB_PATH)
             c = conn.cursor()
             c.execute('''INSERT INTO cataract_results 
-                        (patient_id, image_file, contrast, sharpness, edge_strength, label, confidence)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                        (patient_id, image_file, contrast, sharpness, edge_strength, label, confidence, model_version)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
                      (patient_id, filename, features['contrast'], features['sharpness'],
-                      features['edge'], features['label'], features['confidence']))
+                      features['edge'], features['label'], features['confidence'], model_version))
             conn.commit()
             result_id = c.lastrowid
             conn.close()
@@ -615,10 +773,157 @@ def upload_cataract():
         print(f"[CATARACT] Error: {error_msg}")
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
+def _parse_float_list(value, default):
+    if not value:
+        return default
+    return tuple(float(v) for v in value.split(',') if v.strip())
+
+
+@app.route('/api/cataract/roi-sweep', methods=['POST'])
+def cataract_roi_sweep():
+    """Contrast / sharpness / edge over a grid of ROI scales and offsets (calibration aid).
+
+    Form fields: image (file), optional scales="0.2,0.25,0.3", offsets="-0.05,0,0.05"
+    (fractions of the frame size, applied to both axes) and border=reflect|interior.
+    Nothing is stored.
+    """
+    if 'image' not in request.files:
+        return jsonify({'success': False, 'message': 'No image file in request'}), 400
+    try:
+        scales = _parse_float_list(request.form.get('scales'), DEFAULT_SWEEP_SCALES)
+        offsets = _parse_float_list(request.form.get('offsets'), DEFAULT_SWEEP_OFFSETS)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'scales/offsets must be comma-separated numbers'}), 400
+    if not all(0.0 < sc <= 1.0 for sc in scales):
+        return jsonify({'success': False, 'message': 'scales must be in (0, 1]'}), 400
+    border = request.form.get('border', 'reflect')
+    if border not in ('reflect', 'interior'):
+        return jsonify({'success': False, 'message': "border must be 'reflect' or 'interior'"}), 400
+
+    with stage_timer.span('cataract.decode'):
+        frame = decode_image_bytes(request.files['image'].read())
+    if frame is None:
+        return jsonify({'success': False, 'message': 'Failed to read image'}), 400
+
+    with stage_timer.span('cataract.roi_sweep'):
+        results = roi_sweep(frame, scales, offsets, border=border)
+    return jsonify({
+        'success': True,
+        'image_size': [int(frame.shape[1]), int(frame.shape[0])],
+        'count': len(results),
+        'results': results
+    }), 200
+
 # ============== DRY EYE SCREENING ==============
+# Video analysis runs as a background job: the upload answers 202 + job_id and
+# clients poll /api/dryeye/jobs/<job_id> or subscribe over Socket.IO
+# ('subscribe_job' -> 'dryeye_job_progress' / 'dryeye_job_done' / 'dryeye_job_failed').
+DRYEYE_WORKERS = int(os.environ.get('NAYAN_DRYEYE_WORKERS', '2'))
+DRYEYE_SYNC_TIMEOUT = float(os.environ.get('NAYAN_DRYEYE_SYNC_TIMEOUT', '300'))
+# Each video can be decoded/scored in time segments across this many processes
+# (1 = sequential, in the job thread, the default; 0 = one per CPU, up to 8).
+# Opt-in: spawn workers re-import the main module, so under `python app.py`
+# every worker also runs this file's start-up (DB init, caches, model registry).
+DRYEYE_PROCESSES = int(os.environ.get('NAYAN_DRYEYE_PROCESSES', '1')) or min(8, os.cpu_count() or 1)
+# Frame sampling: grab (default; skipped frames are never converted), seek or read.
+DRYEYE_SAMPLING = os.environ.get('NAYAN_DRYEYE_SAMPLING', blink_analysis.SAMPLING_MODE)
+# Decoded, pre-cropped ROIs a decoder thread may buffer ahead of scoring (0 = decode inline).
+DRYEYE_DECODE_QUEUE = int(os.environ.get('NAYAN_DRYEYE_DECODE_QUEUE', str(blink_analysis.DECODE_QUEUE)))
+# Eye-openness signal: canny (default), projection, vgrad or framediff (see blink_analysis.OPENNESS_METRICS).
+DRYEYE_METRIC = os.environ.get('NAYAN_DRYEYE_METRIC', blink_analysis.OPENNESS_METRIC)
+# Per-frame openness series are kept (float32 .npy per video) for offline
+# threshold re-tuning with retune_dryeye.py. NAYAN_STORE_SERIES=0 disables.
+_openness_store = (
+    OpennessStore(os.environ.get('NAYAN_SERIES_DIR', str(BASE_DIR / 'openness_series')),
+                  tag=extraction_tag(DRYEYE_METRIC))
+    if os.environ.get('NAYAN_STORE_SERIES', '1') == '1' else None
+)
+# Stop decoding once the screening label can no longer change (or the video has
+# no usable signal); the stored metrics then cover the analysed part only.
+# Off by default while series are stored: re-tuning needs whole videos.
+DRYEYE_ADAPTIVE = os.environ.get('NAYAN_DRYEYE_ADAPTIVE', '0' if _openness_store is not None else '1') == '1'
+
+
+def _job_room(job_id):
+    return f'job:{job_id}'
+
+
+def _emit_dryeye_job(event, job):
+    event = event if event in ('done', 'failed') else 'progress'
+    socketio.emit(f'dryeye_job_{event}', _public_job(job), to=_job_room(job['job_id']))
+
+
+def _public_job(job):
+    """Job snapshot as returned to clients (no internal fields)."""
+    return {
+        'job_id': job['job_id'],
+        'state': job['state'],
+        'progress': job['progress'],
+        'info': job['info'],
+        'result': job['result'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at'],
+    }
+
+
+_dryeye_jobs = JobQueue(max_workers=DRYEYE_WORKERS, name='dryeye', on_update=_emit_dryeye_job)
+
+
+def _run_dryeye_job(report, patient_id, filepath, filename):
+    """Worker: analyse the saved video and store the result row."""
+    with stage_timer.span('dryeye.analyze'):
+        if DRYEYE_PROCESSES > 1:
+            out = blink_analysis.analyze_video_parallel(
+                Path(filepath), workers=DRYEYE_PROCESSES, progress=report, store=_openness_store,
+                sampling=DRYEYE_SAMPLING, adaptive=DRYEYE_ADAPTIVE, queue_size=DRYEYE_DECODE_QUEUE,
+                metric=DRYEYE_METRIC,
+            )
+        else:
+            out = blink_analysis.analyze_video(
+                Path(filepath), progress=report, store=_openness_store, sampling=DRYEYE_SAMPLING,
+                adaptive=DRYEYE_ADAPTIVE, queue_size=DRYEYE_DECODE_QUEUE, metric=DRYEYE_METRIC,
+            )
+    return _store_dryeye_result(patient_id, filename, out, f'/uploads/dryeye/{filename}')
+
+
+def _store_dryeye_result(patient_id, video_file, out, video_url):
+    """Insert a dryeye_results row for an analysis result and return the API payload."""
+    with stage_timer.timed_lock(db_lock, 'dryeye.db_lock_wait'), stage_timer.span('dryeye.db_insert'):
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+        c.execute('''INSERT INTO dryeye_results 
+                    (patient_id, video_file, duration_sec, blink_count, 
+                     blink_rate_bpm, mean_ibi_sec, max_ibi_sec, max_eye_open_sec, label)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                 (patient_id, video_file, out['duration_sec'], out['blink_count'], out['blink_rate_bpm'],
+                  out['mean_ibi_sec'], out['max_ibi_sec'], out['max_eye_open_sec'], out['label']))
+        conn.commit()
+        result_id = c.lastrowid
+        conn.close()
+
+    return {
+        'result_id': result_id,
+        'analysis': {
+            'duration_sec': round(out['duration_sec'], 2),
+            'blink_count': out['blink_count'],
+            'blink_rate_bpm': round(out['blink_rate_bpm'], 2),
+            'mean_ibi_sec': round(out['mean_ibi_sec'], 2),
+            'max_ibi_sec': round(out['max_ibi_sec'], 2),
+            'max_eye_open_sec': round(out['max_eye_open_sec'], 2),
+            'label': out['label'],
+            'stop_reason': out['stop_reason']
+        },
+        'video_url': video_url
+    }
+
+
 @app.route('/api/dryeye/upload', methods=['POST'])
-def upload_dryeye():
-    """Upload dry eye video and analyze"""
+def upload_dryeye(wait=False):
+    """Upload dry eye video and queue its blink analysis (202 + job_id).
+
+    ?wait=1 blocks until the analysis is finished and returns the result (200).
+    """
     patient_id = request.form.get('patient_id')
     
     if 'video' not in request.files or not patient_id:
@@ -629,59 +934,44 @@ def upload_dryeye():
         return jsonify({'success': False, 'message': 'No file selected'}), 400
     
     try:
-        filename = secure_filename(f"dryeye_{int(time.time())}.mp4")
+        filename = secure_filename(f"dryeye_{int(time.time() * 1000)}.mp4")
         filepath = os.path.join('uploads/dryeye', filename)
-        file.save(filepath)
-        
-        # Analyze video (mock analysis for now)
-        cap = cv2.VideoCapture(filepath)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = frame_count / fps if fps > 0 else 0
-        cap.release()
-        
-        # Generate blink metrics (simulated)
-        blink_count = max(3, int(duration / 3))
-        blink_rate = (blink_count / duration * 60) if duration > 0 else 0
-        mean_ibi = duration / blink_count if blink_count > 0 else 0
-        max_ibi = mean_ibi * 1.5
-        max_eye_open = max_ibi * 0.8
-        
-        label = "Dry Eye Risk" if blink_rate < 10 or max_ibi > 10 else "Normal"
+        with stage_timer.span('dryeye.save'):
+            file.save(filepath)
         
-        # Save to database
-        with db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute('''INSERT INTO dryeye_results 
-                        (patient_id, video_file, duration_sec, blink_count, 
-                         blink_rate_bpm, mean_ibi_sec, max_ibi_sec, max_eye_open_sec, label)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                     (patient_id, filename, duration, blink_count, blink_rate,
-                      mean_ibi, max_ibi, max_eye_open, label))
-            conn.commit()
-            result_id = c.lastrowid
-            conn.close()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Dry eye analysis complete',
-            'result_id': result_id,
-            'analysis': {
-                'duration_sec': round(duration, 2),
-                'blink_count': blink_count,
-                'blink_rate_bpm': round(blink_rate, 2),
-                'mean_ibi_sec': round(mean_ibi, 2),
-                'max_ibi_sec': round(max_ibi, 2),
-                'max_eye_open_sec': round(max_eye_open, 2),
-                'label': label
-            },
-            'video_url': f'/uploads/dryeye/{filename}'
-        }), 200
-    
+        job_id = _dryeye_jobs.submit(
+            _run_dryeye_job, patient_id, filepath, filename,
+            meta={'patient_id': patient_id, 'video_file': filename},
+        )
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+    if wait or request.args.get('wait') == '1':
+        job = _dryeye_jobs.wait(job_id, timeout=DRYEYE_SYNC_TIMEOUT)
+        if job['state'] == 'done':
+            return jsonify({'success': True, 'message': 'Dry eye analysis complete', 'job_id': job_id,
+                            **job['result']}), 200
+        if job['state'] == 'failed':
+            return jsonify({'success': False, 'message': job['error'], 'job_id': job_id}), 500
+
+    return jsonify({
+        'success': True,
+        'message': 'Dry eye analysis queued',
+        'job_id': job_id,
+        'status_url': f'/api/dryeye/jobs/{job_id}',
+        'video_url': f'/uploads/dryeye/{filename}'
+    }), 202
+
+
+@app.route('/api/dryeye/jobs/<job_id>', methods=['GET'])
+def get_dryeye_job(job_id):
+    """Poll a dry eye analysis job (state: queued, running, done or failed)."""
+    job = _dryeye_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, **_public_job(job)}), 200
+
+
 # ============== GLAUCOMA SCREENING ==============
 @app.route('/api/glaucoma/measure', methods=['POST'])
 def glaucoma_measure():
@@ -708,7 +998,7 @@ def glaucoma_measure():
         risk_level = "High Risk"
     
     try:
-        with db_lock:
+        with stage_timer.timed_lock(db_lock, 'glaucoma.db_lock_wait'), stage_timer.span('glaucoma.db_insert'):
             conn = sqlite3.connect(DB_PATH)
             c = conn.cursor()
             c.execute('''INSERT INTO glaucoma_results 
@@ -781,7 +1071,7 @@ def generate_pdf_report(patient_id):
         from io import BytesIO
         
         # Get patient info
-        with db_lock:
+        with stage_timer.timed_lock(db_lock, 'pdf.db_lock_wait'), stage_timer.span('pdf.query'):
             conn = sqlite3.connect(DB_PATH)
             conn.row_factory = sqlite3.Row
             c = conn.cursor()
@@ -1034,7 +1324,8 @@ def generate_pdf_report(patient_id):
         story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", footer_style))
         
         # Build PDF
-        doc.build(story)
+        with stage_timer.span('pdf.build'):
+            doc.build(story)
         buffer.seek(0)
         
         # Send file
@@ -1066,7 +1357,7 @@ def generate_cataract_pdf(patient_id):
         from io import BytesIO
         
         # Get patient info and results
-        with db_lock:
+        with stage_timer.timed_lock(db_lock, 'pdf.db_lock_wait'), stage_timer.span('pdf.query'):
             conn = sqlite3.connect(DB_PATH)
             conn.row_factory = sqlite3.Row
             c = conn.cursor()
@@ -1181,7 +1472,8 @@ def generate_cataract_pdf(patient_id):
         story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", footer_style))
         
         # Build PDF
-        doc.build(story)
+        with stage_timer.span('pdf.build'):
+            doc.build(story)
         buffer.seek(0)
         
         filename = f"Cataract_Report_{patient['name']}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -1205,7 +1497,7 @@ def generate_dryeye_pdf(patient_id):
         from io import BytesIO
         
         # Get patient info and results
-        with db_lock:
+        with stage_timer.timed_lock(db_lock, 'pdf.db_lock_wait'), stage_timer.span('pdf.query'):
             conn = sqlite3.connect(DB_PATH)
             conn.row_factory = sqlite3.Row
             c = conn.cursor()
@@ -1320,7 +1612,8 @@ def generate_dryeye_pdf(patient_id):
         story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", footer_style))
         
         # Build PDF
-        doc.build(story)
+        with stage_timer.span('pdf.build'):
+            doc.build(story)
         buffer.seek(0)
         
         filename = f"DryEye_Report_{patient['name']}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -1344,7 +1637,7 @@ def generate_glaucoma_pdf(patient_id):
         from io import BytesIO
         
         # Get patient info and results
-        with db_lock:
+        with stage_timer.timed_lock(db_lock, 'pdf.db_lock_wait'), stage_timer.span('pdf.query'):
             conn = sqlite3.connect(DB_PATH)
             conn.row_factory = sqlite3.Row
             c = conn.cursor()
@@ -1459,7 +1752,8 @@ def generate_glaucoma_pdf(patient_id):
         story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", footer_style))
         
         # Build PDF
-        doc.build(story)
+        with stage_timer.span('pdf.build'):
+            doc.build(story)
         buffer.seek(0)
         
         filename = f"Glaucoma_Report_{patient['name']}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -1471,8 +1765,14 @@ def generate_glaucoma_pdf(patient_id):
         return jsonify({'success': False, 'message': f'Error generating PDF: {str(e)}'}), 500
 
 # ============== WEBSOCKET CAMERA STREAMING ==============
+# 'dryeye' streams are analysed as frames arrive: 'dryeye_live' carries the
+# running blink count / IBIs and 'dryeye_result' the stored result on stop_stream.
 active_streams = {}
 camera_lock = Lock()
+# Frames arrive as binary attachments (raw JPEG bytes, preferred) or as base64
+# data-URL strings (older clients); bytes received per transport are counted.
+_frame_transport = {t: {'frames': 0, 'bytes': 0} for t in ('binary', 'base64')}
+DRYEYE_LIVE_INTERVAL = float(os.environ.get('NAYAN_DRYEYE_LIVE_INTERVAL', '1.0'))  # seconds between updates
 
 @socketio.on('connect')
 def handle_connect():
@@ -1484,9 +1784,15 @@ def handle_connect():
 def handle_disconnect():
     """Handle WebSocket disconnection"""
     with camera_lock:
-        if request.sid in active_streams:
-            del active_streams[request.sid]
+        stream = active_streams.pop(request.sid, None)
     print(f"Client disconnected: {request.sid}")
+    # A dry eye stream that never sent stop_stream keeps what was analysed so far.
+    if stream is not None and stream['analyzer'] is not None:
+        try:
+            saved = _finish_dryeye_stream(stream, stop_reason='disconnected')
+            print(f"[DRYEYE] Stream of {request.sid} disconnected; result_id={saved['result_id']}")
+        except Exception as e:
+            print(f"[DRYEYE] Result of disconnected stream {request.sid} lost: {e}")
 
 @socketio.on('start_stream')
 def handle_start_stream(data):
@@ -1499,48 +1805,154 @@ def handle_start_stream(data):
             'patient_id': patient_id,
             'stream_type': stream_type,
             'started_at': time.time(),
-            'frame_count': 0
+            'frame_count': 0,
+            'analyzer': blink_analysis.StreamingBlinkAnalyzer(
+                metric=DRYEYE_METRIC, keep_series=_openness_store is not None
+            ) if stream_type == 'dryeye' else None,
+            'last_live': 0.0,
         }
     
     print(f"Stream started: {stream_type} for patient {patient_id}")
     emit('stream_status', {'status': 'streaming', 'type': stream_type})
 
+@socketio.on('subscribe_job')
+def handle_subscribe_job(data):
+    """Join the room of a background job and receive its current state right away."""
+    job_id = (data or {}).get('job_id')
+    job = _dryeye_jobs.get(job_id) if job_id else None
+    if job is None:
+        emit('job_error', {'job_id': job_id, 'error': 'Job not found'})
+        return
+    join_room(_job_room(job_id))
+    emit(f"dryeye_job_{job['state'] if job['state'] in ('done', 'failed') else 'progress'}", _public_job(job))
+
+def _count_stream_frame(frame_data):
+    """Transport of a frame payload ('binary' JPEG bytes or 'base64' string), counted once."""
+    transport = 'binary' if isinstance(frame_data, (bytes, bytearray, memoryview)) else 'base64'
+    with camera_lock:
+        _frame_transport[transport]['frames'] += 1
+        _frame_transport[transport]['bytes'] += len(frame_data)
+    return transport
+
+
+def _stream_frame_bytes(frame_data):
+    """Encoded JPEG bytes of a binary payload or a base64 (data-URL) string."""
+    if isinstance(frame_data, (bytes, bytearray, memoryview)):
+        return frame_data
+    return base64.b64decode(frame_data[frame_data.find(',') + 1:])
+
+
+def _camera_frame_path(patient_id):
+    return os.path.join('uploads/camera', f"camera_stream_{patient_id}_{int(time.time()*1000)}.jpg")
+
+
+def _decode_stream_frame(frame_data):
+    """(BGR frame or None, transport) for a binary JPEG payload or a base64 (data-URL) string."""
+    transport = _count_stream_frame(frame_data)
+    with stage_timer.span(f'camera.decode_{transport}'):
+        frame = decode_image_bytes(_stream_frame_bytes(frame_data))
+    return frame, transport
+
+
+def _frame_transport_stats():
+    with camera_lock:
+        return {
+            t: {**c, 'mean_bytes_per_frame': round(c['bytes'] / c['frames']) if c['frames'] else None}
+            for t, c in _frame_transport.items()
+        }
+
+
 @socketio.on('frame')
 def handle_frame(data):
-    """Receive frame from mobile camera"""
+    """Receive frame from mobile camera.
+
+    `data` is {frame, patient_id} where frame is raw JPEG bytes (a Socket.IO
+    binary attachment) or a base64 data URL; bare bytes use the stream's patient.
+    """
     try:
-        # Decode base64 frame
-        frame_data = data.get('frame')
-        patient_id = data.get('patient_id')
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            stream = active_streams.get(request.sid)
+            frame_data, patient_id = data, stream and stream['patient_id']
+        else:
+            frame_data = data.get('frame')
+            patient_id = data.get('patient_id')
         
         if not frame_data or not patient_id:
             return
+
+        stream = active_streams.get(request.sid)
+        analyzer = stream['analyzer'] if stream is not None else None
+        if analyzer is not None and not analyzer.due():
+            # Dry eye frame ahead of the next 15 fps tick (or after 60 s): it
+            # would not be scored, so it is not decoded; the received JPEG is
+            # saved as is, like every other frame.
+            analyzer.skip_frame()
+            transport = _count_stream_frame(frame_data)
+            with open(_camera_frame_path(patient_id), 'wb') as f:
+                f.write(_stream_frame_bytes(frame_data))
+            stream['frame_count'] += 1
+            emit('frame_received', {'status': 'ok', 'transport': transport, 'analyzed': False})
+            return
         
         # Decode and save frame
-        frame_bytes = base64.b64decode(frame_data.split(',')[1])
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame, transport = _decode_stream_frame(frame_data)
         
         if frame is not None:
             # Save frame
-            filename = f"camera_stream_{patient_id}_{int(time.time()*1000)}.jpg"
-            filepath = os.path.join('uploads/camera', filename)
-            cv2.imwrite(filepath, frame)
-            
+            cv2.imwrite(_camera_frame_path(patient_id), frame)
+
+            if stream is not None:
+                stream['frame_count'] += 1
+                if analyzer is not None:
+                    _analyze_stream_frame(stream, frame)
+
             # Send acknowledgment
-            emit('frame_received', {'status': 'ok'})
+            emit('frame_received', {'status': 'ok', 'transport': transport, 'analyzed': analyzer is not None})
     
     except Exception as e:
         print(f"Error processing frame: {e}")
         emit('frame_error', {'error': str(e)})
 
+def _analyze_stream_frame(stream, frame):
+    """Feed a live dry eye frame to the session analyzer; emit 'dryeye_live' on blinks / every interval."""
+    analyzer = stream['analyzer']
+    if analyzer.done:
+        return
+    with stage_timer.span('dryeye.stream_frame'):
+        blinked = analyzer.add_frame(frame)
+    now = time.time()
+    if blinked or analyzer.done or now - stream['last_live'] >= DRYEYE_LIVE_INTERVAL:
+        stream['last_live'] = now
+        emit('dryeye_live', {**analyzer.live(), 'blinked': blinked})
+
+
+def _finish_dryeye_stream(stream, stop_reason=None):
+    """Final result of a live dry eye session, stored like an uploaded video's."""
+    analyzer = stream['analyzer']
+    out = analyzer.result()
+    if stop_reason and out['stop_reason'] != 'max_duration':
+        out['stop_reason'] = stop_reason
+    key = f"stream_{stream['patient_id']}_{int(stream['started_at'] * 1000)}"
+    if _openness_store is not None and analyzer.series:
+        _openness_store.save(key, analyzer.series, video_file=None, result=out,
+                             stop_reason=out['stop_reason'])
+    if not stream['patient_id'] or out['duration_sec'] <= 0:
+        return {'result_id': None, 'analysis': out, 'video_url': None}
+    return _store_dryeye_result(stream['patient_id'], key, out, None)
+
+
 @socketio.on('stop_stream')
 def handle_stop_stream():
     """Stop camera streaming"""
     with camera_lock:
-        if request.sid in active_streams:
-            del active_streams[request.sid]
+        stream = active_streams.pop(request.sid, None)
     print(f"Stream stopped: {request.sid}")
+    if stream is not None and stream['analyzer'] is not None:
+        try:
+            emit('dryeye_result', {'success': True, **_finish_dryeye_stream(stream)})
+        except Exception as e:
+            print(f"[DRYEYE] Live result failed: {e}")
+            emit('dryeye_result', {'success': False, 'error': str(e)})
     emit('stream_status', {'status': 'stopped'})
 
 # ============== FILE SERVING ==============
@@ -1552,6 +1964,8 @@ def serve_upload(folder, filename):
         BASE_DIR / 'uploads' / folder / filename,  # legacy: server started inside backend/
         Path('uploads') / folder / filename,       # legacy: server relies on CWD
     ]
+    # A fresh upload may still be queued on the background writer.
+    _upload_writer.wait(candidates[0])
     for file_path in candidates:
         try:
             if file_path.exists() and file_path.is_file():
@@ -1609,6 +2023,133 @@ def health_check():
     }), 200
 
 
+@app.route('/api/stats/inference', methods=['GET'])
+def inference_stats():
+    """Micro-batching queue depth / batch size stats for throughput tuning"""
+    stats = _cataract_batcher.stats()
+    stats['enabled'] = CATARACT_BATCHING
+    live = _cataract_models.live
+    stats['backend'] = live.describe() if live is not None else {'backend': CATARACT_BACKEND}
+    return jsonify({
+        'success': True,
+        'cataract': stats,
+        'cache': _prediction_cache.stats(),
+        'dryeye_jobs': _dryeye_jobs.stats(),
+        'camera_frames': _frame_transport_stats(),
+        'upload_writer': _upload_writer.stats()
+    }), 200
+
+
+@app.route('/api/stats/latency', methods=['GET'])
+def latency_stats():
+    """Rolling p50/p95/p99 per pipeline stage (?reset=1 clears the windows)"""
+    stages = stage_timer.stats()
+    if request.args.get('reset') == '1':
+        stage_timer.reset()
+    return jsonify({
+        'success': True,
+        'enabled': stage_timer.enabled,
+        'window': stage_timer.window,
+        'stages': stages
+    }), 200
+
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 only once the cataract model is loaded and warm"""
+    status = get_cataract_model_status()
+    if CATARACT_WARMUP:
+        ready = status['state'] == 'ready'
+    else:
+        # Lazy load: nothing loads until an upload arrives, so waiting for the
+        # model would keep the instance out of rotation forever.
+        ready = status['state'] != 'failed'
+    return jsonify({
+        'ready': ready,
+        'service': 'NAYAN-AI Backend',
+        'cataract_model': status,
+        'timestamp': datetime.now().isoformat()
+    }), (200 if ready else 503)
+
+
+# ============== MODEL REGISTRY (HOT-SWAP) ==============
+def _model_swap_response(action, model):
+    _set_cataract_model_status(backend=model.backend.name, model_version=model.version)
+    return jsonify({
+        'success': True,
+        'message': f'{action}: live cataract model is now {model.version}',
+        'models': _cataract_models.describe()
+    }), 200
+
+
+@app.route('/api/models/cataract', methods=['GET'])
+def cataract_models():
+    """Live / previous / candidate model versions and shadow agreement stats"""
+    return jsonify({'success': True, 'models': _cataract_models.describe()}), 200
+
+
+@app.route('/api/models/cataract/candidate', methods=['POST'])
+def stage_cataract_candidate():
+    """Load + warm a model next to the live one. Body: {artifacts_dir, backend}"""
+    data = request.get_json(silent=True) or {}
+    artifacts_dir = (BASE_DIR / data.get('artifacts_dir', str(CATARACT_ARTIFACTS_DIR))).resolve()
+    if BASE_DIR not in artifacts_dir.parents and artifacts_dir != BASE_DIR:
+        return jsonify({'success': False, 'message': 'artifacts_dir must be inside the backend directory'}), 400
+
+    try:
+        _load_cataract_dl_model()
+        model = load_model(data.get('backend', CATARACT_BACKEND), artifacts_dir, warmup_runs=CATARACT_WARMUP_RUNS)
+        if CATARACT_BATCHING and CATARACT_BATCH_MAX_SIZE > 1:
+            model.predict_batch(np.zeros((CATARACT_BATCH_MAX_SIZE, 224, 224, 3), dtype=np.float32))
+    except Exception as e:
+        print(f"[MODELS] Candidate failed to load: {e}")
+        return jsonify({'success': False, 'message': f'Candidate model failed to load: {e}'}), 400
+
+    if model.class_names != _cataract_models.live.class_names:
+        print(f"[MODELS] Warning: candidate classes {model.class_names} differ from live {_cataract_models.live.class_names}")
+    _cataract_models.stage(model)
+    return jsonify({'success': True, 'message': 'Candidate staged', 'models': _cataract_models.describe()}), 200
+
+
+@app.route('/api/models/cataract/candidate', methods=['DELETE'])
+def discard_cataract_candidate():
+    model = _cataract_models.discard_candidate()
+    if model is None:
+        return jsonify({'success': False, 'message': 'No candidate model staged'}), 404
+    return jsonify({'success': True, 'message': f'Candidate {model.version} discarded'}), 200
+
+
+@app.route('/api/models/cataract/promote', methods=['POST'])
+def promote_cataract_candidate():
+    """Atomically make the candidate live; the old live model is kept for rollback"""
+    try:
+        model = _cataract_models.promote()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    return _model_swap_response('promote', model)
+
+
+@app.route('/api/models/cataract/rollback', methods=['POST'])
+def rollback_cataract_model():
+    """Swap back to the previous live model"""
+    try:
+        model = _cataract_models.rollback()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    return _model_swap_response('rollback', model)
+
+
+@app.route('/api/models/cataract/shadow', methods=['POST'])
+def set_cataract_shadow():
+    """Set the fraction of live predictions also scored by the candidate. Body: {fraction}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        _cataract_models.set_shadow_fraction(data.get('fraction', 0.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'shadow': _cataract_models.shadow_stats()}), 200
+
+
 # ============== COMPATIBILITY ROUTES (LEGACY DOCS/DEMOS) ==============
 @app.route('/health', methods=['GET'])
 def health_check_legacy():
@@ -1622,7 +2163,8 @@ def upload_cataract_legacy():
 
 @app.route('/dryeye/upload', methods=['POST'])
 def upload_dryeye_legacy():
-    return upload_dryeye()
+    # Legacy clients expect the finished analysis in the response.
+    return upload_dryeye(wait=True)
 
 
 @app.route('/glaucoma/measure', methods=['POST'])
@@ -1634,6 +2176,11 @@ def glaucoma_measure_legacy():
 def get_results_legacy(result_type, patient_id):
     return get_results(result_type, patient_id)
 
+# ============== MODEL WARM-UP ==============
+# Spawned worker processes (dry eye segment pool) re-import this module; only the server warms up.
+if CATARACT_WARMUP and multiprocessing.parent_process() is None:
+    start_cataract_warmup()
+
 # ============== RUN SERVER ==============
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,121 @@
+"""
+NAYAN-AI - Camera stream frame transport micro-benchmark
+Binary Socket.IO attachments (raw JPEG bytes) vs base64 data-URL strings for
+the 'frame' event: bytes on the wire per frame and server CPU to parse the
+Socket.IO packet and get a BGR frame out of it.
+Run from backend/:
+    python bench_camera_stream.py [--video PATH] [--heights 480,720,1080] [--quality 80] [--frames 60]
+
+Frames are taken from the given video (or uploads/dryeye); a synthetic eye
+frame is used when none is found.
+"""
+
+import sys
+import time
+import base64
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+from socketio import packet
+
+from image_io import decode_image_bytes
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+VIDEO_DIR = PROJECT_DIR / 'uploads' / 'dryeye'
+
+
+def _frames(video, count):
+    if video is None:
+        video = next((p for p in sorted(VIDEO_DIR.glob('*')) if p.suffix.lower() in ('.mp4', '.mov', '.webm')), None)
+    frames = []
+    if video is not None:
+        cap = cv2.VideoCapture(str(video))
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        rng = np.random.default_rng(0)
+        frame = np.full((1080, 1920, 3), (150, 170, 200), np.uint8) + rng.integers(0, 20, (1080, 1920, 1), dtype=np.uint8)
+        cv2.ellipse(frame, (960, 540), (240, 108), 0, 0, 360, (240, 240, 240), -1)
+        cv2.circle(frame, (960, 540), 77, (60, 40, 20), -1)
+        frames = [np.roll(frame, int(dx), axis=1) for dx in rng.integers(-3, 4, count)]
+    return frames
+
+
+def _wire(payload):
+    """Encoded Socket.IO packets of a 'frame' event: text header + binary attachments."""
+    return packet.Packet(packet.EVENT, data=['frame', {'frame': payload, 'patient_id': 1}]).encode()
+
+
+def _payload(encoded):
+    """Parse the packet and get the JPEG bytes out of it (the transport overhead)."""
+    if isinstance(encoded, list):
+        pkt = packet.Packet(encoded_packet=encoded[0])
+        for attachment in encoded[1:]:
+            pkt.add_attachment(attachment)
+    else:
+        pkt = packet.Packet(encoded_packet=encoded)
+    frame_data = pkt.data[1]['frame']
+    if isinstance(frame_data, (bytes, bytearray, memoryview)):
+        return frame_data
+    return base64.b64decode(frame_data[frame_data.find(',') + 1:])
+
+
+def _receive(encoded):
+    """What the server does per frame: parse the packet, then handle_frame's decode."""
+    return decode_image_bytes(_payload(encoded))
+
+
+def _time_per_frame(fn, items, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(item)
+        samples.append((time.perf_counter() - t0) * 1000.0 / len(items))
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', type=Path, default=None)
+    parser.add_argument('--heights', type=lambda s: [int(v) for v in s.split(',')], default=[480, 720, 1080])
+    parser.add_argument('--quality', type=int, default=80, help='client JPEG quality')
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    source = _frames(args.video, args.frames)
+    print(f"[BENCH] Frame transport, {len(source)} frames, JPEG quality {args.quality}")
+    for height in args.heights:
+        frames = [cv2.resize(f, (int(round(f.shape[1] * height / f.shape[0])), height)) for f in source]
+        jpegs = [cv2.imencode('.jpg', f, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes() for f in frames]
+        urls = ['data:image/jpeg;base64,' + base64.b64encode(j).decode('ascii') for j in jpegs]
+
+        binary = [_wire(j) for j in jpegs]
+        text = [_wire(u) for u in urls]
+        # Engine.IO sends attachments as binary frames; the text packet goes as UTF-8.
+        binary_bytes = np.mean([len(p[0]) + sum(len(a) for a in p[1:]) for p in binary])
+        text_bytes = np.mean([len(p.encode('utf-8')) if isinstance(p, str) else len(p[0]) for p in text])
+        jpeg_ms = _time_per_frame(decode_image_bytes, jpegs, args.repeat)
+        binary_ms = _time_per_frame(_receive, binary, args.repeat)
+        text_ms = _time_per_frame(_receive, text, args.repeat)
+        binary_overhead = _time_per_frame(_payload, binary, args.repeat)
+        text_overhead = _time_per_frame(_payload, text, args.repeat)
+
+        print(f"  {height}p  JPEG {np.mean([len(j) for j in jpegs]) / 1024:7.1f} KiB, imdecode alone {jpeg_ms:6.3f} ms")
+        print(f"    base64  {text_bytes / 1024:7.1f} KiB/frame  {text_ms:6.3f} ms/frame "
+              f"(packet + base64 {text_overhead:6.3f} ms)")
+        print(f"    binary  {binary_bytes / 1024:7.1f} KiB/frame  {binary_ms:6.3f} ms/frame "
+              f"(packet          {binary_overhead:6.3f} ms)  "
+              f"-{100 * (1 - binary_bytes / text_bytes):4.1f}% bytes, -{text_overhead - binary_overhead:5.3f} ms CPU/frame")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
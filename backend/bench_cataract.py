@@ -0,0 +1,323 @@
+"""
+NAYAN-AI - Cataract pipeline micro-benchmarks
+Run from backend/:
+    python bench_cataract.py overhead [--calls 200] [--random-model]
+    python bench_cataract.py decode [--min-side 640] [--repeat 20]
+    python bench_cataract.py decode-parity [--min-side 640] [--no-dl]
+    python bench_cataract.py features [--repeat 10]
+    python bench_cataract.py roi-sweep [--limit 8]
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from cataract_inference import (
+    ARTIFACTS_DIR,
+    IMG_SIZE,
+    KerasBackend,
+    build_inference_function,
+    preprocess_for_mobilenet,
+)
+from image_io import decode_image_bytes, jpeg_dimensions
+from cataract_features import (
+    CataractMetricEngine,
+    RoiStatsIndex,
+    preprocess_gray,
+    reference_metrics,
+    roi_grid,
+    roi_metrics,
+)
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_DIR = PROJECT_DIR / 'uploads' / 'cataract'
+
+
+def _summarize(label, samples_ms):
+    a = np.asarray(samples_ms, dtype=np.float64)
+    print(
+        f"  {label:28s} mean={a.mean():8.3f} ms  p50={np.percentile(a, 50):8.3f}  "
+        f"p95={np.percentile(a, 95):8.3f}  p99={np.percentile(a, 99):8.3f}  (n={len(a)})"
+    )
+    return float(np.median(a))
+
+
+def _time_calls(fn, calls, warmup=5):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+# ============== overhead: model.predict() vs prepared concrete function ==============
+def _load_keras_model(random_model: bool):
+    os.environ.setdefault("TF_USE_LEGACY_KERAS", "1")
+    import tensorflow as tf  # type: ignore
+
+    if not random_model:
+        backend = KerasBackend(ARTIFACTS_DIR, use_compiled=False)
+        if backend.has_artifact():
+            backend.load()
+            return backend.model
+        print("  (no trained artifact found, using a randomly initialised MobileNetV2)")
+
+    base = tf.keras.applications.MobileNetV2(
+        include_top=False, weights=None, input_shape=(IMG_SIZE[1], IMG_SIZE[0], 3)
+    )
+    inputs = tf.keras.layers.Input(shape=(IMG_SIZE[1], IMG_SIZE[0], 3))
+    x = tf.keras.applications.mobilenet_v2.preprocess_input(inputs)
+    x = base(x, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def bench_overhead(args):
+    model = _load_keras_model(args.random_model)
+    infer = build_inference_function(model).get_concrete_function()
+    x = np.random.default_rng(0).uniform(0, 255, (1, IMG_SIZE[1], IMG_SIZE[0], 3)).astype(np.float32)
+
+    print(f"Per-call latency, batch of 1, {args.calls} calls:")
+    predict_ms = _summarize('model.predict(x)', _time_calls(lambda: model.predict(x, verbose=0), args.calls))
+    direct_ms = _summarize('concrete_fn(x)', _time_calls(lambda: infer(x).numpy(), args.calls))
+
+    ref = model.predict(x, verbose=0)
+    max_diff = float(np.max(np.abs(infer(x).numpy() - ref)))
+    print(f"  per-call overhead removed: {predict_ms - direct_ms:.3f} ms (median), max|dp|={max_diff:.2e}")
+    return 0
+
+
+# ============== decode: full vs reduced-resolution JPEG decode ==============
+def _import_app():
+    """Import app.py for extract_cataract_features without the boot-time warm-up/cache."""
+    os.environ.setdefault('NAYAN_MODEL_WARMUP', '0')
+    os.environ.setdefault('NAYAN_CACHE', '0')
+    import app  # noqa: E402
+    return app
+
+
+def _load_samples(sample_dir: Path, limit=None):
+    """(name, bytes) for stored uploads, in a stable order."""
+    paths = sorted(p for p in sample_dir.glob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp'))
+    return [(p.name, p.read_bytes()) for p in paths[:limit]]
+
+
+def _synthetic_phone_jpeg(width=4000, height=3000, seed=0) -> bytes:
+    """Eye-like test card (dark disc on textured sclera) at phone-camera resolution."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(90, 200, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.circle(img, (width // 2, height // 2), min(width, height) // 5, (40, 30, 25), -1)
+    cv2.circle(img, (width // 2, height // 2), min(width, height) // 14, (10, 10, 10), -1)
+    ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    return buf.tobytes()
+
+
+def bench_decode(args):
+    app = _import_app()
+    samples = _load_samples(args.samples, args.limit)
+    for i in range(args.synthetic):
+        samples.append((f'synthetic_4000x3000_{i}.jpg', _synthetic_phone_jpeg(seed=i)))
+    if not samples:
+        print("No samples to benchmark.")
+        return 1
+
+    def ingest(data, min_side):
+        frame = decode_image_bytes(data, min_side=min_side)
+        preprocess_for_mobilenet(frame)
+        app.extract_cataract_features(frame)
+
+    print(f"decode + preprocess + features, {args.repeat} runs each (min_side={args.min_side}):")
+    for name, data in samples:
+        dims = jpeg_dimensions(data)
+        full = _time_calls(lambda: ingest(data, None), args.repeat, warmup=1)
+        reduced = _time_calls(lambda: ingest(data, args.min_side), args.repeat, warmup=1)
+        shape = decode_image_bytes(data, min_side=args.min_side).shape
+        full_ms, reduced_ms = float(np.median(full)), float(np.median(reduced))
+        print(
+            f"  {name:34s} {str(dims or 'non-jpeg'):>14s} -> {shape[1]}x{shape[0]:<5d} "
+            f"full={full_ms:8.2f} ms  reduced={reduced_ms:8.2f} ms  x{full_ms / max(reduced_ms, 1e-9):.1f}"
+        )
+    return 0
+
+
+def bench_decode_parity(args):
+    """Compare metrics (and DL output, when a model loads) between full and reduced decode."""
+    app = _import_app()
+    samples = _load_samples(args.samples, args.limit)
+    for i in range(args.synthetic):
+        samples.append((f'synthetic_4000x3000_{i}.jpg', _synthetic_phone_jpeg(seed=i)))
+    if not samples:
+        print(f"No stored uploads in {args.samples}")
+        return 1
+
+    backend, class_names = None, None
+    if not args.no_dl:
+        try:
+            app._load_cataract_dl_model()
+            backend = app._cataract_models.live
+            class_names = backend.class_names
+        except Exception as e:
+            print(f"  (DL parity skipped: {e})")
+
+    rule_flips, dl_flips, reduced_count = 0, 0, 0
+    max_dp = 0.0
+    rel = {'contrast': [], 'sharpness': [], 'edge': []}
+    for name, data in samples:
+        full_frame = decode_image_bytes(data)
+        reduced_frame = decode_image_bytes(data, min_side=args.min_side)
+        if full_frame is None:
+            continue
+        if reduced_frame.shape != full_frame.shape:
+            reduced_count += 1
+
+        f_full = app.extract_cataract_features(full_frame)
+        f_red = app.extract_cataract_features(reduced_frame)
+        rule_flips += int(f_full['label'] != f_red['label'])
+        for key in rel:
+            rel[key].append(abs(f_red[key] - f_full[key]) / max(abs(f_full[key]), 1e-9))
+
+        if backend is not None:
+            x = np.concatenate([preprocess_for_mobilenet(full_frame), preprocess_for_mobilenet(reduced_frame)])
+            probs = backend.predict_batch(x)
+            label_full = class_names[int(np.argmax(probs[0]))]
+            label_red = class_names[int(np.argmax(probs[1]))]
+            dl_flips += int(label_full != label_red)
+            max_dp = max(max_dp, float(np.max(np.abs(probs[0] - probs[1]))))
+
+    print(f"Full vs reduced decode on {len(samples)} uploads (min_side={args.min_side}, {reduced_count} decoded reduced):")
+    for key, values in rel.items():
+        a = np.asarray(values)
+        print(f"  {key:10s} relative delta  median={np.median(a):.3f}  max={a.max():.3f}")
+    print(f"  rule-based label flips: {rule_flips}")
+    if backend is not None:
+        print(f"  DL label flips: {dl_flips}  max|dp|={max_dp:.4f}")
+    return 0 if dl_flips == 0 else 1
+
+
+# ============== features: ROI-first metric engine vs full-frame reference ==============
+# Max relative deviation allowed on contrast / sharpness / edge. The cropped
+# CLAHE blends LUTs with float32 weights computed from crop-relative
+# coordinates, which can move an occasional pixel by one grey level.
+FEATURE_REL_TOLERANCE = 1e-3
+
+
+def bench_features(args):
+    samples = _load_samples(args.samples, args.limit)
+    for i in range(args.synthetic):
+        samples.append((f'synthetic_4000x3000_{i}.jpg', _synthetic_phone_jpeg(seed=i)))
+    if not samples:
+        print(f"No stored uploads in {args.samples}")
+        return 1
+
+    engine = CataractMetricEngine()
+    worst = {'contrast': 0.0, 'sharpness': 0.0, 'edge': 0.0}
+    ref_ms, engine_ms = [], []
+    for name, data in samples:
+        frame = decode_image_bytes(data)
+        if frame is None:
+            continue
+        ref = reference_metrics(frame)
+        new = engine.compute(frame)
+        for key, a, b in zip(worst, ref, new):
+            worst[key] = max(worst[key], abs(b - a) / max(abs(a), 1e-9))
+        ref_ms.append(float(np.median(_time_calls(lambda: reference_metrics(frame), args.repeat, warmup=1))))
+        engine_ms.append(float(np.median(_time_calls(lambda: engine.compute(frame), args.repeat, warmup=1))))
+
+    print(f"ROI-first metrics vs full-frame reference on {len(ref_ms)} images:")
+    for key, rel in worst.items():
+        print(f"  {key:10s} max relative delta {rel:.2e}")
+    print(f"  median per image: reference={np.median(ref_ms):.2f} ms  engine={np.median(engine_ms):.2f} ms  "
+          f"(largest image: {max(ref_ms):.2f} -> {engine_ms[int(np.argmax(ref_ms))]:.2f} ms)")
+    ok = max(worst.values()) <= FEATURE_REL_TOLERANCE
+    print(f"  parity (tolerance {FEATURE_REL_TOLERANCE:g}): {'OK' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+# ============== roi-sweep: integral-image ROI grid vs per-ROI recomputation ==============
+def bench_roi_sweep(args):
+    samples = _load_samples(args.samples, args.limit)
+    for i in range(args.synthetic):
+        samples.append((f'synthetic_4000x3000_{i}.jpg', _synthetic_phone_jpeg(seed=i)))
+
+    print("ROI sweep (8 scales x 5x5 offsets) per image:")
+    worst = {'contrast': 0.0, 'sharpness': 0.0, 'edge': 0.0}
+    for name, data in samples:
+        frame = decode_image_bytes(data, min_side=args.min_side)
+        if frame is None:
+            continue
+        t0 = time.perf_counter()
+        gray = preprocess_gray(frame)
+        t1 = time.perf_counter()
+        index = RoiStatsIndex(gray, border=args.border)
+        rects, _ = roi_grid(gray.shape)
+        stats = index.stats(rects)
+        t2 = time.perf_counter()
+        brute = np.array([roi_metrics(gray[y:y+h, x:x+w]) for x, y, w, h in rects])
+        t3 = time.perf_counter()
+
+        for col, key in enumerate(worst):
+            rel = np.abs(stats[key] - brute[:, col]) / np.maximum(np.abs(brute[:, col]), 1e-9)
+            worst[key] = max(worst[key], float(rel.max()))
+        print(f"  {name:34s} {len(rects):3d} ROIs  preprocess={(t1 - t0) * 1e3:7.2f} ms  "
+              f"tables+lookups={(t2 - t1) * 1e3:7.2f} ms  per-ROI recompute={(t3 - t2) * 1e3:8.2f} ms")
+    print(f"  max relative delta vs per-ROI filters (border={args.border}): "
+          + "  ".join(f"{k}={v:.3f}" for k, v in worst.items()))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('overhead', help='Keras predict() vs the prepared concrete function')
+    p.add_argument('--calls', type=int, default=200)
+    p.add_argument('--random-model', action='store_true', help='benchmark an untrained MobileNetV2')
+    p.set_defaults(func=bench_overhead)
+
+    p = sub.add_parser('decode', help='full vs reduced-resolution decode on stored + synthetic uploads')
+    p.add_argument('--samples', type=Path, default=SAMPLE_DIR)
+    p.add_argument('--limit', type=int, default=8)
+    p.add_argument('--synthetic', type=int, default=2, help='extra synthetic 4000x3000 JPEGs')
+    p.add_argument('--min-side', type=int, default=640)
+    p.add_argument('--repeat', type=int, default=20)
+    p.set_defaults(func=bench_decode)
+
+    p = sub.add_parser('decode-parity', help='metric / DL agreement between full and reduced decode')
+    p.add_argument('--samples', type=Path, default=SAMPLE_DIR)
+    p.add_argument('--limit', type=int, default=None)
+    p.add_argument('--synthetic', type=int, default=2, help='extra synthetic 4000x3000 JPEGs')
+    p.add_argument('--min-side', type=int, default=640)
+    p.add_argument('--no-dl', action='store_true', help='compare image metrics only')
+    p.set_defaults(func=bench_decode_parity)
+
+    p = sub.add_parser('features', help='ROI-first metric engine parity + timing vs the full-frame reference')
+    p.add_argument('--samples', type=Path, default=SAMPLE_DIR)
+    p.add_argument('--limit', type=int, default=None)
+    p.add_argument('--synthetic', type=int, default=2, help='extra synthetic 4000x3000 JPEGs')
+    p.add_argument('--repeat', type=int, default=10)
+    p.set_defaults(func=bench_features)
+
+    p = sub.add_parser('roi-sweep', help='integral-image ROI scale/offset sweep vs per-ROI recomputation')
+    p.add_argument('--samples', type=Path, default=SAMPLE_DIR)
+    p.add_argument('--limit', type=int, default=8)
+    p.add_argument('--synthetic', type=int, default=1, help='extra synthetic 4000x3000 JPEGs')
+    p.add_argument('--min-side', type=int, default=0, help='reduced decode (the server decodes full for the sweep)')
+    p.add_argument('--border', choices=['reflect', 'interior'], default='reflect')
+    p.set_defaults(func=bench_roi_sweep)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,562 @@
+"""
+NAYAN-AI - Dry eye pipeline micro-benchmarks
+Run from backend/:
+    python bench_dryeye.py detector [--videos DIR] [--lengths 900,9000,36000]
+    python bench_dryeye.py segments [--videos DIR] [--workers 1,2,4,8]
+    python bench_dryeye.py redetect [--random 300]
+    python bench_dryeye.py sampler [--videos DIR] [--modes read,grab,seek]
+    python bench_dryeye.py adaptive [--videos DIR] [--random 2000]
+    python bench_dryeye.py pipeline [--videos DIR] [--durations 30,60] [--queues 2,8,32]
+    python bench_dryeye.py metrics [--videos DIR --annotations CSV] [--metrics canny,vgrad]
+    python bench_dryeye.py roi [--videos DIR] [--heights 480,720,1080,2160] [--canny 20:60,30:90]
+
+Videos are taken from uploads/dryeye (and dryeye/uploads_dryeye); when none
+are found, synthetic blink videos are generated into a temp directory.
+"""
+
+import os
+import csv
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import blink_analysis
+from blink_analysis import (
+    BlinkDetector,
+    analyze_video_parallel,
+    center_roi,
+    detect_blinks,
+    frame_roi,
+    moving_average,
+    openness_metric,
+    openness_series,
+    redetect,
+)
+from blink_reference import legacy_detect, synthetic_series, write_eye_video
+
+# Openness metric before ROI normalization: native-size ROI, Canny 40 / 120
+LEGACY_CANNY = (40, 120)
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+VIDEO_DIRS = [PROJECT_DIR / 'uploads' / 'dryeye', Path(__file__).resolve().parent / 'dryeye' / 'uploads_dryeye']
+
+
+def _summarize(label, samples_ms):
+    a = np.asarray(samples_ms, dtype=np.float64)
+    print(
+        f"  {label:28s} mean={a.mean():8.3f} ms  p50={np.percentile(a, 50):8.3f}  "
+        f"p95={np.percentile(a, 95):8.3f}  p99={np.percentile(a, 99):8.3f}  (n={len(a)})"
+    )
+    return float(np.median(a))
+
+
+# ---------- inputs ----------
+def _synthetic_blink_video(path, seconds=30.0, fps=30, size=(1280, 720), blink_every=3.0, blink_ms=300, seed=0,
+                           flicker=0.0):
+    """Write an MP4 of a drawn eye that closes for `blink_ms` roughly every `blink_every` s.
+
+    `flicker` modulates the brightness by that fraction with a 4 s period (room
+    lighting, auto exposure). Returns the blink start times in seconds.
+    """
+    rng = np.random.default_rng(seed)
+    blinks = []
+    t = blink_every * 0.7
+    while t < seconds:
+        blinks.append(t)
+        t += blink_every * rng.uniform(0.6, 1.4)
+    write_eye_video(path, blinks, seconds, fps=fps, size=size, blink_ms=blink_ms, seed=seed, flicker=flicker,
+                    iris_spokes=12)
+    return blinks
+
+
+def _find_videos(args):
+    dirs = [args.videos] if args.videos else VIDEO_DIRS
+    videos = []
+    for d in dirs:
+        if d and Path(d).is_dir():
+            videos += sorted(p for p in Path(d).iterdir() if p.suffix.lower() in ('.mp4', '.mov', '.avi', '.webm'))
+    videos = videos[:args.limit] if args.limit else videos
+    if not videos and args.synthetic:
+        tmp = Path(tempfile.mkdtemp(prefix='nayan_dryeye_'))
+        for i in range(args.synthetic):
+            path = tmp / f'synthetic_{i}.mp4'
+            blinks = _synthetic_blink_video(path, seconds=args.seconds, seed=i, blink_every=2.5 + 2 * i)
+            print(f"[BENCH] Synthetic video {path.name}: {args.seconds:.0f} s, {len(blinks)} blinks")
+            videos.append(path)
+    return videos
+
+
+def _per_frame_cost(update, series, chunk=500):
+    """Mean µs per update() for consecutive chunks of the series."""
+    costs = []
+    for start in range(0, len(series), chunk):
+        t0 = time.perf_counter()
+        for m in series[start:start + chunk]:
+            update(m)
+        costs.append((time.perf_counter() - t0) * 1e6 / len(series[start:start + chunk]))
+    return costs
+
+
+# ---------- benchmarks ----------
+def bench_detector(args):
+    print("[BENCH] Parity: BlinkDetector vs the original full-history state machine")
+    mismatches = 0
+    for seed in range(args.random):
+        series = synthetic_series(int(np.random.default_rng(seed).integers(60, 1800)), seed=seed)
+        if detect_blinks(series) != legacy_detect(series):
+            mismatches += 1
+    print(f"  synthetic series: {args.random - mismatches}/{args.random} identical")
+
+    for path in _find_videos(args):
+        series = openness_series(path)
+        new, old = detect_blinks(series), legacy_detect(series)
+        same = new == old
+        mismatches += int(not same)
+        video = blink_analysis.analyze_video(path)
+        video = {k: v for k, v in video.items() if k not in ('analysis_sec', 'stop_reason')}
+        mismatches += int(video != old)
+        print(f"  {path.name:32s} frames={len(series):5d} blinks={new['blink_count']:3d} "
+              f"label={new['label']:13s} {'identical' if same and video == old else 'MISMATCH'}")
+
+    print("\n[BENCH] Per-frame detector cost vs history length (µs per frame, by 500-frame chunk)")
+    for n in args.lengths:
+        series = synthetic_series(n, seed=n)
+        new = _per_frame_cost(BlinkDetector().update, series)
+        line = f"  n={n:6d}  BlinkDetector first={new[0]:6.2f} last={new[-1]:6.2f}"
+        if n <= args.legacy_max:
+            old = _per_frame_cost(_legacy_stepper(), series)
+            line += f"   legacy first={old[0]:8.2f} last={old[-1]:8.2f}"
+        print(line)
+    return 1 if mismatches else 0
+
+
+def bench_segments(args):
+    videos = _find_videos(args)
+    print(f"[BENCH] Segment-parallel analysis ({os.cpu_count()} CPUs), {len(videos)} videos")
+    mismatches = 0
+    for path in videos:
+        reference = blink_analysis.analyze_video(path)
+        seq_s = reference.pop('analysis_sec')
+        print(f"  {path.name}: sequential {seq_s:6.2f} s, blinks={reference['blink_count']}")
+        for workers in args.workers:
+            if workers <= 1:
+                continue
+            analyze_video_parallel(path, workers=workers)  # start the pool outside the timing
+            t0 = time.perf_counter()
+            out = analyze_video_parallel(path, workers=workers)
+            elapsed = time.perf_counter() - t0
+            out.pop('analysis_sec')
+            same = out == reference
+            mismatches += int(not same)
+            print(f"    workers={workers:2d} {elapsed:6.2f} s  speed-up x{seq_s / elapsed:4.2f}  "
+                  f"{'identical' if same else 'MISMATCH'}")
+    return 1 if mismatches else 0
+
+
+def bench_redetect(args):
+    """Vectorised redetect() vs the per-frame BlinkDetector on float32-stored series."""
+    print("[BENCH] redetect() parity with detect_blinks() across parameter sets")
+    param_sets = [
+        {},
+        {'thresh_k': 0.55, 'smooth_window': 5},
+        {'thresh_k': 0.8, 'smooth_window': 3, 'refractory_ms': 100},
+        {'smooth_window': 11, 'min_blink_ms': 0, 'max_blink_ms': 1000},
+    ]
+    mismatches = 0
+    for seed in range(args.random):
+        n = int(np.random.default_rng(seed).integers(1, 1800))
+        series = synthetic_series(n, seed=seed).astype(np.float32)
+        for params in param_sets:
+            mismatches += int(redetect(series, **params) != detect_blinks(series, **params))
+    print(f"  {args.random * len(param_sets) - mismatches}/{args.random * len(param_sets)} identical")
+
+    series = synthetic_series(int(blink_analysis.MAX_VIDEO_SECONDS * blink_analysis.TARGET_FPS)).astype(np.float32)
+    for label, fn in (('detect_blinks (per frame)', detect_blinks), ('redetect (vectorised)', redetect)):
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn(series)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        _summarize(label, samples)
+    return 1 if mismatches else 0
+
+
+def bench_sampler(args):
+    """Frame sampling modes: decode time for the kept frames and identical openness series."""
+    videos = _find_videos(args)
+    print(f"[BENCH] Frame sampling modes {', '.join(args.modes)}, {len(videos)} videos")
+    mismatches = 0
+    for path in videos:
+        cap = cv2.VideoCapture(str(path))
+        frame_step, max_frames, expected_kept = blink_analysis._sampling_plan(cap)
+        w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        print(f"  {path.name}: {w}x{h}, frame_step={frame_step}, {expected_kept} kept frames")
+        reference = openness_series(path, sampling='read')
+        base = None
+        for mode in args.modes:
+            samples = []
+            for _ in range(args.repeat):
+                cap = cv2.VideoCapture(str(path))
+                t0 = time.perf_counter()
+                kept = sum(1 for _ in blink_analysis.sample_frames(cap, frame_step, max_frames, mode))
+                samples.append(time.perf_counter() - t0)
+                cap.release()
+            elapsed = float(np.median(samples))
+            base = base or elapsed
+            same = np.array_equal(openness_series(path, sampling=mode), reference)
+            mismatches += int(not same)
+            print(f"    {mode:5s} {elapsed:6.2f} s  {kept / elapsed:7.1f} kept frames/s  "
+                  f"x{base / elapsed:4.2f} vs {args.modes[0]}  {'identical' if same else 'MISMATCH'}")
+    return 1 if mismatches else 0
+
+
+def _adaptive_replay(series, total_frames):
+    """(result, stop_reason, frames used) of the adaptive stop rule replayed over a recorded series."""
+    detector = BlinkDetector()
+    for m in series:
+        detector.update(float(m))
+        if detector.kept_idx < total_frames:
+            reason = blink_analysis._adaptive_stop(detector, total_frames)
+            if reason:
+                return detector.result(), reason, detector.kept_idx
+    return detector.result(), None, detector.kept_idx
+
+
+def bench_adaptive(args):
+    """Adaptive early stop: label safety on random series, then time saved on videos."""
+    fps = blink_analysis.TARGET_FPS
+    max_frames = int(blink_analysis.MAX_VIDEO_SECONDS * fps)
+    gaps = [(2, 6), (3, 9), (5, 13), (8, 20)]
+    changed, used, reasons = 0, 0, {}
+    rng = np.random.default_rng(0)
+    for seed in range(args.random):
+        n = int(rng.integers(fps * 10, max_frames + 1))
+        series = synthetic_series(n, seed=seed, gap=gaps[seed % len(gaps)])
+        if seed % 10 == 9:
+            series[int(rng.integers(0, n)):] = 0.0  # camera covered / lost focus
+        result, reason, frames = _adaptive_replay(series, max_frames)
+        reasons[reason or 'end_of_video'] = reasons.get(reason or 'end_of_video', 0) + 1
+        if reason != 'no_signal':
+            changed += int(result['label'] != detect_blinks(series)['label'])
+        used += frames / n
+    print(f"[BENCH] Adaptive stop on {args.random} random series: {changed} label changes, "
+          f"{100 * used / args.random:.0f}% of frames analysed on average")
+    print("  stop reasons: " + ", ".join(f"{k}={v}" for k, v in sorted(reasons.items())))
+
+    videos = _find_videos(args)
+    full_s = adaptive_s = 0.0
+    for path in videos:
+        full = blink_analysis.analyze_video(path)
+        out = blink_analysis.analyze_video(path, adaptive=True)
+        full_s += full['analysis_sec']
+        adaptive_s += out['analysis_sec']
+        same = out['label'] == full['label']
+        changed += int(not same and out['stop_reason'] != 'no_signal')
+        print(f"  {path.name}: full {full['analysis_sec']:6.2f} s ({full['duration_sec']:4.1f} s of video)  "
+              f"adaptive {out['analysis_sec']:6.2f} s ({out['duration_sec']:4.1f} s, {out['stop_reason']})  "
+              f"label {'same' if same else 'DIFFERENT'}")
+    if videos:
+        print(f"  total {full_s:.2f} s -> {adaptive_s:.2f} s ({100 * (1 - adaptive_s / max(full_s, 1e-9)):.0f}% less)")
+    return 1 if changed else 0
+
+
+def bench_pipeline(args):
+    """Decoder thread + bounded ROI queue vs inline decode, on 30 s / 60 s clips."""
+    videos = _find_videos(args) if args.videos else []
+    if not videos:
+        tmp = Path(tempfile.mkdtemp(prefix='nayan_dryeye_'))
+        for seconds in args.durations:
+            path = tmp / f'synthetic_{seconds:g}s.mp4'
+            _synthetic_blink_video(path, seconds=seconds)
+            videos.append(path)
+    print(f"[BENCH] Decode/score overlap ({os.cpu_count()} CPUs), {len(videos)} videos")
+    mismatches = 0
+    for path in videos:
+        cap = cv2.VideoCapture(str(path))
+        frame_step, max_frames, _ = blink_analysis._sampling_plan(cap)
+        t0 = time.perf_counter()
+        rois = list(blink_analysis.iter_rois(cap, frame_step, max_frames, queue_size=0))
+        decode_s = time.perf_counter() - t0
+        cap.release()
+        t0 = time.perf_counter()
+        for roi in rois:
+            openness_metric(roi)
+        score_s = time.perf_counter() - t0
+        print(f"  {path.name}: {len(rois)} kept frames, decode+crop {decode_s:5.2f} s, score {score_s:5.2f} s "
+              f"(full overlap bound x{(decode_s + score_s) / max(decode_s, score_s):4.2f})")
+        del rois
+
+        reference = None
+        for queue_size in [0] + args.queues:
+            samples = []
+            for _ in range(args.repeat):
+                out = blink_analysis.analyze_video(path, queue_size=queue_size)
+                samples.append(out.pop('analysis_sec'))
+            elapsed = float(np.median(samples))
+            if reference is None:
+                reference, inline_s = out, elapsed
+            same = out == reference
+            mismatches += int(not same)
+            label = 'inline' if queue_size == 0 else f'queue={queue_size}'
+            print(f"    {label:9s} {elapsed:6.2f} s  {out['duration_sec'] * blink_analysis.TARGET_FPS / elapsed:7.1f} "
+                  f"frames/s  x{inline_s / elapsed:4.2f}  {'identical' if same else 'MISMATCH'}")
+    return 1 if mismatches else 0
+
+
+def _load_annotations(path):
+    """{video stem: {blink_count, label, blink_times}} from a CSV with a filename column.
+
+    Other columns are optional: blink_count, label and blink_times (seconds,
+    separated by ';').
+    """
+    annotations = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for rec in csv.DictReader(f):
+            name = rec.get('filename') or rec.get('video_file')
+            if not name:
+                continue
+            times = rec.get('blink_times') or ''
+            annotations[Path(name).stem] = {
+                'blink_count': int(rec['blink_count']) if (rec.get('blink_count') or '').strip() else None,
+                'label': (rec.get('label') or '').strip() or None,
+                'blink_times': [float(t) for t in times.split(';') if t.strip()] if times.strip() else None,
+            }
+    return annotations
+
+
+def _match_blinks(detected, annotated, tolerance=0.5):
+    """(true positives, false positives, false negatives) pairing each annotated blink with one detection."""
+    unmatched = list(detected)
+    tp = 0
+    for t in annotated:
+        best = min(unmatched, key=lambda d: abs(d - t), default=None)
+        if best is not None and abs(best - t) <= tolerance:
+            unmatched.remove(best)
+            tp += 1
+    return tp, len(unmatched), len(annotated) - tp
+
+
+def bench_metrics(args):
+    """Every registered openness metric over annotated videos: cost per frame and blink agreement.
+
+    Without annotations for a video, the default metric's detections are the reference.
+    """
+    names = args.metrics or list(blink_analysis.OPENNESS_METRICS)
+    annotations = _load_annotations(args.annotations) if args.annotations else {}
+    args.synthetic = 0
+    videos = _find_videos(args)
+    if not videos:
+        tmp = Path(tempfile.mkdtemp(prefix='nayan_dryeye_'))
+        for i, (every, flicker) in enumerate([(3.0, 0.0), (5.0, 0.0), (3.0, 0.25), (12.0, 0.0)]):
+            path = tmp / f'synthetic_{i}.mp4'
+            starts = _synthetic_blink_video(path, seconds=args.seconds, seed=i, blink_every=every, flicker=flicker)
+            times = [t + 0.15 for t in starts]
+            annotations[path.stem] = {'blink_count': len(times), 'label': None, 'blink_times': times}
+            videos.append(path)
+            print(f"[BENCH] Synthetic video {path.name}: {args.seconds:.0f} s, {len(times)} blinks, flicker {flicker}")
+
+    print(f"[BENCH] Openness metrics {', '.join(names)} on {len(videos)} videos")
+    totals = {name: {'frames': 0, 'cost': 0.0, 'abs_err': 0, 'labels': 0, 'label_ok': 0, 'tp': 0, 'fp': 0, 'fn': 0}
+              for name in names}
+    for path in videos:
+        cap = cv2.VideoCapture(str(path))
+        frame_step, max_frames, _ = blink_analysis._sampling_plan(cap)
+        rois = list(blink_analysis.iter_rois(cap, frame_step, max_frames, queue_size=0))
+        cap.release()
+
+        runs = {}
+        for name in names:
+            score = blink_analysis.get_metric(name)
+            t0 = time.perf_counter()
+            series = [score(roi) for roi in rois]
+            cost = time.perf_counter() - t0
+            detector = BlinkDetector()
+            for m in series:
+                detector.update(m)
+            runs[name] = (cost, detector.result(), list(detector.blinks_end_times))
+
+        truth = annotations.get(path.stem)
+        if truth is None:
+            if blink_analysis.OPENNESS_METRIC in runs:
+                _, ref, ref_times = runs[blink_analysis.OPENNESS_METRIC]
+            else:
+                ref, ref_times = _reference_run(rois)
+            truth = {'blink_count': ref['blink_count'], 'label': ref['label'], 'blink_times': ref_times}
+            source = f'vs {blink_analysis.OPENNESS_METRIC}'
+        else:
+            source = 'vs annotation'
+        print(f"  {path.name}: {len(rois)} frames, {truth['blink_count']} blinks ({source})")
+        for name in names:
+            cost, out, times = runs[name]
+            acc = totals[name]
+            acc['frames'] += len(rois)
+            acc['cost'] += cost
+            line = f"    {name:10s} {cost * 1000 / max(len(rois), 1):6.3f} ms/frame  blinks={out['blink_count']:3d}"
+            if truth['blink_count'] is not None:
+                acc['abs_err'] += abs(out['blink_count'] - truth['blink_count'])
+            if truth['label']:
+                acc['labels'] += 1
+                acc['label_ok'] += int(out['label'] == truth['label'])
+                line += f"  label {out['label']}"
+            if truth['blink_times'] is not None:
+                tp, fp, fn = _match_blinks(times, truth['blink_times'])
+                acc['tp'] += tp
+                acc['fp'] += fp
+                acc['fn'] += fn
+                line += f"  tp={tp} fp={fp} fn={fn}"
+            print(line)
+
+    print("  summary (cheapest first):")
+    for name in sorted(names, key=lambda n: totals[n]['cost'] / max(totals[n]['frames'], 1)):
+        acc = totals[name]
+        f1 = 2 * acc['tp'] / max(2 * acc['tp'] + acc['fp'] + acc['fn'], 1)
+        labels = f"{acc['label_ok']}/{acc['labels']}" if acc['labels'] else '-'
+        print(f"    {name:10s} {acc['cost'] * 1000 / max(acc['frames'], 1):6.3f} ms/frame  "
+              f"blink count MAE={acc['abs_err'] / max(len(videos), 1):5.2f}  event F1={f1:5.3f}  labels {labels}")
+    return 0
+
+
+def _reference_run(rois):
+    detector = BlinkDetector()
+    score = blink_analysis.get_metric()
+    for roi in rois:
+        detector.update(score(roi))
+    return detector.result(), list(detector.blinks_end_times)
+
+
+def _scaled_frames(path, height):
+    """Kept frames of `path`, resized to `height` rows (native when 0), as a phone of that resolution would record."""
+    cap = cv2.VideoCapture(str(path))
+    frame_step, max_frames, _ = blink_analysis._sampling_plan(cap)
+    for frame in blink_analysis.sample_frames(cap, frame_step, max_frames):
+        if height and frame.shape[0] != height:
+            width = int(round(frame.shape[1] * height / frame.shape[0]))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_CUBIC)
+        yield frame
+    cap.release()
+
+
+def bench_roi(args):
+    """Native-size ROI with the old Canny thresholds vs the normalized working-width ROI.
+
+    Each video is replayed at several resolutions; every configuration is
+    compared with the old pipeline on the video as recorded (openness
+    correlation, blink count, label) and timed per frame.
+    """
+    videos = _find_videos(args)
+    configs = [('native 40/120', lambda f: openness_metric(center_roi(f, blink_analysis.ROI_SCALE), *LEGACY_CANNY)),
+               (f'w{blink_analysis.ROI_WORK_WIDTH} {blink_analysis.CANNY_LOW}/{blink_analysis.CANNY_HIGH}',
+                lambda f: openness_metric(frame_roi(f)))]
+    for lo, hi in args.canny:
+        configs.append((f'w{blink_analysis.ROI_WORK_WIDTH} {lo}/{hi}',
+                        lambda f, lo=lo, hi=hi: openness_metric(frame_roi(f), lo, hi)))
+    print(f"[BENCH] ROI normalization, {len(videos)} videos, heights {args.heights}")
+    disagreements = 0
+    for path in videos:
+        reference = np.array([configs[0][1](f) for f in _scaled_frames(path, 0)])
+        ref_out = detect_blinks(reference)
+        print(f"  {path.name}: reference blinks={ref_out['blink_count']} label={ref_out['label']}")
+        for height in args.heights:
+            series = {name: [] for name, _ in configs}
+            cost = {name: 0.0 for name, _ in configs}
+            for frame in _scaled_frames(path, height):
+                for name, fn in configs:
+                    t0 = time.perf_counter()
+                    series[name].append(fn(frame))
+                    cost[name] += time.perf_counter() - t0
+            for name, _ in configs:
+                s = np.asarray(series[name])
+                out = detect_blinks(s)
+                n = min(len(s), len(reference))
+                corr = np.corrcoef(s[:n], reference[:n])[0, 1] if n > 1 and s[:n].std() > 0 else float('nan')
+                same = out['label'] == ref_out['label']
+                disagreements += int(not same and name == configs[1][0])
+                print(f"    {height:5d}p {name:14s} {cost[name] * 1000 / max(len(s), 1):6.2f} ms/frame  "
+                      f"mean={s.mean():.4f}  dip={s.min() / max(np.median(s), 1e-9):.2f}  corr={corr:.3f}  "
+                      f"blinks={out['blink_count']:3d}  label {'same' if same else 'DIFFERENT'}")
+    return 1 if disagreements else 0
+
+
+def _legacy_stepper():
+    """Per-frame closure with the original cost profile (moving_average + np.median of the history)."""
+    metrics, smooth_hist = [], []
+
+    def update(m):
+        metrics.append(m)
+        smooth = moving_average(metrics, blink_analysis.SMOOTH_WINDOW)
+        smooth_hist.append(smooth)
+        return float(np.median(smooth_hist)) if len(smooth_hist) > 30 else float(np.mean(smooth_hist))
+    return update
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def video_args(p):
+        p.add_argument('--videos', type=Path, default=None, help='directory of MP4s (default: stored uploads)')
+        p.add_argument('--limit', type=int, default=None)
+        p.add_argument('--synthetic', type=int, default=2, help='synthetic videos to generate if none are found')
+        p.add_argument('--seconds', type=float, default=30.0, help='length of generated videos')
+
+    p = sub.add_parser('detector', help='O(1) BlinkDetector parity + per-frame cost vs the original')
+    video_args(p)
+    p.add_argument('--random', type=int, default=200, help='random openness series checked for parity')
+    p.add_argument('--lengths', type=lambda s: [int(v) for v in s.split(',')], default=[900, 9000, 36000])
+    p.add_argument('--legacy-max', type=int, default=9000, help='skip the quadratic reference above this length')
+    p.set_defaults(func=bench_detector)
+
+    p = sub.add_parser('segments', help='segment-parallel analyze_video_parallel vs sequential analyze_video')
+    video_args(p)
+    p.add_argument('--workers', type=lambda s: [int(v) for v in s.split(',')], default=[2, 4, 8])
+    p.set_defaults(func=bench_segments)
+
+    p = sub.add_parser('redetect', help='vectorised re-detection on stored series vs the per-frame detector')
+    p.add_argument('--random', type=int, default=300)
+    p.add_argument('--repeat', type=int, default=50)
+    p.set_defaults(func=bench_redetect)
+
+    p = sub.add_parser('sampler', help='grab/retrieve and seek frame sampling vs read() of every frame')
+    video_args(p)
+    p.add_argument('--modes', type=lambda s: s.split(','), default=['read', 'grab', 'seek'])
+    p.add_argument('--repeat', type=int, default=3)
+    p.set_defaults(func=bench_sampler)
+
+    p = sub.add_parser('adaptive', help='adaptive early stop: label safety and analysis time saved')
+    video_args(p)
+    p.add_argument('--random', type=int, default=2000, help='random openness series checked for label changes')
+    p.set_defaults(func=bench_adaptive)
+
+    p = sub.add_parser('pipeline', help='decoder thread with a bounded ROI queue vs inline decoding')
+    video_args(p)
+    p.add_argument('--durations', type=lambda s: [float(v) for v in s.split(',')], default=[30.0, 60.0],
+                   help='lengths of the generated clips when --videos is not given')
+    p.add_argument('--queues', type=lambda s: [int(v) for v in s.split(',')], default=[2, 8, 32])
+    p.add_argument('--repeat', type=int, default=3)
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser('metrics', help='every registered openness metric: cost per frame and blink agreement')
+    video_args(p)
+    p.add_argument('--annotations', type=Path, help='CSV: filename[,blink_count][,label][,blink_times]')
+    p.add_argument('--metrics', type=lambda s: s.split(','), default=None)
+    p.set_defaults(func=bench_metrics)
+
+    p = sub.add_parser('roi', help='working-width ROI + recalibrated Canny vs the native-size ROI')
+    video_args(p)
+    p.add_argument('--heights', type=lambda s: [int(v) for v in s.split(',')], default=[480, 720, 1080, 2160])
+    p.add_argument('--canny', type=lambda s: [tuple(int(x) for x in v.split(':')) for v in s.split(',')],
+                   default=[], help='extra low:high Canny pairs to try at the working width')
+    p.set_defaults(func=bench_roi)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
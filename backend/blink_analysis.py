@@ -0,0 +1,939 @@
+"""
+NAYAN-AI - Dry eye blink analysis
+Video -> per-frame eye-openness signal (Canny edge density of a centre ROI)
+-> blink state machine -> blink rate / inter-blink interval screening label.
+
+Shared by the unified backend (/api/dryeye/upload) and the standalone
+dryeye/mobile_dry_eye_server.py.
+"""
+
+import os
+import time
+import heapq
+import queue
+import threading
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Video processing config
+MAX_VIDEO_SECONDS = 60          # we will analyze up to this much
+TARGET_FPS = 15                 # downsample for speed
+ROI_SCALE = 0.35                # center ROI scale (tune 0.25..0.45)
+ROI_WORK_WIDTH = 320            # ROI is resized to this width before scoring (0 = native size)
+
+# Openness metric config (Canny thresholds calibrated at ROI_WORK_WIDTH with
+# `bench_dryeye.py roi`; the native-size pipeline used 40 / 120)
+OPENNESS_METRIC = 'canny'       # any key of OPENNESS_METRICS (`bench_dryeye.py metrics` compares them)
+CANNY_LOW = 20
+CANNY_HIGH = 60
+SMOOTH_WINDOW = 7
+
+# Blink detection thresholds (tune)
+THRESH_K = 0.65                 # threshold = baseline * THRESH_K
+MIN_BLINK_MS = 80
+MAX_BLINK_MS = 350
+REFRACTORY_MS = 250
+
+# Dry eye decision thresholds (screening)
+MIN_BLINKS_PER_MIN = 10
+MAX_IBI_SECONDS = 10.0
+
+# Adaptive analysis: stop once the label is settled, or give up on a video
+# that still has no usable edge signal after NO_SIGNAL_SECONDS
+NO_SIGNAL_SECONDS = 10.0
+MIN_SIGNAL = 0.002              # baseline edge density below this is "no signal"
+# stop_reason values of an analysis that ended before the end of the video
+PARTIAL_STOP_REASONS = ('decided_risk', 'decided_normal', 'no_signal')
+
+# Frame sampling: 'grab' decodes skipped frames without converting them,
+# 'seek' jumps straight to each kept frame, 'read' is the original full read
+SAMPLING_MODE = 'grab'
+SAMPLING_MODES = ('read', 'grab', 'seek')
+SEEK_MIN_GAP = 16               # 'seek' only jumps over at least this many frames
+# ROIs a decoder thread prepares ahead of scoring (0 = decode inline; no overlap on one CPU)
+DECODE_QUEUE = 8 if (os.cpu_count() or 1) > 1 else 0
+
+
+def center_roi(frame_bgr, scale=0.35):
+    h, w = frame_bgr.shape[:2]
+    rh, rw = int(h * scale), int(w * scale)
+    y1 = (h - rh) // 2
+    x1 = (w - rw) // 2
+    roi = frame_bgr[y1:y1+rh, x1:x1+rw]
+    return roi
+
+
+def normalize_roi(roi_bgr, width=ROI_WORK_WIDTH):
+    """Grayscale ROI resized to `width` (aspect kept), so cost and metric scale do not depend on the phone."""
+    gray = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    if not width or w == width:
+        return gray
+    # Box-average by the integer part of the ratio first: INTER_AREA takes a much
+    # faster path for integer factors than for e.g. 1344 -> 320 in one go.
+    k = w // width
+    if k >= 2:
+        gray = cv2.resize(gray, (w // k, h // k), interpolation=cv2.INTER_AREA)
+        h, w = gray.shape[:2]
+    if w == width:
+        return gray
+    interp = cv2.INTER_AREA if w > width else cv2.INTER_LINEAR
+    return cv2.resize(gray, (width, max(1, round(h * width / w))), interpolation=interp)
+
+
+def frame_roi(frame_bgr, scale=ROI_SCALE, width=ROI_WORK_WIDTH):
+    """The normalized centre ROI that openness_metric() scores."""
+    return normalize_roi(center_roi(frame_bgr, scale=scale), width)
+
+
+# ---------- openness metrics ----------
+# Each metric maps a grayscale (frame_roi) or BGR ROI to a value that drops while
+# the eye is closed; the blink state machine only looks at relative dips.
+# Stateful metrics are classes, instantiated once per video by get_metric().
+OPENNESS_METRICS = {}
+
+
+def register_metric(name):
+    def register(metric):
+        OPENNESS_METRICS[name] = metric
+        return metric
+    return register
+
+
+def get_metric(name=None):
+    """A fresh `roi -> float` callable for metric `name` (default OPENNESS_METRIC)."""
+    name = name or OPENNESS_METRIC
+    if name not in OPENNESS_METRICS:
+        raise ValueError(f"Unknown openness metric: {name}")
+    metric = OPENNESS_METRICS[name]
+    return metric() if isinstance(metric, type) else metric
+
+
+def is_stateful_metric(name=None):
+    return isinstance(OPENNESS_METRICS.get(name or OPENNESS_METRIC), type)
+
+
+def _gray(roi):
+    return roi if roi.ndim == 2 else cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+
+
+@register_metric('canny')
+def openness_metric(roi, canny_low=None, canny_high=None):
+    """Canny edge density (0..1) of a grayscale (frame_roi) or BGR ROI."""
+    gray = cv2.GaussianBlur(_gray(roi), (5, 5), 0)
+    edges = cv2.Canny(gray, CANNY_LOW if canny_low is None else canny_low,
+                      CANNY_HIGH if canny_high is None else canny_high)
+    return float(np.mean(edges > 0))  # 0..1
+
+
+@register_metric('projection')
+def projection_metric(roi):
+    """Spread (0..1) of the row- and column-mean intensity profiles; a closed lid flattens both."""
+    gray = _gray(roi)
+    rows = cv2.reduce(gray, 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F)
+    cols = cv2.reduce(gray, 0, cv2.REDUCE_AVG, dtype=cv2.CV_32F)
+    return float(rows.std() + cols.std()) / 255.0
+
+
+@register_metric('vgrad')
+def vertical_gradient_metric(roi):
+    """Mean absolute vertical Sobel gradient (0..1) at quarter resolution.
+
+    Lid margins and the iris outline are mostly horizontal edges; two pyrDown
+    steps drop the skin texture and sensor noise that would otherwise dominate.
+    """
+    small = cv2.pyrDown(cv2.pyrDown(_gray(roi)))
+    dy = cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=3)
+    return float(cv2.mean(cv2.absdiff(dy, 0))[0]) / 1020.0
+
+
+@register_metric('framediff')
+class FrameDifferenceMetric:
+    """1 / (1 + mean |roi - reference| / scale) against a slowly updated open-eye reference.
+
+    The reference follows frames that differ little from it (lighting drift,
+    small movements) at rate `alpha` and anything else twenty times slower, so
+    a blink shows up as a dip instead of being absorbed.
+    """
+
+    def __init__(self, alpha=0.05, scale=8.0):
+        self.alpha = alpha
+        self.scale = scale
+        self.ref = None
+
+    def __call__(self, roi):
+        gray = _gray(roi).astype(np.float32)
+        if self.ref is None or self.ref.shape != gray.shape:
+            self.ref = gray
+            return 1.0
+        diff = float(cv2.mean(cv2.absdiff(gray, self.ref))[0])
+        cv2.accumulateWeighted(gray, self.ref, self.alpha if diff < self.scale else self.alpha / 20.0)
+        return 1.0 / (1.0 + diff / self.scale)
+
+
+def moving_average(values, window):
+    if len(values) == 0:
+        return 0.0
+    if len(values) < window:
+        return float(np.mean(values))
+    return float(np.mean(values[-window:]))
+
+
+class RollingMean:
+    """Mean of the last `window` values (of all of them while fewer), like moving_average().
+
+    Only the window is kept, in arrival order, so the result is bit-identical
+    to moving_average() over the full history at a cost independent of its length.
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, window):
+        self._values = deque(maxlen=max(1, int(window)))
+
+    def add(self, value) -> float:
+        self._values.append(value)
+        return float(np.mean(self._values))
+
+
+class RunningMedian:
+    """Median of every value added so far; two heaps, O(log n) per add, O(1) per query."""
+
+    __slots__ = ('_low', '_high')
+
+    def __init__(self):
+        self._low = []   # max-heap (negated) holding the smaller half
+        self._high = []  # min-heap holding the larger half
+
+    def __len__(self):
+        return len(self._low) + len(self._high)
+
+    def add(self, value):
+        if self._low and value > -self._low[0]:
+            heapq.heappush(self._high, value)
+        else:
+            heapq.heappush(self._low, -value)
+        if len(self._low) > len(self._high) + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+        elif len(self._high) > len(self._low):
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def median(self) -> float:
+        if len(self._low) > len(self._high):
+            return float(-self._low[0])
+        # Same arithmetic as np.median: mean of the two middle values.
+        return float((-self._low[0] + self._high[0]) / 2.0)
+
+
+class BlinkDetector:
+    """Blink state machine fed one openness value per kept frame.
+
+    Smoothing is a RollingMean over `smooth_window` frames; the baseline is the
+    mean of the smoothed history for the first 30 frames and its RunningMedian
+    afterwards, so every update costs the same no matter how long the video is.
+    Decisions are identical to the original per-frame np.median over the history.
+    """
+
+    BASELINE_MEDIAN_AFTER = 30
+
+    def __init__(self, target_fps=None, smooth_window=None, thresh_k=None,
+                 min_blink_ms=None, max_blink_ms=None, refractory_ms=None):
+        self.target_fps = target_fps or TARGET_FPS
+        self.thresh_k = THRESH_K if thresh_k is None else thresh_k
+        self.min_blink_ms = MIN_BLINK_MS if min_blink_ms is None else min_blink_ms
+        self.max_blink_ms = MAX_BLINK_MS if max_blink_ms is None else max_blink_ms
+        self.refractory_ms = REFRACTORY_MS if refractory_ms is None else refractory_ms
+
+        self._smooth = RollingMean(smooth_window or SMOOTH_WINDOW)
+        self._warmup_hist = []
+        self._median = RunningMedian()
+        self.baseline = None
+
+        self.in_blink = False
+        self.blink_start_ms = None
+        self.last_blink_end_ms = -10**9
+        self.blinks_end_times = []  # seconds in analysis timeline
+
+        self.last_blink_time_sec = None
+        self.max_ibi = 0.0
+        self.sum_ibi = 0.0
+        self.ibi_count = 0
+
+        self.eye_open_start_sec = 0.0
+        self.max_eye_open = 0.0
+
+        self.kept_idx = 0
+
+    @property
+    def blink_count(self) -> int:
+        return len(self.blinks_end_times)
+
+    def update(self, m) -> bool:
+        """Consume one openness value; returns True when it completed a valid blink."""
+        smooth = self._smooth.add(m)
+        self._median.add(smooth)
+        if len(self._median) > self.BASELINE_MEDIAN_AFTER:
+            self.baseline = self._median.median()
+        else:
+            self._warmup_hist.append(smooth)
+            self.baseline = float(np.mean(self._warmup_hist))
+
+        thr = self.baseline * self.thresh_k
+
+        # analysis timeline is based on kept frames at target_fps
+        now_sec = self.kept_idx / float(self.target_fps)
+        self.kept_idx += 1
+
+        # update max eye open duration
+        if not self.in_blink:
+            open_dur = now_sec - self.eye_open_start_sec
+            if open_dur > self.max_eye_open:
+                self.max_eye_open = open_dur
+
+        # blink state machine
+        now_ms = int(now_sec * 1000)
+
+        if not self.in_blink:
+            if smooth < thr and (now_ms - self.last_blink_end_ms) > self.refractory_ms:
+                self.in_blink = True
+                self.blink_start_ms = now_ms
+            return False
+
+        if smooth < thr:
+            return False
+
+        dur_ms = now_ms - self.blink_start_ms
+        self.in_blink = False
+        self.last_blink_end_ms = now_ms
+        if not (self.min_blink_ms <= dur_ms <= self.max_blink_ms):
+            return False
+
+        self.blinks_end_times.append(now_sec)
+        if self.last_blink_time_sec is not None:
+            ibi = now_sec - self.last_blink_time_sec
+            self.max_ibi = max(self.max_ibi, ibi)
+            self.sum_ibi += ibi
+            self.ibi_count += 1
+
+        self.last_blink_time_sec = now_sec
+        self.eye_open_start_sec = now_sec
+        return True
+
+    def settled(self, total_frames):
+        """(label, stop_reason) once no frame up to `total_frames` can change the label, else None.
+
+        `total_frames` must be a hard upper bound on the kept frames of the video
+        (max_frames: container frame counts are often under-reported). Future
+        blinks are bounded by one per (min_blink_ms + refractory_ms); the partial
+        result() carries the same label, so stopping here never changes it.
+        """
+        n = self.kept_idx
+        if n == 0:
+            return None
+        if self.max_ibi > MAX_IBI_SECONDS:
+            return "Dry Eye Risk", "decided_risk"
+
+        fps = float(self.target_fps)
+        total_frames = max(int(total_frames), n)
+        count = len(self.blinks_end_times)
+
+        # Normal: enough blinks for the full length and no room left for a long IBI.
+        if (self.last_blink_time_sec is not None
+                and count * 60.0 / (total_frames / fps) >= MIN_BLINKS_PER_MIN
+                and (total_frames - 1) / fps - self.last_blink_time_sec <= MAX_IBI_SECONDS):
+            return "Normal", "decided_normal"
+
+        # Risk: even a blink every cycle from now on keeps the rate too low,
+        # whether the video ends now or at total_frames (the bound is monotonic in between).
+        cycle_sec = max(self.min_blink_ms + self.refractory_ms, 2000.0 / fps) / 1000.0
+        for frames in (n, total_frames):
+            possible = count + 1 + (frames - n) / fps / cycle_sec
+            if possible * 60.0 / (frames / fps) >= MIN_BLINKS_PER_MIN:
+                return None
+        return "Dry Eye Risk", "decided_risk"
+
+    def no_signal(self) -> bool:
+        """True after NO_SIGNAL_SECONDS without a blink or a usable edge baseline."""
+        return (not self.blinks_end_times and self.baseline is not None
+                and self.kept_idx >= NO_SIGNAL_SECONDS * self.target_fps
+                and self.baseline < MIN_SIGNAL)
+
+    def result(self) -> dict:
+        duration_sec = self.kept_idx / float(self.target_fps) if self.kept_idx > 0 else 0.0
+        blink_count = len(self.blinks_end_times)
+        blink_rate_bpm = blink_count * (60.0 / max(duration_sec, 1e-6))
+        mean_ibi = (self.sum_ibi / self.ibi_count) if self.ibi_count > 0 else 0.0
+        return {
+            "duration_sec": duration_sec,
+            "blink_count": blink_count,
+            "blink_rate_bpm": blink_rate_bpm,
+            "mean_ibi_sec": mean_ibi,
+            "max_ibi_sec": self.max_ibi,
+            "max_eye_open_sec": self.max_eye_open,
+            "label": screening_label(blink_rate_bpm, self.max_ibi),
+        }
+
+
+def detect_blinks(series, **params) -> dict:
+    """Run a BlinkDetector over a recorded openness series."""
+    detector = BlinkDetector(**params)
+    for m in series:
+        detector.update(float(m))
+    return detector.result()
+
+
+def screening_label(blink_rate_bpm, max_ibi):
+    risk = (blink_rate_bpm < MIN_BLINKS_PER_MIN) or (max_ibi > MAX_IBI_SECONDS)
+    return "Dry Eye Risk" if risk else "Normal"
+
+
+def _sampling_plan(cap):
+    """(frame_step, max_frames, expected_kept) for downsampling an opened capture to TARGET_FPS.
+
+    Kept frame k is source frame (k + 1) * frame_step - 1 (0-based). expected_kept
+    is 0 when the container does not report a frame count.
+    """
+    src_fps = cap.get(cv2.CAP_PROP_FPS)
+    if not src_fps or src_fps <= 1:
+        src_fps = 30.0
+
+    frame_step = max(1, int(round(src_fps / TARGET_FPS)))
+    max_frames = int(MAX_VIDEO_SECONDS * TARGET_FPS)
+    src_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    expected_kept = min(max_frames, src_frames // frame_step) if src_frames > 0 else 0
+    return frame_step, max_frames, expected_kept
+
+
+def sample_frames(cap, frame_step, count, mode=None, start_src=0):
+    """Yield up to `count` kept frames (every frame_step-th source frame) of an opened capture.
+
+    `cap` must be positioned at source frame `start_src`; the frames yielded are
+    start_src + (k + 1) * frame_step - 1, the same ones a read() + modulo loop keeps.
+    'grab' only decodes the skipped frames (no BGR conversion / copy). 'seek'
+    positions the capture on each kept frame when frame_step is at least
+    SEEK_MIN_GAP (a seek re-decodes from the previous keyframe, so shorter jumps
+    are grabbed) and drops back to 'grab' once the container does not land
+    exactly where asked.
+    """
+    mode = mode or SAMPLING_MODE
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {mode}")
+
+    if mode == 'read':
+        frame_idx = 0
+        kept = 0
+        while kept < count:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            frame_idx += 1
+            if (frame_idx % frame_step) != 0:
+                continue
+            kept += 1
+            yield frame
+        return
+
+    if mode == 'seek' and frame_step < SEEK_MIN_GAP:
+        mode = 'grab'
+
+    pos = start_src
+    for k in range(count):
+        target = start_src + (k + 1) * frame_step - 1
+        if mode == 'seek' and target > pos:
+            if cap.set(cv2.CAP_PROP_POS_FRAMES, target) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == target:
+                pos = target
+            else:
+                # Inexact seek: the position is unknown now, restart from a known one.
+                cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+                if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != pos:
+                    raise RuntimeError("Video container does not support seeking.")
+                mode = 'grab'
+        while pos < target:
+            if not cap.grab():
+                return
+            pos += 1
+        if not cap.grab():
+            return
+        pos += 1
+        ok, frame = cap.retrieve()
+        if not ok:
+            return
+        yield frame
+
+
+_END = object()
+
+
+def iter_rois(cap, frame_step, count, sampling=None, queue_size=None, scale=ROI_SCALE, start_src=0):
+    """Yield frame_roi() of up to `count` kept frames (see sample_frames).
+
+    With queue_size > 0 (default DECODE_QUEUE) a decoder thread decodes and
+    crops ahead into a bounded queue while the caller scores; OpenCV releases
+    the GIL, so decoding overlaps openness_metric(). Close the generator (or
+    exhaust it) before releasing `cap`.
+    """
+    queue_size = DECODE_QUEUE if queue_size is None else queue_size
+    frames = sample_frames(cap, frame_step, count, sampling, start_src=start_src)
+    if queue_size <= 0:
+        for frame in frames:
+            yield frame_roi(frame, scale=scale)
+        return
+
+    rois = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                rois.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode():
+        try:
+            for frame in frames:
+                if not put(frame_roi(frame, scale=scale)):
+                    return
+        except Exception as e:
+            put(e)
+        put(_END)
+
+    decoder = threading.Thread(target=decode, name='dryeye-decode', daemon=True)
+    decoder.start()
+    try:
+        while True:
+            item = rois.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        decoder.join()
+
+
+def analyze_video(video_path: Path, progress=None, store=None, sampling=None, adaptive=False, queue_size=None,
+                  metric=None):
+    """Run the blink state machine over up to MAX_VIDEO_SECONDS of `video_path`.
+
+    `progress`, if given, is called about once per analysed second as
+    progress(fraction, info_dict) with the running blink count. With an
+    OpennessStore as `store`, the openness series is saved under the video name
+    together with its stop_reason (a series cut short by `adaptive` is partial).
+    `sampling` overrides SAMPLING_MODE and `queue_size` DECODE_QUEUE (decoding
+    runs on its own thread unless 0), `metric` OPENNESS_METRIC. With `adaptive`, decoding stops as soon
+    as the label is settled (BlinkDetector.settled) or the video has no usable
+    signal; the result then covers the analysed part only. `stop_reason` says
+    why the analysis ended.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError("Could not open uploaded video.")
+
+    frame_step, max_frames, expected_kept = _sampling_plan(cap)
+    total_frames = expected_kept or max_frames  # progress estimate only
+
+    score = get_metric(metric)
+    detector = BlinkDetector()
+    series = [] if store is not None else None
+
+    kept_idx = 0
+    stop_reason = None
+    t0 = time.time()
+
+    rois = iter_rois(cap, frame_step, max_frames, sampling, queue_size)
+    for roi in rois:
+        m = score(roi)
+        detector.update(m)
+        if series is not None:
+            series.append(m)
+        kept_idx += 1
+
+        if progress is not None and kept_idx % TARGET_FPS == 0:
+            progress(min(kept_idx / total_frames, 0.99), {
+                'analysed_sec': round(kept_idx / float(TARGET_FPS), 1),
+                'blink_count': detector.blink_count,
+            })
+
+        if adaptive and kept_idx < max_frames:
+            stop_reason = _adaptive_stop(detector, max_frames)
+            if stop_reason:
+                break
+
+    rois.close()
+    cap.release()
+
+    out = detector.result()
+    out["stop_reason"] = stop_reason or ("max_duration" if kept_idx >= max_frames else "end_of_video")
+    out["analysis_sec"] = round(time.time() - t0, 3)
+    if store is not None:
+        store.save(Path(video_path).name, series, video_file=Path(video_path).name, result=out,
+                   stop_reason=out["stop_reason"], frames_expected=expected_kept or None)
+    return out
+
+
+def _adaptive_stop(detector, total_frames):
+    """Reason to stop decoding now ('decided_risk' / 'decided_normal' / 'no_signal'), else None.
+
+    `total_frames` is max_frames, not the container frame count: a video that
+    runs past an under-reported count could still change a "settled" label.
+    """
+    if detector.no_signal():
+        return "no_signal"
+    decided = detector.settled(total_frames)
+    return decided[1] if decided else None
+
+
+class StreamingBlinkAnalyzer:
+    """Incremental analyze_video() for frames that arrive live (Socket.IO camera stream).
+
+    Frames are placed on the TARGET_FPS timeline by their arrival time: a frame
+    that arrives before the next tick is not needed (the caller checks due()
+    before decoding and reports dropped frames with skip_frame()) and ticks missed by a slow sender repeat the last value, so
+    durations and IBIs stay in real seconds. After MAX_VIDEO_SECONDS further
+    frames are ignored and `done` is set.
+    """
+
+    def __init__(self, metric=None, keep_series=False):
+        self.score = get_metric(metric)
+        self.detector = BlinkDetector()
+        self.max_frames = int(MAX_VIDEO_SECONDS * TARGET_FPS)
+        self.series = [] if keep_series else None
+        self.started_at = None
+        self.frames_received = 0
+        self.frames_scored = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.detector.kept_idx >= self.max_frames
+
+    def _ticks_due(self, now):
+        if self.started_at is None:
+            return 1
+        due = int((now - self.started_at) * TARGET_FPS) + 1
+        return min(due, self.max_frames) - self.detector.kept_idx
+
+    def due(self, now=None) -> bool:
+        """Whether a frame arriving at `now` would be scored."""
+        return self._ticks_due(time.time() if now is None else now) > 0
+
+    def skip_frame(self):
+        """Count a frame the caller dropped undecoded because due() was False."""
+        with self._lock:
+            self.frames_received += 1
+
+    def add_frame(self, frame_bgr, now=None) -> bool:
+        """Score one frame if a tick is due; returns True when a blink was completed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.frames_received += 1
+            ticks = self._ticks_due(now)
+            if ticks <= 0:
+                return False
+            if self.started_at is None:
+                self.started_at = now
+            m = self.score(frame_roi(frame_bgr))
+            self.frames_scored += 1
+            blinked = False
+            # Hold the previous value over ticks the sender missed.
+            for value in [self._last] * (ticks - 1) + [m]:
+                if value is None:
+                    continue
+                blinked |= self.detector.update(value)
+                if self.series is not None:
+                    self.series.append(value)
+            self._last = m
+            return blinked
+
+    def live(self) -> dict:
+        """Running stats for the client: blink count/rate and IBIs so far."""
+        with self._lock:
+            d = self.detector
+            elapsed = d.kept_idx / float(d.target_fps)
+            times = d.blinks_end_times
+            settled = d.settled(self.max_frames)
+            return {
+                'elapsed_sec': round(elapsed, 2),
+                'blink_count': d.blink_count,
+                'blink_rate_bpm': round(d.blink_count * 60.0 / elapsed, 2) if elapsed > 0 else 0.0,
+                'last_ibi_sec': round(times[-1] - times[-2], 2) if len(times) > 1 else None,
+                'mean_ibi_sec': round(d.sum_ibi / d.ibi_count, 2) if d.ibi_count else None,
+                'max_ibi_sec': round(d.max_ibi, 2),
+                'settled_label': settled[0] if settled else None,
+                'done': self.done,
+            }
+
+    def result(self) -> dict:
+        """Final result in analyze_video() form, available as soon as the stream stops."""
+        with self._lock:
+            out = self.detector.result()
+            out["stop_reason"] = "max_duration" if self.done else "stream_stopped"
+            out["frames_received"] = self.frames_received
+            out["frames_scored"] = self.frames_scored
+            return out
+
+
+def redetect(series, target_fps=None, smooth_window=None, thresh_k=None,
+             min_blink_ms=None, max_blink_ms=None, refractory_ms=None) -> dict:
+    """Vectorised equivalent of detect_blinks() for re-tuning on stored series.
+
+    Smoothing, baseline, threshold and timeline are computed as arrays with
+    the same arithmetic as BlinkDetector, so the result is identical; only the
+    blink events themselves are walked in Python (one step per blink, not per frame).
+    """
+    fps = float(target_fps or TARGET_FPS)
+    window = max(1, int(smooth_window or SMOOTH_WINDOW))
+    thresh_k = THRESH_K if thresh_k is None else thresh_k
+    min_blink_ms = MIN_BLINK_MS if min_blink_ms is None else min_blink_ms
+    max_blink_ms = MAX_BLINK_MS if max_blink_ms is None else max_blink_ms
+    refractory_ms = REFRACTORY_MS if refractory_ms is None else refractory_ms
+
+    x = np.asarray(series, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        return BlinkDetector(target_fps=fps).result()
+
+    # RollingMean: plain mean while fewer than `window` values, then sliding windows.
+    head = [float(np.mean(x[:k])) for k in range(1, min(window, n + 1))]
+    smooth = np.empty(n, dtype=np.float64)
+    smooth[:len(head)] = head
+    if n >= window:
+        smooth[window - 1:] = sliding_window_view(x, window).mean(axis=1)
+
+    # Baseline: running mean for the first 30 frames, running median afterwards.
+    warm = BlinkDetector.BASELINE_MEDIAN_AFTER
+    baseline = np.empty(n, dtype=np.float64)
+    smooth_list = smooth.tolist()
+    for k in range(min(warm, n)):
+        baseline[k] = float(np.mean(smooth_list[:k + 1]))
+    if n > warm:
+        median = RunningMedian()
+        for k, v in enumerate(smooth_list):
+            median.add(v)
+            if k >= warm:
+                baseline[k] = median.median()
+
+    below = smooth < baseline * thresh_k
+    now_sec = np.arange(n) / fps
+    now_ms = (now_sec * 1000).astype(np.int64)
+
+    # next_below[i] / next_above[i]: first index >= i that is (not) below threshold, n if none.
+    idx = np.arange(n)
+    next_below = np.minimum.accumulate(np.where(below, idx, n)[::-1])[::-1]
+    next_above = np.minimum.accumulate(np.where(~below, idx, n)[::-1])[::-1]
+
+    in_blink = np.zeros(n + 1, dtype=np.int32)  # +1 at frame after start, -1 after end
+    blink_ends = []
+    last_end_ms = -10**9
+    i = 0
+    while i < n:
+        # refractory: start only once now_ms - last_end_ms > refractory_ms
+        i = max(i, int(np.searchsorted(now_ms, last_end_ms + refractory_ms, side='right')))
+        if i >= n:
+            break
+        start = int(next_below[i])
+        if start >= n:
+            break
+        end = int(next_above[start + 1]) if start + 1 < n else n
+        in_blink[start + 1] += 1
+        if end >= n:
+            in_blink[n] -= 1
+            break
+        in_blink[end + 1] -= 1
+        last_end_ms = int(now_ms[end])
+        if min_blink_ms <= last_end_ms - int(now_ms[start]) <= max_blink_ms:
+            blink_ends.append(end)
+        i = end + 1
+
+    max_ibi = 0.0
+    sum_ibi = 0.0
+    ibi_count = 0
+    for prev, cur in zip(blink_ends, blink_ends[1:]):
+        ibi = float(now_sec[cur]) - float(now_sec[prev])
+        max_ibi = max(max_ibi, ibi)
+        sum_ibi += ibi
+        ibi_count += 1
+
+    # Eye-open duration is measured on frames not inside a blink, from the last valid blink end.
+    open_mask = np.cumsum(in_blink[:n]) == 0
+    ends = np.asarray(blink_ends, dtype=np.int64)
+    last = np.searchsorted(ends, idx, side='left') - 1
+    open_start = np.where(last >= 0, now_sec[ends[np.maximum(last, 0)]] if len(ends) else 0.0, 0.0)
+    open_dur = (now_sec - open_start)[open_mask]
+    max_eye_open = max(0.0, float(open_dur.max())) if len(open_dur) else 0.0
+
+    duration_sec = n / fps
+    blink_count = len(blink_ends)
+    blink_rate_bpm = blink_count * (60.0 / max(duration_sec, 1e-6))
+    return {
+        "duration_sec": duration_sec,
+        "blink_count": blink_count,
+        "blink_rate_bpm": blink_rate_bpm,
+        "mean_ibi_sec": (sum_ibi / ibi_count) if ibi_count > 0 else 0.0,
+        "max_ibi_sec": max_ibi,
+        "max_eye_open_sec": max_eye_open,
+        "label": screening_label(blink_rate_bpm, max_ibi),
+    }
+
+
+# ============== SEGMENT-PARALLEL ANALYSIS ==============
+# Decoding + the openness metric dominate the cost and are independent per
+# frame, so a video is cut into contiguous runs of kept frames that worker
+# processes score in parallel. The state machine then runs once over the
+# stitched series, so baseline, smoothing and refractory state carry across
+# segment boundaries exactly as in the sequential pass (no overlap needed).
+MIN_SEGMENT_SECONDS = 3.0
+
+_process_pool = None
+_process_pool_workers = None
+_process_pool_lock = threading.Lock()
+
+
+def segment_openness(video_path, first_kept, end_kept, frame_step, roi_scale=ROI_SCALE, sampling=None,
+                     queue_size=None, metric=None):
+    """Openness of kept frames [first_kept, end_kept) (float64; shorter if the video ends)."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError("Could not open uploaded video.")
+
+    # Start frame_step - 1 frames before the first kept frame so the sampler
+    # keeps the same source frames as the sequential pass.
+    start_src = first_kept * frame_step
+    if start_src > 0:
+        seeked = cap.set(cv2.CAP_PROP_POS_FRAMES, start_src)
+        if not seeked or int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start_src:
+            # Container cannot seek exactly: decode forward from the start instead.
+            cap.release()
+            cap = cv2.VideoCapture(str(video_path))
+            for _ in range(start_src):
+                if not cap.grab():
+                    break
+
+    rois = iter_rois(cap, frame_step, end_kept - first_kept, sampling, queue_size,
+                     scale=roi_scale, start_src=start_src)
+    score = get_metric(metric)
+    values = [score(roi) for roi in rois]
+    cap.release()
+    return np.asarray(values, dtype=np.float64)
+
+
+def openness_series(video_path, sampling=None, metric=None):
+    """Sequential per-kept-frame openness values, exactly as analyze_video() samples them."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError("Could not open uploaded video.")
+    frame_step, max_frames, _ = _sampling_plan(cap)
+    cap.release()
+    return segment_openness(video_path, 0, max_frames, frame_step, sampling=sampling, metric=metric)
+
+
+def _get_process_pool(workers):
+    """Shared spawn-based process pool (safe to create from a threaded server)."""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is not None and _process_pool_workers != workers:
+            _process_pool.shutdown(wait=True)
+            _process_pool = None
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'))
+            _process_pool_workers = workers
+        return _process_pool
+
+
+def plan_segments(expected_kept, max_frames, workers, min_segment_seconds=MIN_SEGMENT_SECONDS):
+    """[(first_kept, end_kept), ...] covering the video; the last segment runs to EOF / max_frames."""
+    min_frames = max(1, int(min_segment_seconds * TARGET_FPS))
+    n = max(1, min(int(workers), expected_kept // min_frames))
+    bounds = [round(i * expected_kept / n) for i in range(n + 1)]
+    bounds[-1] = max_frames
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def analyze_video_parallel(video_path: Path, workers=4, progress=None, store=None, sampling=None, adaptive=False,
+                           queue_size=None, metric=None):
+    """analyze_video() with decoding/scoring split across `workers` processes.
+
+    Falls back to the sequential path for short videos, containers without a
+    frame count and stateful metrics (their history would restart in every
+    segment). Results are identical to analyze_video(). With `adaptive`,
+    completed segments are fed to the state machine in order and segments that
+    have not started yet are cancelled once the label is settled.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError("Could not open uploaded video.")
+    frame_step, max_frames, expected_kept = _sampling_plan(cap)
+    cap.release()
+
+    segments = plan_segments(expected_kept, max_frames, workers) if expected_kept else []
+    if workers <= 1 or len(segments) < 2 or is_stateful_metric(metric):
+        return analyze_video(video_path, progress=progress, store=store, sampling=sampling, adaptive=adaptive,
+                             queue_size=queue_size, metric=metric)
+
+    t0 = time.time()
+    pool = _get_process_pool(workers)
+    futures = {
+        pool.submit(segment_openness, str(video_path), first, end, frame_step, ROI_SCALE,
+                    sampling or SAMPLING_MODE, DECODE_QUEUE if queue_size is None else queue_size,
+                    metric or OPENNESS_METRIC): i
+        for i, (first, end) in enumerate(segments)
+    }
+    parts = [None] * len(segments)
+    done_frames = 0
+
+    # The state machine consumes the contiguous prefix of finished segments.
+    detector = BlinkDetector()
+    series = []
+    fed = 0
+    stop_reason = None
+    for fut in as_completed(futures):
+        i = futures[fut]
+        parts[i] = fut.result()
+        done_frames += len(parts[i])
+        if progress is not None:
+            progress(min(done_frames / expected_kept, 0.99), {
+                'analysed_sec': round(done_frames / float(TARGET_FPS), 1),
+                'segments_done': sum(p is not None for p in parts),
+                'segments': len(segments),
+            })
+
+        while stop_reason is None and fed < len(segments) and parts[fed] is not None:
+            (first, end), part = segments[fed], parts[fed]
+            fed += 1
+            for k, m in enumerate(part):
+                detector.update(float(m))
+                if adaptive and detector.kept_idx < max_frames:
+                    stop_reason = _adaptive_stop(detector, max_frames)
+                    if stop_reason:
+                        part = part[:k + 1]
+                        break
+            series.append(part)
+            # A segment that came up short (frame count over-reported) ends the video.
+            if stop_reason is None and len(part) < end - first:
+                stop_reason = "end_of_video"
+        if stop_reason is not None:
+            for other in futures:
+                other.cancel()
+            break
+
+    series = np.concatenate(series)
+    out = detector.result()
+    if stop_reason is None:
+        stop_reason = "max_duration" if detector.kept_idx >= max_frames else "end_of_video"
+    out["stop_reason"] = stop_reason
+    out["analysis_sec"] = round(time.time() - t0, 3)
+    if store is not None:
+        store.save(Path(video_path).name, series, video_file=Path(video_path).name, result=out,
+                   stop_reason=stop_reason, frames_expected=expected_kept)
+    return out
@@ -0,0 +1,131 @@
+"""
+NAYAN-AI - Dry eye reference detector and synthetic inputs
+The original full-history blink state machine and the synthetic openness
+traces / blink videos that bench_dryeye.py and the tests in tests/ check the
+fast paths of blink_analysis against. Kept in one place so the benchmarks and
+the tests cannot drift apart.
+"""
+
+import cv2
+import numpy as np
+
+import blink_analysis
+from blink_analysis import moving_average, screening_label
+
+
+def legacy_detect(series):
+    """The original analyze_video state machine: moving_average + np.median over the whole history."""
+    metrics = []
+    smooth_hist = []
+    in_blink = False
+    blink_start_ms = None
+    last_blink_end_ms = -10**9
+    blinks_end_times = []
+    last_blink_time_sec = None
+    max_ibi = 0.0
+    sum_ibi = 0.0
+    ibi_count = 0
+    eye_open_start_sec = 0.0
+    max_eye_open = 0.0
+    fps = float(blink_analysis.TARGET_FPS)
+
+    for kept_idx, m in enumerate(series):
+        metrics.append(float(m))
+        smooth = moving_average(metrics, blink_analysis.SMOOTH_WINDOW)
+        smooth_hist.append(smooth)
+        if len(smooth_hist) > 30:
+            baseline = float(np.median(smooth_hist))
+        else:
+            baseline = float(np.mean(smooth_hist))
+        thr = baseline * blink_analysis.THRESH_K
+
+        now_sec = kept_idx / fps
+        if not in_blink:
+            max_eye_open = max(max_eye_open, now_sec - eye_open_start_sec)
+        now_ms = int(now_sec * 1000)
+        if not in_blink:
+            if smooth < thr and (now_ms - last_blink_end_ms) > blink_analysis.REFRACTORY_MS:
+                in_blink = True
+                blink_start_ms = now_ms
+        elif smooth >= thr:
+            dur_ms = now_ms - blink_start_ms
+            in_blink = False
+            last_blink_end_ms = now_ms
+            if blink_analysis.MIN_BLINK_MS <= dur_ms <= blink_analysis.MAX_BLINK_MS:
+                blinks_end_times.append(now_sec)
+                if last_blink_time_sec is not None:
+                    ibi = now_sec - last_blink_time_sec
+                    max_ibi = max(max_ibi, ibi)
+                    sum_ibi += ibi
+                    ibi_count += 1
+                last_blink_time_sec = now_sec
+                eye_open_start_sec = now_sec
+
+    duration_sec = len(series) / fps if len(series) else 0.0
+    blink_count = len(blinks_end_times)
+    blink_rate_bpm = blink_count * (60.0 / max(duration_sec, 1e-6))
+    return {
+        "duration_sec": duration_sec,
+        "blink_count": blink_count,
+        "blink_rate_bpm": blink_rate_bpm,
+        "mean_ibi_sec": (sum_ibi / ibi_count) if ibi_count else 0.0,
+        "max_ibi_sec": max_ibi,
+        "max_eye_open_sec": max_eye_open,
+        "label": screening_label(blink_rate_bpm, max_ibi),
+    }
+
+
+def synthetic_series(n, seed=0, fps=15, gap=(2, 6)):
+    """Noisy openness trace with ~150-300 ms dips every gap[0]-gap[1] s."""
+    rng = np.random.default_rng(seed)
+    x = 0.02 + rng.normal(0, 0.0015, n)
+    i = int(rng.integers(10, 60))
+    while i < n:
+        x[i:i + int(rng.integers(2, 6))] *= rng.uniform(0.2, 0.5)
+        i += int(rng.uniform(*gap) * fps)
+    return x.clip(0.0)
+
+
+def eye_frames(size=(640, 360), seed=0, iris_spokes=0):
+    """(open, closed) BGR frames of a drawn eye at `size` (width, height).
+
+    `iris_spokes` draws that many radial lines across the iris (more edge texture).
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    skin = np.full((h, w, 3), (150, 170, 200), np.uint8) + rng.integers(0, 20, (h, w, 1), dtype=np.uint8)
+    open_eye = skin.copy()
+    cv2.ellipse(open_eye, (w // 2, h // 2), (w // 8, h // 10), 0, 0, 360, (240, 240, 240), -1)
+    cv2.circle(open_eye, (w // 2, h // 2), h // 14, (60, 40, 20), -1)
+    cv2.circle(open_eye, (w // 2, h // 2), h // 30, (0, 0, 0), -1)
+    for k in range(iris_spokes):
+        a = k * 2 * np.pi / iris_spokes
+        tip = (int(w // 2 + np.cos(a) * h // 14), int(h // 2 + np.sin(a) * h // 14))
+        cv2.line(open_eye, (w // 2, h // 2), tip, (90, 70, 40), 1)
+    closed_eye = skin.copy()
+    cv2.line(closed_eye, (w // 2 - w // 8, h // 2), (w // 2 + w // 8, h // 2), (80, 80, 110), 3)
+    return open_eye, closed_eye
+
+
+def write_eye_video(path, blinks, seconds, fps=15, size=(640, 360), blink_ms=340, seed=0, flicker=0.0,
+                    iris_spokes=0):
+    """MP4 of a drawn eye that closes for `blink_ms` at each time in `blinks` (seconds).
+
+    340 ms closures survive the SMOOTH_WINDOW smoothing below THRESH_K and stay
+    under MAX_BLINK_MS, so every drawn blink is detected. `flicker` modulates the
+    brightness by that fraction with a 4 s period (room lighting, auto exposure).
+    """
+    rng = np.random.default_rng(seed)
+    open_eye, closed_eye = eye_frames(size, seed, iris_spokes)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(int(seconds * fps)):
+        ts = i / fps
+        closed = any(b <= ts < b + blink_ms / 1000.0 for b in blinks)
+        # small camera shake so consecutive frames are not identical
+        dx, dy = rng.integers(-3, 4, 2)
+        frame = np.roll(closed_eye if closed else open_eye, (int(dy), int(dx)), axis=(0, 1))
+        if flicker:
+            frame = cv2.convertScaleAbs(frame, alpha=1.0 + flicker * np.sin(2 * np.pi * ts / 4.0))
+        writer.write(frame)
+    writer.release()
+    return path
@@ -0,0 +1,343 @@
+"""
+NAYAN-AI - Calibrate the rule-based cataract thresholds (Tc, Ts)
+The rule in extract_cataract_features / cataract_label flags
+"Possible Cataract Risk" when contrast C < Tc AND sharpness S < Ts.
+This tool loads every logged (C, S, E) into NumPy arrays and scores a dense
+(Tc, Ts) grid against reference labels in one vectorised pass:
+
+    each sample is binned once with searchsorted; a 2-D histogram of
+    (C bin, S bin) is cumulatively summed along both axes, which gives
+    #{C < Tc_i and S < Ts_j} for every grid cell at once.
+
+Cost is O(N + grid), so 100k-row logs take well under a second.
+
+Reference labels, in order of preference:
+    --labels FILE   clinician labels, CSV with filename,label columns
+    the DL label    cataract_results.label (DL-mapped) for --db rows, or
+                    cataract_dl_log.csv (--dl-log) joined by file name for --csv rows
+The rule-based label logged in cataract_log.csv is never used as ground truth.
+
+Usage (from backend/):
+    python calibrate_cataract_thresholds.py --db nayan_ai.db
+    python calibrate_cataract_thresholds.py --csv catract/cataract_log.csv --dl-log catract/cataract_dl_log.csv
+    python calibrate_cataract_thresholds.py --db nayan_ai.db --labels clinician.csv --out grid.csv
+    python calibrate_cataract_thresholds.py --synthetic 100000       # timing demo
+"""
+
+import os
+import sys
+import csv
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+CURRENT_TC = 22.0
+CURRENT_TS = 120.0
+
+_POSITIVE = {'cataract', 'possible cataract risk', 'risk', 'positive', '1', 'true', 'yes'}
+_NEGATIVE = {'normal', 'negative', '0', 'false', 'no'}
+
+
+def label_to_int(label):
+    """1 = cataract risk, 0 = normal, None = unknown."""
+    if label is None:
+        return None
+    key = str(label).strip().lower()
+    if key in _POSITIVE:
+        return 1
+    if key in _NEGATIVE:
+        return 0
+    return None
+
+
+def _basename(path):
+    return os.path.basename(str(path).replace('\\', '/'))
+
+
+# ============== LOADING ==============
+def load_db_rows(db_path):
+    """(filename, C, S, E, DL label) from cataract_results."""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            'SELECT image_file, contrast, sharpness, edge_strength, label FROM cataract_results '
+            'WHERE contrast IS NOT NULL AND sharpness IS NOT NULL'
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(_basename(f or ''), c, s, e, label) for f, c, s, e, label in rows]
+
+
+def load_csv_rows(csv_path):
+    """(filename, C, S, E, None) from cataract_log.csv.
+
+    The log has two layouts (6 columns from the first server version,
+    10 columns with debug file / thresholds / ROI scale), so rows are
+    parsed by width rather than by header.
+    """
+    rows = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for rec in csv.reader(f):
+            try:
+                if len(rec) >= 10:
+                    rows.append((_basename(rec[1]), float(rec[3]), float(rec[4]), float(rec[5]), None))
+                elif len(rec) >= 6:
+                    rows.append((_basename(rec[1]), float(rec[2]), float(rec[3]), float(rec[4]), None))
+            except ValueError:
+                continue  # header
+    return rows
+
+
+def load_label_map(path, label_column='label', file_column=None):
+    """{basename: 0/1} from a CSV with a file-name column and a label column."""
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        if file_column is None:
+            file_column = next((c for c in ('filename', 'upload_file', 'image_file', 'file') if c in fields), fields[0])
+        for rec in reader:
+            y = label_to_int(rec.get(label_column))
+            if y is not None:
+                labels[_basename(rec[file_column])] = y
+    return labels
+
+
+def build_arrays(rows, label_map=None):
+    """Stack rows into C, S, E, y arrays, keeping only rows with a known reference label."""
+    C, S, E, y = [], [], [], []
+    for filename, c, s, e, own_label in rows:
+        target = label_map.get(filename) if label_map is not None else None
+        if target is None:
+            target = label_to_int(own_label)
+        if target is None:
+            continue
+        C.append(c)
+        S.append(s)
+        E.append(e if e is not None else np.nan)
+        y.append(target)
+    return (np.asarray(C, dtype=np.float64), np.asarray(S, dtype=np.float64),
+            np.asarray(E, dtype=np.float64), np.asarray(y, dtype=np.int8))
+
+
+def synthetic_rows(n, seed=0):
+    """Two overlapping clusters shaped like the logged metrics, for timing runs."""
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < 0.3).astype(np.int8)
+    C = np.where(y == 1, rng.normal(18, 6, n), rng.normal(45, 12, n)).clip(0)
+    S = np.where(y == 1, rng.lognormal(4.0, 0.6, n), rng.lognormal(5.5, 0.8, n))
+    E = np.where(y == 1, rng.normal(15, 5, n), rng.normal(35, 12, n)).clip(0)
+    return C, S, E, y
+
+
+# ============== GRID EVALUATION ==============
+def default_grid(values, steps):
+    """`steps` thresholds from 0 to just above the 99.5th percentile of `values`."""
+    hi = float(np.percentile(values, 99.5)) * 1.05 if len(values) else 1.0
+    return np.linspace(0.0, max(hi, 1e-6), steps)
+
+
+def evaluate_grid(C, S, y, tc_grid, ts_grid):
+    """Confusion counts for every (Tc_i, Ts_j); each returned array has shape (len(tc), len(ts))."""
+    tc_grid = np.asarray(tc_grid, dtype=np.float64)
+    ts_grid = np.asarray(ts_grid, dtype=np.float64)
+    m, n = len(tc_grid), len(ts_grid)
+
+    # First grid index whose threshold exceeds the value: the sample is
+    # "below threshold" for that index and every larger one.
+    ci = np.searchsorted(tc_grid, C, side='right')
+    si = np.searchsorted(ts_grid, S, side='right')
+
+    def below_counts(mask):
+        hist = np.bincount(ci[mask] * (n + 1) + si[mask], minlength=(m + 1) * (n + 1))
+        hist = hist.reshape(m + 1, n + 1)[:m, :n]
+        return hist.cumsum(axis=0).cumsum(axis=1)
+
+    pos = y == 1
+    tp = below_counts(pos)
+    fp = below_counts(~pos)
+    n_pos, n_neg = int(pos.sum()), int((~pos).sum())
+    return {
+        'tc': tc_grid,
+        'ts': ts_grid,
+        'tp': tp,
+        'fp': fp,
+        'fn': n_pos - tp,
+        'tn': n_neg - fp,
+        'n_pos': n_pos,
+        'n_neg': n_neg,
+    }
+
+
+def grid_metrics(grid):
+    tp, fp, fn, tn = (grid[k].astype(np.float64) for k in ('tp', 'fp', 'fn', 'tn'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tpr = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        fpr = np.where(fp + tn > 0, fp / (fp + tn), 0.0)
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        f1 = np.where(precision + tpr > 0, 2 * precision * tpr / (precision + tpr), 0.0)
+    accuracy = (tp + tn) / max(tp[0, 0] + fp[0, 0] + fn[0, 0] + tn[0, 0], 1)
+    return {'tpr': tpr, 'fpr': fpr, 'precision': precision, 'f1': f1,
+            'accuracy': accuracy, 'youden': tpr - fpr}
+
+
+def single_point(C, S, y, tc, ts):
+    """Metrics of one (Tc, Ts) pair, computed directly (reference for the grid)."""
+    pred = (C < tc) & (S < ts)
+    pos = y == 1
+    tp, fp = int((pred & pos).sum()), int((pred & ~pos).sum())
+    fn, tn = int((~pred & pos).sum()), int((~pred & ~pos).sum())
+    return {
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'tpr': tp / (tp + fn) if tp + fn else 0.0,
+        'fpr': fp / (fp + tn) if fp + tn else 0.0,
+    }
+
+
+# ============== REPORTING ==============
+def _row(grid, metrics, i, j):
+    return {
+        'Tc': float(grid['tc'][i]), 'Ts': float(grid['ts'][j]),
+        'tp': int(grid['tp'][i, j]), 'fp': int(grid['fp'][i, j]),
+        'fn': int(grid['fn'][i, j]), 'tn': int(grid['tn'][i, j]),
+        **{k: float(v[i, j]) for k, v in metrics.items()},
+    }
+
+
+def best_operating_points(grid, metrics, min_sensitivity=0.9, max_fpr=0.1):
+    points = {}
+    for name, score in (('max_youden', metrics['youden']), ('max_f1', metrics['f1']),
+                        ('max_accuracy', metrics['accuracy'])):
+        i, j = np.unravel_index(int(np.argmax(score)), score.shape)
+        points[name] = _row(grid, metrics, i, j)
+
+    ok = metrics['tpr'] >= min_sensitivity
+    if ok.any():
+        spec = np.where(ok, 1.0 - metrics['fpr'], -1.0)
+        i, j = np.unravel_index(int(np.argmax(spec)), spec.shape)
+        points[f'best_specificity_at_tpr>={min_sensitivity:g}'] = _row(grid, metrics, i, j)
+
+    ok = metrics['fpr'] <= max_fpr
+    if ok.any():
+        sens = np.where(ok, metrics['tpr'], -1.0)
+        i, j = np.unravel_index(int(np.argmax(sens)), sens.shape)
+        points[f'best_sensitivity_at_fpr<={max_fpr:g}'] = _row(grid, metrics, i, j)
+    return points
+
+
+def roc_envelope(metrics, fpr_bins=(0.0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0)):
+    """Best TPR reachable by any (Tc, Ts) at or below each FPR level, with the flat index of that pair."""
+    fpr = metrics['fpr'].ravel()
+    tpr = metrics['tpr'].ravel()
+    rows = []
+    for level in fpr_bins:
+        # Highest TPR under the FPR cap; ties go to the lower FPR.
+        score = np.where(fpr <= level, tpr - 1e-9 * fpr, -1.0)
+        k = int(np.argmax(score))
+        if score[k] >= 0.0:
+            rows.append((level, float(tpr[k]), k))
+    return rows
+
+
+def print_point(name, p):
+    print(f"  {name:34s} Tc={p['Tc']:8.3f} Ts={p['Ts']:9.3f}  TPR={p['tpr']:.3f} FPR={p['fpr']:.3f} "
+          f"prec={p['precision']:.3f} F1={p['f1']:.3f} acc={p['accuracy']:.3f}  "
+          f"(tp={p['tp']} fp={p['fp']} fn={p['fn']} tn={p['tn']})")
+
+
+def write_grid_csv(path, grid, metrics):
+    tc, ts = np.meshgrid(grid['tc'], grid['ts'], indexing='ij')
+    columns = {
+        'Tc': tc, 'Ts': ts, 'tp': grid['tp'], 'fp': grid['fp'], 'fn': grid['fn'], 'tn': grid['tn'],
+        **metrics,
+    }
+    table = np.column_stack([np.asarray(v, dtype=np.float64).ravel() for v in columns.values()])
+    np.savetxt(path, table, delimiter=',', header=','.join(columns), comments='', fmt='%.6g')
+    print(f"[CALIBRATE] Wrote {table.shape[0]} grid rows to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=Path, help='SQLite database with cataract_results')
+    parser.add_argument('--csv', type=Path, action='append', default=[], help='cataract_log.csv (repeatable)')
+    parser.add_argument('--dl-log', type=Path, help='cataract_dl_log.csv used as labels for --csv rows')
+    parser.add_argument('--labels', type=Path, help='clinician labels CSV (filename,label); overrides DL labels')
+    parser.add_argument('--synthetic', type=int, default=0, help='score N synthetic rows instead (timing demo)')
+    parser.add_argument('--tc-steps', type=int, default=400)
+    parser.add_argument('--ts-steps', type=int, default=400)
+    parser.add_argument('--tc-max', type=float, help='upper end of the Tc grid (default: from data)')
+    parser.add_argument('--ts-max', type=float, help='upper end of the Ts grid (default: from data)')
+    parser.add_argument('--min-sensitivity', type=float, default=0.9)
+    parser.add_argument('--max-fpr', type=float, default=0.1)
+    parser.add_argument('--out', type=Path, help='write the full grid as CSV')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.synthetic:
+        C, S, E, y = synthetic_rows(args.synthetic)
+        source = f'{args.synthetic} synthetic rows'
+    else:
+        if not args.db and not args.csv:
+            default_db = BASE_DIR / 'nayan_ai.db'
+            if not default_db.exists():
+                parser.error('give --db and/or --csv (or --synthetic N)')
+            args.db = default_db
+        rows = []
+        if args.db:
+            rows += load_db_rows(args.db)
+        for path in args.csv:
+            rows += load_csv_rows(path)
+        label_map = None
+        if args.labels:
+            label_map = load_label_map(args.labels)
+        elif args.dl_log:
+            label_map = load_label_map(args.dl_log, label_column='pred_label', file_column='upload_file')
+        C, S, E, y = build_arrays(rows, label_map)
+        source = f'{len(rows)} logged rows, {len(y)} with a reference label'
+    t_load = time.perf_counter() - t0
+
+    n_pos = int((y == 1).sum())
+    print(f"[CALIBRATE] {source}: {n_pos} risk / {len(y) - n_pos} normal")
+    if len(y) == 0 or n_pos == 0 or n_pos == len(y):
+        print("[CALIBRATE] Need labelled examples of both classes to calibrate.")
+        return 1
+    for name, yy in (('risk', 1), ('normal', 0)):
+        sel = y == yy
+        print(f"  {name:6s} mean C={C[sel].mean():8.3f}  S={S[sel].mean():9.3f}  E={np.nanmean(E[sel]):8.3f}")
+
+    tc_grid = np.linspace(0.0, args.tc_max, args.tc_steps) if args.tc_max else default_grid(C, args.tc_steps)
+    ts_grid = np.linspace(0.0, args.ts_max, args.ts_steps) if args.ts_max else default_grid(S, args.ts_steps)
+
+    t1 = time.perf_counter()
+    grid = evaluate_grid(C, S, y, tc_grid, ts_grid)
+    metrics = grid_metrics(grid)
+    t_grid = time.perf_counter() - t1
+    print(f"[CALIBRATE] Scored {len(tc_grid)}x{len(ts_grid)} (Tc, Ts) pairs in {t_grid * 1000:.1f} ms "
+          f"(load {t_load * 1000:.1f} ms)")
+
+    current = single_point(C, S, y, CURRENT_TC, CURRENT_TS)
+    print(f"\nCurrent thresholds Tc={CURRENT_TC} Ts={CURRENT_TS}: TPR={current['tpr']:.3f} FPR={current['fpr']:.3f} "
+          f"(tp={current['tp']} fp={current['fp']} fn={current['fn']} tn={current['tn']})")
+
+    print("\nBest operating points:")
+    for name, point in best_operating_points(grid, metrics, args.min_sensitivity, args.max_fpr).items():
+        print_point(name, point)
+
+    print("\nROC envelope (best TPR over all (Tc, Ts) with FPR <= level):")
+    n_ts = len(ts_grid)
+    for level, tpr, flat in roc_envelope(metrics):
+        i, j = divmod(flat, n_ts)
+        print(f"  FPR<={level:4.2f}  TPR={tpr:.3f}  at Tc={tc_grid[i]:8.3f} Ts={ts_grid[j]:9.3f}")
+
+    if args.out:
+        write_grid_csv(args.out, grid, metrics)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+NAYAN-AI - Classical cataract image metrics (contrast / sharpness / edge)
+The reference pipeline runs CLAHE and a 5x5 Gaussian blur over the whole
+grayscale frame and then keeps only the centre ROI. CataractMetricEngine does
+the same work on a crop around the ROI instead:
+
+- The crop is aligned to OpenCV's CLAHE tile grid and extends one tile beyond
+  the tiles the ROI (plus the blur's 2 px support) interpolates between, so
+  every ROI pixel sees the same tile histograms (LUTs) as in the full-frame
+  CLAHE. Bottom/right padding is reproduced the way OpenCV pads. OpenCV
+  computes the LUT blend weights in float32 from crop-relative coordinates,
+  so up to ~1% of ROI pixels come out one grey level off: the metrics match
+  `reference_metrics` within a relative tolerance, not bit for bit (<= 1e-3 on
+  stored uploads; sharpness up to ~3e-3 on synthetic noise frames).
+- The CLAHE object is created once per thread and reused.
+- Laplacian / Sobel run in float32 (exact for uint8 input); the gradient
+  magnitude uses cv2.magnitude.
+
+`reference_metrics` keeps the original full-frame implementation for parity
+checks (bench_cataract.py features).
+
+RoiStatsIndex builds summed-area tables (pixels, squares, Laplacian and
+gradient magnitude) once per frame, so ROI scale sweeps and off-centre
+searches cost O(1) per rectangle (plus an O(perimeter) rim correction when
+matching the per-ROI filters exactly).
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_TILE_GRID = (8, 8)
+BLUR_KSIZE = (5, 5)
+ROI_SCALE = 0.25
+
+# Half the Gaussian kernel: ROI pixels need this many real neighbours.
+_BLUR_MARGIN = BLUR_KSIZE[0] // 2
+
+
+def center_roi_rect(shape, scale=ROI_SCALE):
+    """(x, y, w, h) of the centred ROI, same rounding as the original pipeline."""
+    h, w = shape[:2]
+    rh, rw = int(h * scale), int(w * scale)
+    return (w - rw) // 2, (h - rh) // 2, rw, rh
+
+
+def roi_metrics(roi: np.ndarray):
+    """(contrast, sharpness, edge) of a preprocessed uint8 ROI."""
+    C = float(np.std(roi))
+    lap = cv2.Laplacian(roi, cv2.CV_32F)
+    S = float(lap.var(dtype=np.float64))
+    gx = cv2.Sobel(roi, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(roi, cv2.CV_32F, 0, 1, ksize=3)
+    E = float(cv2.magnitude(gx, gy).mean(dtype=np.float64))
+    return C, S, E
+
+
+def reference_metrics(frame_bgr: np.ndarray, scale=ROI_SCALE):
+    """Original full-frame pipeline (CLAHE + blur everywhere, then crop; float64 filters)."""
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID)
+    gray = clahe.apply(gray)
+    gray = cv2.GaussianBlur(gray, BLUR_KSIZE, 0)
+
+    x, y, rw, rh = center_roi_rect(gray.shape, scale)
+    roi = gray[y:y+rh, x:x+rw]
+
+    C = float(np.std(roi))
+    lap = cv2.Laplacian(roi, cv2.CV_64F)
+    S = float(lap.var())
+    gx = cv2.Sobel(roi, cv2.CV_64F, 1, 0, ksize=3)
+    gy = cv2.Sobel(roi, cv2.CV_64F, 0, 1, ksize=3)
+    E = float(np.mean(np.sqrt(gx*gx + gy*gy)))
+    return C, S, E
+
+
+class CataractMetricEngine:
+    """ROI-first contrast / sharpness / edge metrics, matching reference_metrics within tolerance."""
+
+    def __init__(self, clip_limit=CLAHE_CLIP_LIMIT, tile_grid=CLAHE_TILE_GRID, roi_scale=ROI_SCALE):
+        self.clip_limit = clip_limit
+        self.tile_grid = tuple(tile_grid)
+        self.roi_scale = roi_scale
+        # cv2.CLAHE keeps internal buffers, so each thread gets its own instance.
+        self._local = threading.local()
+
+    def _clahe(self, tiles):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = self._local.clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid)
+        clahe.setTilesGridSize(tiles)
+        return clahe
+
+    @staticmethod
+    def _tile_span(lo, hi, tile, n_tiles):
+        """Tiles [t0, t1] whose LUTs pixels lo..hi-1 blend (OpenCV: t = floor(p / tile - 0.5), t + 1)."""
+        t0 = int(np.floor(lo / tile - 0.5))
+        t1 = int(np.floor((hi - 1) / tile - 0.5)) + 1
+        return max(t0, 0), min(t1, n_tiles - 1)
+
+    def preprocess_roi(self, frame_bgr: np.ndarray, rect=None):
+        """CLAHE + blur on a tile-aligned crop; returns the preprocessed uint8 ROI (or None)."""
+        h, w = frame_bgr.shape[:2]
+        tiles_x, tiles_y = self.tile_grid
+        x, y, rw, rh = rect if rect is not None else center_roi_rect(frame_bgr.shape, self.roi_scale)
+        if rw <= 0 or rh <= 0 or w < 2 * tiles_x or h < 2 * tiles_y:
+            return None
+
+        # OpenCV pads bottom/right (BORDER_REFLECT_101) unless both sides divide evenly.
+        if w % tiles_x == 0 and h % tiles_y == 0:
+            pad_x = pad_y = 0
+        else:
+            pad_x, pad_y = tiles_x - w % tiles_x, tiles_y - h % tiles_y
+        tile_w, tile_h = (w + pad_x) // tiles_x, (h + pad_y) // tiles_y
+
+        # Pixels the blurred ROI depends on, then the tiles those pixels read from.
+        px0, px1 = max(x - _BLUR_MARGIN, 0), min(x + rw + _BLUR_MARGIN, w)
+        py0, py1 = max(y - _BLUR_MARGIN, 0), min(y + rh + _BLUR_MARGIN, h)
+        tx0, tx1 = self._tile_span(px0, px1, tile_w, tiles_x)
+        ty0, ty1 = self._tile_span(py0, py1, tile_h, tiles_y)
+
+        cx0, cx1 = tx0 * tile_w, (tx1 + 1) * tile_w
+        cy0, cy1 = ty0 * tile_h, (ty1 + 1) * tile_h
+        gray = cv2.cvtColor(frame_bgr[cy0:min(cy1, h), cx0:min(cx1, w)], cv2.COLOR_BGR2GRAY)
+        crop_h, crop_w = gray.shape
+        if cx1 > w or cy1 > h:
+            # Crop reaches the padded last tile: pad it exactly as OpenCV pads the frame.
+            gray = cv2.copyMakeBorder(gray, 0, cy1 - cy0 - crop_h, 0, cx1 - cx0 - crop_w, cv2.BORDER_REFLECT_101)
+
+        gray = self._clahe((tx1 - tx0 + 1, ty1 - ty0 + 1)).apply(gray)[:crop_h, :crop_w]
+        gray = cv2.GaussianBlur(gray, BLUR_KSIZE, 0)
+        return gray[y - cy0:y - cy0 + rh, x - cx0:x - cx0 + rw]
+
+    def compute(self, frame_bgr: np.ndarray, rect=None):
+        """(contrast, sharpness, edge) for the ROI (centre ROI_SCALE by default)."""
+        roi = self.preprocess_roi(frame_bgr, rect)
+        if roi is None:
+            return reference_metrics(frame_bgr, self.roi_scale)
+        return roi_metrics(roi)
+
+
+# ============== MULTI-SCALE ROI STATISTICS ==============
+DEFAULT_SWEEP_SCALES = (0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5)
+DEFAULT_SWEEP_OFFSETS = (-0.1, -0.05, 0.0, 0.05, 0.1)
+
+
+def preprocess_gray(frame_bgr: np.ndarray) -> np.ndarray:
+    """Full-frame grayscale + CLAHE + 5x5 blur (the reference preprocessing)."""
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID)
+    return cv2.GaussianBlur(clahe.apply(gray), BLUR_KSIZE, 0)
+
+
+class RoiStatsIndex:
+    """Summed-area tables over one preprocessed frame.
+
+    border='reflect' (default) reproduces roi_metrics() on the cropped ROI up to
+    float rounding (edge within ~1e-7 relative, float32 gradient magnitudes):
+    interior pixels come from the tables in O(1), and the 1 px rim, whose
+    filter responses depend on the ROI edge, is recomputed from 2 px strips in
+    O(perimeter). border='interior' is pure O(1), with filters seeing the
+    real neighbours across the ROI edge.
+    """
+
+    def __init__(self, gray: np.ndarray, border='reflect'):
+        if border not in ('reflect', 'interior'):
+            raise ValueError("border must be 'reflect' or 'interior'")
+        self.gray = gray
+        self.shape = gray.shape[:2]
+        self.border = border
+        self._sum, self._sqsum = cv2.integral2(gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        lap = cv2.Laplacian(gray, cv2.CV_32F)
+        self._lap_sum, self._lap_sqsum = cv2.integral2(lap, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+        self._mag_sum = cv2.integral(cv2.magnitude(gx, gy), sdepth=cv2.CV_64F)
+
+    @classmethod
+    def from_frame(cls, frame_bgr: np.ndarray, border='reflect'):
+        return cls(preprocess_gray(frame_bgr), border=border)
+
+    @staticmethod
+    def _box(table, x, y, w, h):
+        return table[y + h, x + w] - table[y, x + w] - table[y + h, x] + table[y, x]
+
+    @staticmethod
+    def _filter_sums(strip):
+        """Laplacian and gradient magnitude of a strip filtered in isolation (reflected edges)."""
+        lap = cv2.Laplacian(strip, cv2.CV_32F)
+        gx = cv2.Sobel(strip, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(strip, cv2.CV_32F, 0, 1, ksize=3)
+        return lap, cv2.magnitude(gx, gy)
+
+    def _rim_sums(self, x, y, w, h):
+        """Filter sums over the 1 px rim of ROI (x, y, w, h) as the isolated-ROI filters see it."""
+        roi = self.gray[y:y+h, x:x+w]
+        # A rim row/column only depends on itself and its inner neighbour, so
+        # filtering 2 px strips in isolation gives the isolated-ROI response.
+        # Top+bottom and left+right strips are stacked to halve the filter calls.
+        tb_lap, tb_mag = self._filter_sums(np.vstack((roi[:2], roi[-2:])))
+        lr_lap, lr_mag = self._filter_sums(np.hstack((roi[:, :2], roi[:, -2:])))
+        lap = np.concatenate((tb_lap[0], tb_lap[3], lr_lap[1:-1, 0], lr_lap[1:-1, 3])).astype(np.float64)
+        mag = np.concatenate((tb_mag[0], tb_mag[3], lr_mag[1:-1, 0], lr_mag[1:-1, 3]))
+        return float(lap.sum()), float(lap @ lap), float(mag.sum(dtype=np.float64))
+
+    def stats(self, rects) -> dict:
+        """Vectorised stats for an (N, 4) array of (x, y, w, h); returns arrays of length N."""
+        r = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        x, y, w, h = r[:, 0], r[:, 1], r[:, 2], r[:, 3]
+        n = (w * h).astype(np.float64)
+
+        mean = self._box(self._sum, x, y, w, h) / n
+        var = np.maximum(self._box(self._sqsum, x, y, w, h) / n - mean * mean, 0.0)
+
+        if self.border == 'interior':
+            lap_sum = self._box(self._lap_sum, x, y, w, h)
+            lap_sqsum = self._box(self._lap_sqsum, x, y, w, h)
+            mag_sum = self._box(self._mag_sum, x, y, w, h)
+        else:
+            # Interior (rim excluded) from the tables, rim recomputed per ROI.
+            iw, ih = np.maximum(w - 2, 0), np.maximum(h - 2, 0)
+            lap_sum = self._box(self._lap_sum, x + 1, y + 1, iw, ih)
+            lap_sqsum = self._box(self._lap_sqsum, x + 1, y + 1, iw, ih)
+            mag_sum = self._box(self._mag_sum, x + 1, y + 1, iw, ih)
+            for i, rect in enumerate(r):
+                if rect[2] < 3 or rect[3] < 3:
+                    roi = self.gray[rect[1]:rect[1]+rect[3], rect[0]:rect[0]+rect[2]]
+                    lap, mag = self._filter_sums(roi)
+                    lap_sum[i] = lap.sum(dtype=np.float64)
+                    lap_sqsum[i] = np.square(lap, dtype=np.float64).sum()
+                    mag_sum[i] = mag.sum(dtype=np.float64)
+                    continue
+                rim_lap, rim_lap_sq, rim_mag = self._rim_sums(*(int(v) for v in rect))
+                lap_sum[i] += rim_lap
+                lap_sqsum[i] += rim_lap_sq
+                mag_sum[i] += rim_mag
+
+        lap_mean = lap_sum / n
+        return {
+            'mean': mean,
+            'contrast': np.sqrt(var),
+            'sharpness': np.maximum(lap_sqsum / n - lap_mean * lap_mean, 0.0),
+            'edge': mag_sum / n,
+        }
+
+    def metrics(self, rect):
+        """(contrast, sharpness, edge) for one rectangle."""
+        s = self.stats([rect])
+        return float(s['contrast'][0]), float(s['sharpness'][0]), float(s['edge'][0])
+
+
+def roi_grid(shape, scales=DEFAULT_SWEEP_SCALES, offsets=DEFAULT_SWEEP_OFFSETS):
+    """ROI rectangles for every (scale, dx, dy): centred ROI shifted by dx*w, dy*h; out-of-frame ones skipped.
+
+    Returns (rects (N, 4) int array, params (N, 3) float array of scale, dx, dy).
+    """
+    h, w = shape[:2]
+    rects, params = [], []
+    for scale in scales:
+        x0, y0, rw, rh = center_roi_rect(shape, scale)
+        if rw <= 0 or rh <= 0:
+            continue
+        for dy in offsets:
+            for dx in offsets:
+                x, y = x0 + int(round(dx * w)), y0 + int(round(dy * h))
+                if x < 0 or y < 0 or x + rw > w or y + rh > h:
+                    continue
+                rects.append((x, y, rw, rh))
+                params.append((scale, dx, dy))
+    return np.asarray(rects, dtype=np.int64).reshape(-1, 4), np.asarray(params, dtype=np.float64).reshape(-1, 3)
+
+
+def roi_sweep(frame_bgr: np.ndarray, scales=DEFAULT_SWEEP_SCALES, offsets=DEFAULT_SWEEP_OFFSETS, border='reflect'):
+    """Contrast / sharpness / edge for a grid of ROI scales and offsets from one set of integral images."""
+    index = RoiStatsIndex.from_frame(frame_bgr, border=border)
+    rects, params = roi_grid(index.shape, scales, offsets)
+    stats = index.stats(rects) if len(rects) else {k: [] for k in ('mean', 'contrast', 'sharpness', 'edge')}
+    return [
+        {
+            'scale': float(p[0]),
+            'dx': float(p[1]),
+            'dy': float(p[2]),
+            'rect': [int(v) for v in rect],
+            'contrast': float(stats['contrast'][i]),
+            'sharpness': float(stats['sharpness'][i]),
+            'edge': float(stats['edge'][i]),
+            'mean': float(stats['mean'][i]),
+        }
+        for i, (rect, p) in enumerate(zip(rects, params))
+    ]
+
+
+default_engine = CataractMetricEngine()
@@ -0,0 +1,369 @@
+"""
+NAYAN-AI - Cataract model inference backends
+Interchangeable CPU engines for the MobileNetV2 cataract classifier:
+Keras (TensorFlow), TFLite and ONNX Runtime.
+
+Only the Keras backend needs TensorFlow. The TFLite backend uses the
+standalone `tflite_runtime` / `ai_edge_litert` interpreters and the ONNX
+backend only needs `onnxruntime`, so either can serve predictions in a
+worker that never imports TensorFlow. Without a standalone interpreter the
+TFLite backend falls back to `tf.lite` (and says so when it loads). These
+runtimes are optional; see the commented entries in requirements.txt.
+
+Export the lightweight artifacts with:  python export_cataract_model.py
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ARTIFACTS_DIR = Path(__file__).resolve().parent / 'catract' / 'artifacts'
+MODEL_BASENAME = 'cataract_mobilenetv2'
+LABELS_FILENAME = 'labels.json'
+IMG_SIZE = (224, 224)
+INPUT_SHAPE = (None, IMG_SIZE[1], IMG_SIZE[0], 3)
+
+
+# ============== PRE/POST PROCESSING ==============
+def load_class_names(artifacts_dir=ARTIFACTS_DIR):
+    """Read class names written by train_cataract_mobilenetv2.py."""
+    labels_path = Path(artifacts_dir) / LABELS_FILENAME
+    if not labels_path.exists():
+        raise FileNotFoundError(f"labels.json not found at: {labels_path}")
+
+    class_names = json.loads(labels_path.read_text(encoding='utf-8')).get('class_names')
+    if not class_names:
+        raise ValueError("labels.json missing 'class_names'")
+    return [str(c) for c in class_names]
+
+
+def preprocess_for_mobilenet(frame_bgr: np.ndarray) -> np.ndarray:
+    """Match preprocessing from backend/catract/mobile_cataract_server_dl.py.
+
+    IMPORTANT: model already applies preprocess_input internally.
+    Feed raw RGB in [0, 255] as float32, shape (1, 224, 224, 3).
+    """
+    rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    rgb = cv2.resize(rgb, IMG_SIZE, interpolation=cv2.INTER_AREA)
+    x = rgb.astype(np.float32)
+    return np.expand_dims(x, axis=0)
+
+
+def probs_to_prediction(probs, class_names):
+    """Return (pred_label, conf_percent, probs_map) for one row of model output."""
+    probs = np.asarray(probs, dtype=np.float32)
+    idx = int(np.argmax(probs))
+    pred_label = str(class_names[idx])
+    conf_percent = float(probs[idx]) * 100.0
+    probs_map = {str(class_names[i]): float(probs[i]) for i in range(len(class_names))}
+    return pred_label, conf_percent, probs_map
+
+
+def is_cataract_risk_label(pred_label: str) -> bool:
+    """The class folder literally named 'cataract' is treated as risk."""
+    return pred_label.strip().lower() == 'cataract'
+
+
+def artifact_fingerprint(*paths) -> str:
+    """Short content hash of the model artifacts; changes whenever any file changes."""
+    h = hashlib.sha256()
+    for path in paths:
+        path = Path(path)
+        h.update(path.name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def build_inference_function(model):
+    """Wrap a Keras model as a tf.function with a static (None, 224, 224, 3) float32 signature.
+
+    Its concrete function, called directly, skips Keras predict()'s per-call
+    data-adapter and callback setup; training=False keeps the augmentation
+    layers inert.
+    """
+    import tensorflow as tf  # type: ignore
+
+    @tf.function(input_signature=[tf.TensorSpec(INPUT_SHAPE, tf.float32, name='input')])
+    def serve(x):
+        return model(x, training=False)
+
+    return serve
+
+
+# ============== BACKENDS ==============
+class InferenceBackend:
+    """Common interface: load() once, then predict_batch((N, 224, 224, 3) float32) -> (N, C)."""
+
+    name = 'base'
+    artifact_suffixes = ()
+
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR):
+        self.artifacts_dir = Path(artifacts_dir)
+        self.model_path = None
+        self._version = None
+
+    def candidate_paths(self):
+        return [self.artifacts_dir / f"{MODEL_BASENAME}{suffix}" for suffix in self.artifact_suffixes]
+
+    def has_artifact(self) -> bool:
+        return any(p.exists() for p in self.candidate_paths())
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """True if the runtime this backend needs can be imported."""
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @property
+    def version(self):
+        """Fingerprint of the loaded model file + labels.json (None until loaded)."""
+        if self._version is None and self.model_path is not None:
+            self._version = artifact_fingerprint(self.model_path, self.artifacts_dir / LABELS_FILENAME)
+        return self._version
+
+    def describe(self) -> dict:
+        return {
+            'backend': self.name,
+            'model_path': str(self.model_path) if self.model_path else None,
+            'model_version': self.version,
+        }
+
+
+class KerasBackend(InferenceBackend):
+    """Full TensorFlow/Keras model (.h5 preferred, then .keras).
+
+    By default predictions go through a concrete function prepared once at
+    load time (see build_inference_function); use_compiled=False falls back
+    to model.predict().
+    """
+
+    name = 'keras'
+    artifact_suffixes = ('.h5', '.keras')
+
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR, use_compiled=None):
+        super().__init__(artifacts_dir)
+        if use_compiled is None:
+            use_compiled = os.environ.get('NAYAN_KERAS_FAST_PATH', '1') == '1'
+        self.use_compiled = use_compiled
+        self.model = None
+        self._infer = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import importlib.util
+            return importlib.util.find_spec('tensorflow') is not None
+        except Exception:
+            return False
+
+    def load(self):
+        # If you faced Windows Keras 3 overflow issues, keep this ON.
+        # Must be set before importing TensorFlow in some environments.
+        os.environ.setdefault("TF_USE_LEGACY_KERAS", "1")
+
+        try:
+            import tensorflow as tf  # type: ignore
+        except Exception as e:
+            raise RuntimeError(
+                "TensorFlow is not installed (required for the keras backend). "
+                "Install backend requirements or export a tflite/onnx model. "
+                f"Original error: {e}"
+            )
+
+        last_error = None
+        for model_path in self.candidate_paths():
+            if not model_path.exists():
+                continue
+            try:
+                print(f"Loading model from {model_path}")
+                self.model = tf.keras.models.load_model(str(model_path), compile=False)
+                self.model_path = model_path
+                print(f"Successfully loaded {model_path.suffix} model")
+                if self.use_compiled:
+                    self._infer = build_inference_function(self.model).get_concrete_function()
+                return
+            except Exception as e:
+                print(f"Failed to load {model_path.suffix} model: {e}")
+                last_error = e
+
+        error_msg = "Could not load model. Tried: " + ", ".join(str(p) for p in self.candidate_paths())
+        if last_error:
+            error_msg += f". Last error: {last_error}"
+        raise FileNotFoundError(error_msg)
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        if self._infer is not None:
+            return self._infer(np.ascontiguousarray(x, dtype=np.float32)).numpy()
+        return np.asarray(self.model.predict(x, verbose=0))
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info['compiled'] = self._infer is not None
+        return info
+
+
+class TFLiteBackend(InferenceBackend):
+    """TFLite flatbuffer; uses tflite_runtime/ai_edge_litert when installed."""
+
+    name = 'tflite'
+    artifact_suffixes = ('.tflite',)
+
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR, num_threads=None):
+        super().__init__(artifacts_dir)
+        self.num_threads = num_threads or os.cpu_count()
+        self.runtime = None
+        self._interpreter = None
+        self._input_index = None
+        self._output_index = None
+        self._batch_size = None
+        # A tflite Interpreter must not be invoked from several threads at once.
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _interpreter_class():
+        """(Interpreter class, runtime name); tf.lite only when no standalone runtime is installed."""
+        try:
+            from tflite_runtime.interpreter import Interpreter  # type: ignore
+            return Interpreter, 'tflite_runtime'
+        except ImportError:
+            pass
+        try:
+            from ai_edge_litert.interpreter import Interpreter  # type: ignore
+            return Interpreter, 'ai_edge_litert'
+        except ImportError:
+            pass
+        os.environ.setdefault("TF_USE_LEGACY_KERAS", "1")
+        try:
+            import tensorflow as tf  # type: ignore
+        except ImportError as e:
+            raise RuntimeError(
+                "The tflite backend needs tflite-runtime or ai-edge-litert "
+                f"(pip install tflite-runtime), or TensorFlow as a fallback: {e}"
+            )
+        return tf.lite.Interpreter, 'tensorflow'
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import importlib.util
+            return any(importlib.util.find_spec(m) is not None
+                       for m in ('tflite_runtime', 'ai_edge_litert', 'tensorflow'))
+        except Exception:
+            return False
+
+    def load(self):
+        model_path = self.candidate_paths()[0]
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"TFLite model not found at: {model_path}. Run export_cataract_model.py first."
+            )
+        Interpreter, self.runtime = self._interpreter_class()
+        if self.runtime == 'tensorflow':
+            print("[INFERENCE] tflite_runtime / ai_edge_litert not installed; "
+                  "TFLite backend falling back to tf.lite (imports full TensorFlow)")
+        self._interpreter = Interpreter(model_path=str(model_path), num_threads=self.num_threads)
+        self._input_index = self._interpreter.get_input_details()[0]['index']
+        self._output_index = self._interpreter.get_output_details()[0]['index']
+        self._resize(1)
+        self.model_path = model_path
+
+    def _resize(self, batch_size):
+        self._interpreter.resize_tensor_input(
+            self._input_index, [batch_size, IMG_SIZE[1], IMG_SIZE[0], 3], strict=False
+        )
+        self._interpreter.allocate_tensors()
+        self._batch_size = batch_size
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        with self._lock:
+            if x.shape[0] != self._batch_size:
+                self._resize(x.shape[0])
+            self._interpreter.set_tensor(self._input_index, x)
+            self._interpreter.invoke()
+            return np.array(self._interpreter.get_tensor(self._output_index))
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info['runtime'] = self.runtime
+        return info
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX graph executed by onnxruntime's CPU provider."""
+
+    name = 'onnx'
+    artifact_suffixes = ('.onnx',)
+
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR, num_threads=None):
+        super().__init__(artifacts_dir)
+        self.num_threads = num_threads
+        self._session = None
+        self._input_name = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import importlib.util
+            return importlib.util.find_spec('onnxruntime') is not None
+        except Exception:
+            return False
+
+    def load(self):
+        try:
+            import onnxruntime as ort  # type: ignore
+        except Exception as e:
+            raise RuntimeError(f"onnxruntime is not installed (required for the onnx backend): {e}")
+
+        model_path = self.candidate_paths()[0]
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at: {model_path}. Run export_cataract_model.py first."
+            )
+        opts = ort.SessionOptions()
+        if self.num_threads:
+            opts.intra_op_num_threads = int(self.num_threads)
+        self._session = ort.InferenceSession(str(model_path), sess_options=opts, providers=['CPUExecutionProvider'])
+        self._input_name = self._session.get_inputs()[0].name
+        self.model_path = model_path
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return np.asarray(self._session.run(None, {self._input_name: x})[0])
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+# Order tried by `auto`: lightest runtime first, full Keras last.
+AUTO_ORDER = ('onnx', 'tflite', 'keras')
+
+
+def create_backend(name='keras', artifacts_dir=ARTIFACTS_DIR) -> InferenceBackend:
+    """Instantiate (but do not load) a backend by name; 'auto' picks the lightest usable one."""
+    name = (name or 'keras').strip().lower()
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            backend = BACKENDS[candidate](artifacts_dir)
+            if backend.has_artifact() and backend.is_available():
+                return backend
+        return KerasBackend(artifacts_dir)
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from: auto, {', '.join(BACKENDS)}")
+    return BACKENDS[name](artifacts_dir)
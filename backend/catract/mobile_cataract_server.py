@@ -1,10 +1,12 @@
 import os
 import time
 import csv
+import queue
+import threading
 
 import cv2
 import numpy as np
-from flask import Flask, request, render_template_string, send_from_directory
+from flask import Flask, request, render_template_string, send_from_directory, abort
 
 APP = Flask(__name__)
 
@@ -12,6 +14,13 @@ UPLOAD_DIR = "uploads"
 DEBUG_DIR = "debug"
 LOG_FILE = "cataract_log.csv"
 
+# ROI debug composites: "lazy" renders on the first GET /debug/<name> and caches
+# the file, "background" renders on a worker thread right after the upload
+# (falling back to lazy if its queue is full), "off" disables them.
+DEBUG_COMPOSITES = os.environ.get("NAYAN_DEBUG_COMPOSITES", "lazy").strip().lower()
+DEBUG_QUEUE_SIZE = int(os.environ.get("NAYAN_DEBUG_QUEUE", "16"))
+DEFAULT_ROI_SCALE = 0.25
+
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(DEBUG_DIR, exist_ok=True)
 
@@ -56,8 +65,10 @@ HTML = """
     <h4>Uploaded Image</h4>
     <img src="/uploads/{{result.upload_name}}" alt="uploaded">
 
+    {% if result.debug_name %}
     <h4>ROI Debug (Left: ROI box, Right: ROI zoom)</h4>
-    <img src="/debug/{{result.debug_name}}" alt="roi debug">
+    <img src="/debug/{{result.debug_name}}" alt="roi debug" loading="lazy">
+    {% endif %}
   </div>
   {% endif %}
 </body>
@@ -126,6 +137,85 @@ def make_roi_zoom_view(roi_gray, zoom_size=(360, 360)):
                 cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
     return roi_zoom
 
+def make_debug_composite(frame_bgr, roi_gray, rect):
+    marked = draw_roi_box(frame_bgr, rect)
+    roi_zoom = make_roi_zoom_view(roi_gray)
+
+    # resize marked to same height as roi_zoom for clean concat
+    marked_resized = cv2.resize(marked, (roi_zoom.shape[1], roi_zoom.shape[0]))
+    return cv2.hconcat([marked_resized, roi_zoom])
+
+# ---------- Deferred debug composites ----------
+_debug_pending = {}  # debug_name -> (upload_name, roi_scale); oldest entries evicted
+_DEBUG_PENDING_MAX = 1024
+_debug_lock = threading.Lock()
+_debug_queue = queue.Queue(maxsize=max(1, DEBUG_QUEUE_SIZE))
+_debug_worker = None
+
+def debug_name_for(upload_name):
+    stem, _ = os.path.splitext(upload_name)
+    return f"{stem}_DEBUG.jpg"
+
+def upload_name_for(debug_name):
+    if not debug_name.endswith("_DEBUG.jpg"):
+        return None
+    return debug_name[:-len("_DEBUG.jpg")] + ".jpg"
+
+def write_debug_composite(debug_name, frame_bgr, roi_gray, rect):
+    """Render and atomically write one composite (readers never see a partial file)."""
+    debug_path = os.path.join(DEBUG_DIR, debug_name)
+    tmp_path = debug_path + ".tmp.jpg"
+    cv2.imwrite(tmp_path, make_debug_composite(frame_bgr, roi_gray, rect))
+    os.replace(tmp_path, debug_path)
+
+def render_debug_from_upload(debug_name):
+    """Rebuild a composite from the stored upload; returns False if it cannot be made.
+
+    Callers hold _debug_lock.
+    """
+    upload_name, roi_scale = _debug_pending.get(debug_name, (upload_name_for(debug_name), DEFAULT_ROI_SCALE))
+    upload_path = os.path.join(UPLOAD_DIR, upload_name) if upload_name else None
+    if not upload_path or not os.path.exists(upload_path):
+        return False
+    frame = cv2.imread(upload_path)
+    if frame is None:
+        return False
+    roi, rect = extract_center_roi(preprocess_gray(frame), scale=roi_scale)
+    write_debug_composite(debug_name, frame, roi, rect)
+    return True
+
+def _debug_loop():
+    while True:
+        debug_name = _debug_queue.get()
+        try:
+            with _debug_lock:
+                if not os.path.exists(os.path.join(DEBUG_DIR, debug_name)):
+                    render_debug_from_upload(debug_name)
+                _debug_pending.pop(debug_name, None)
+        except Exception as e:
+            print(f"[DEBUG] Composite {debug_name} failed: {e}")
+
+def schedule_debug_composite(debug_name, upload_name, roi_scale):
+    """Record how to build the composite; in background mode also queue it (never blocks).
+
+    Only names are queued: the worker re-reads the stored upload, so pending
+    composites never hold decoded full-resolution frames.
+    """
+    global _debug_worker
+    with _debug_lock:
+        _debug_pending[debug_name] = (upload_name, roi_scale)
+        while len(_debug_pending) > _DEBUG_PENDING_MAX:
+            _debug_pending.pop(next(iter(_debug_pending)), None)
+    if DEBUG_COMPOSITES != "background":
+        return
+    if _debug_worker is None or not _debug_worker.is_alive():
+        _debug_worker = threading.Thread(target=_debug_loop, name="debug-composites", daemon=True)
+        _debug_worker.start()
+    try:
+        _debug_queue.put_nowait(debug_name)
+    except queue.Full:
+        pass  # rendered on first GET instead
+
 # ---------- Feature extraction ----------
 def compute_features(roi):
     # Contrast
@@ -156,7 +246,7 @@ def index():
     # Initial defaults (you will calibrate later)
     Tc = 22.0
     Ts = 120.0
-    roi_scale = 0.25
+    roi_scale = DEFAULT_ROI_SCALE
 
     if request.method == "POST":
         if "image" not in request.files:
@@ -182,17 +272,11 @@ def index():
         C, S, E = compute_features(roi)
         label = cataract_label(C, S, Tc=Tc, Ts=Ts)
 
-        # --- create ROI debug composite ---
-        marked = draw_roi_box(frame, rect)
-        roi_zoom = make_roi_zoom_view(roi)
-
-        # resize marked to same height as roi_zoom for clean concat
-        marked_resized = cv2.resize(marked, (roi_zoom.shape[1], roi_zoom.shape[0]))
-        combo = cv2.hconcat([marked_resized, roi_zoom])
-
-        debug_name = f"eye_{ts}_DEBUG.jpg"
-        debug_path = os.path.join(DEBUG_DIR, debug_name)
-        cv2.imwrite(debug_path, combo)
+        # --- ROI debug composite (deferred; see DEBUG_COMPOSITES) ---
+        debug_name = ""
+        if DEBUG_COMPOSITES != "off":
+            debug_name = debug_name_for(upload_name)
+            schedule_debug_composite(debug_name, upload_name, roi_scale)
 
         # --- log ---
         with open(LOG_FILE, "a", newline="") as csvf:
@@ -230,6 +314,14 @@ def uploads(filename):
 
 @APP.route("/debug/<path:filename>")
 def debug(filename):
+    if not os.path.exists(os.path.join(DEBUG_DIR, filename)):
+        if DEBUG_COMPOSITES == "off" or os.path.basename(filename) != filename:
+            abort(404)
+        with _debug_lock:
+            if not os.path.exists(os.path.join(DEBUG_DIR, filename)):
+                if not render_debug_from_upload(filename):
+                    abort(404)
+            _debug_pending.pop(filename, None)
     return send_from_directory(DEBUG_DIR, filename)
 
 if __name__ == "__main__":
@@ -90,9 +90,10 @@ HTML = """
 # ---------------- Model loading (once) ----------------
 _MODEL = None
 _CLASS_NAMES = None
+_INFER_FN = None  # concrete function with a static (None, 224, 224, 3) float32 signature
 
 def load_model_and_labels():
-    global _MODEL, _CLASS_NAMES
+    global _MODEL, _CLASS_NAMES, _INFER_FN
     if _MODEL is not None and _CLASS_NAMES is not None:
         return
 
@@ -110,6 +111,14 @@ def load_model_and_labels():
     _MODEL = tf.keras.models.load_model(str(MODEL_PATH))
     _CLASS_NAMES = json.loads(LABELS_PATH.read_text())["class_names"]
 
+    # Prepared once: calling the concrete function directly avoids the
+    # data-adapter/callback setup that model.predict() repeats on every call.
+    @tf.function(input_signature=[tf.TensorSpec((None, IMG_SIZE[1], IMG_SIZE[0], 3), tf.float32)])
+    def serve(x):
+        return _MODEL(x, training=False)
+
+    _INFER_FN = serve.get_concrete_function()
+
 def ensure_csv():
     if not LOG_FILE.exists():
         with open(LOG_FILE, "w", newline="") as f:
@@ -131,7 +140,7 @@ def predict_frame(frame_bgr):
     load_model_and_labels()
 
     x = preprocess_for_mobilenet(frame_bgr)
-    probs = _MODEL.predict(x, verbose=0)[0]
+    probs = _INFER_FN(tf.constant(x)).numpy()[0]
 
     idx = int(np.argmax(probs))
     pred_label = _CLASS_NAMES[idx]
@@ -0,0 +1,139 @@
+"""
+NAYAN-AI - Export the cataract Keras model to lightweight CPU formats
+Converts backend/catract/artifacts/cataract_mobilenetv2.{h5,keras} into
+cataract_mobilenetv2.tflite and/or cataract_mobilenetv2.onnx, then checks
+that every exported engine reproduces the Keras (label, conf, probs_map)
+output within tolerance.
+
+Usage (from backend/):
+    python export_cataract_model.py                   # export tflite + onnx, then check
+    python export_cataract_model.py --formats tflite
+    python export_cataract_model.py --check-only      # re-run the parity check
+Requires TensorFlow for exporting; tf2onnx for the ONNX format.
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from cataract_inference import (
+    ARTIFACTS_DIR,
+    INPUT_SHAPE,
+    MODEL_BASENAME,
+    KerasBackend,
+    build_inference_function,
+    create_backend,
+    load_class_names,
+    preprocess_for_mobilenet,
+    probs_to_prediction,
+)
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_DIR = PROJECT_DIR / 'uploads' / 'cataract'
+
+# Max allowed |p_engine - p_keras| per class probability, and on conf_percent.
+PROB_TOLERANCE = 1e-3
+CONF_TOLERANCE = 0.1
+
+
+def export_tflite(model, out_path: Path):
+    import tensorflow as tf  # type: ignore
+
+    concrete = build_inference_function(model).get_concrete_function()
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+    out_path.write_bytes(converter.convert())
+    print(f"[EXPORT] Wrote {out_path} ({out_path.stat().st_size / 1e6:.1f} MB)")
+
+
+def export_onnx(model, out_path: Path, opset=13):
+    try:
+        import tf2onnx  # type: ignore
+    except ImportError as e:
+        raise RuntimeError(f"tf2onnx is required for ONNX export (pip install tf2onnx): {e}")
+    import tensorflow as tf  # type: ignore
+
+    tf2onnx.convert.from_function(
+        build_inference_function(model),
+        input_signature=[tf.TensorSpec(INPUT_SHAPE, tf.float32, name='input')],
+        opset=opset,
+        output_path=str(out_path),
+    )
+    print(f"[EXPORT] Wrote {out_path} ({out_path.stat().st_size / 1e6:.1f} MB)")
+
+
+def load_sample_batch(sample_dir: Path, limit: int) -> np.ndarray:
+    """Preprocessed stored uploads; falls back to random images if none exist."""
+    frames = []
+    for path in sorted(sample_dir.glob('*.jpg'))[:limit]:
+        frame = cv2.imread(str(path))
+        if frame is not None:
+            frames.append(preprocess_for_mobilenet(frame)[0])
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.uniform(0, 255, size=INPUT_SHAPE[1:]).astype(np.float32) for _ in range(limit)]
+    return np.stack(frames, axis=0)
+
+
+def check_backend_parity(formats, artifacts_dir=ARTIFACTS_DIR, sample_dir=SAMPLE_DIR, limit=16) -> bool:
+    """Compare each exported engine against Keras on the same inputs."""
+    class_names = load_class_names(artifacts_dir)
+    x = load_sample_batch(sample_dir, limit)
+
+    reference = KerasBackend(artifacts_dir)
+    reference.load()
+    ref_probs = reference.predict_batch(x)
+
+    all_ok = True
+    for fmt in formats:
+        engine = create_backend(fmt, artifacts_dir)
+        engine.load()
+        probs = engine.predict_batch(x)
+
+        max_prob_diff = float(np.max(np.abs(probs - ref_probs)))
+        label_mismatches = 0
+        max_conf_diff = 0.0
+        for ref_row, row in zip(ref_probs, probs):
+            ref_label, ref_conf, _ = probs_to_prediction(ref_row, class_names)
+            label, conf, _ = probs_to_prediction(row, class_names)
+            label_mismatches += int(label != ref_label)
+            max_conf_diff = max(max_conf_diff, abs(conf - ref_conf))
+
+        ok = label_mismatches == 0 and max_prob_diff <= PROB_TOLERANCE and max_conf_diff <= CONF_TOLERANCE
+        all_ok = all_ok and ok
+        print(
+            f"[CHECK] {fmt:6s} n={len(x)} label_mismatches={label_mismatches} "
+            f"max|dp|={max_prob_diff:.2e} max|dconf|={max_conf_diff:.3f}% -> {'OK' if ok else 'FAIL'}"
+        )
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', nargs='+', choices=['tflite', 'onnx'], default=['tflite', 'onnx'])
+    parser.add_argument('--artifacts-dir', type=Path, default=ARTIFACTS_DIR)
+    parser.add_argument('--samples', type=Path, default=SAMPLE_DIR, help='images used for the parity check')
+    parser.add_argument('--limit', type=int, default=16, help='number of sample images to compare')
+    parser.add_argument('--check-only', action='store_true', help='skip export, only run the parity check')
+    parser.add_argument('--skip-check', action='store_true')
+    args = parser.parse_args()
+
+    if not args.check_only:
+        keras = KerasBackend(args.artifacts_dir)
+        keras.load()
+        for fmt in args.formats:
+            out_path = args.artifacts_dir / f"{MODEL_BASENAME}.{fmt}"
+            if fmt == 'tflite':
+                export_tflite(keras.model, out_path)
+            else:
+                export_onnx(keras.model, out_path)
+
+    if args.skip_check:
+        return 0
+    return 0 if check_backend_parity(args.formats, args.artifacts_dir, args.samples, args.limit) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+NAYAN-AI - In-memory image ingest helpers
+Decode uploads straight from request bytes and persist the original bytes
+on a background writer so disk I/O stays off the request's critical path.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale (DCT-domain scaling).
+_REDUCED_COLOR_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+# JPEG start-of-frame markers carrying the image dimensions (excludes DHT/JPG/DAC).
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_dimensions(data: bytes):
+    """Return (width, height) from a JPEG header without decoding, or None if not a JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    n = len(data)
+    while i + 3 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length field
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / start of scan: no SOF seen
+            return None
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            if i + 8 >= n:
+                return None
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + length
+    return None
+
+
+def choose_reduction_factor(width: int, height: int, min_side: int) -> int:
+    """Largest of 8/4/2 that keeps the shorter image side >= min_side (1 = full decode)."""
+    if not min_side or min_side <= 0:
+        return 1
+    short_side = min(width, height)
+    for factor in (8, 4, 2):
+        # libjpeg rounds reduced dimensions up.
+        if -(-short_side // factor) >= min_side:
+            return factor
+    return 1
+
+
+def decode_image_bytes(data: bytes, min_side=None):
+    """Decode encoded image bytes (JPEG/PNG/WEBP) to a BGR array, or None if unreadable.
+
+    With `min_side`, oversized JPEGs are decoded at a reduced scale chosen
+    from the header dimensions so that the shorter side stays >= min_side.
+    Other formats are always decoded at full resolution.
+    """
+    if not data:
+        return None
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    if min_side:
+        dims = jpeg_dimensions(data)
+        if dims is not None:
+            factor = choose_reduction_factor(dims[0], dims[1], min_side)
+            if factor > 1:
+                frame = cv2.imdecode(buf, _REDUCED_COLOR_FLAGS[factor])
+                if frame is not None:
+                    return frame
+
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+
+class AsyncFileWriter:
+    """Write byte blobs to disk on a small thread pool.
+
+    Pending writes are tracked by path so a reader (e.g. the /uploads route)
+    can wait for a file that was accepted but not flushed yet. Failed writes
+    are logged and counted (stats()), since the caller has already answered.
+    """
+
+    def __init__(self, max_workers=2, name='file-writer'):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._name = name
+        self._written = 0
+        self._failed = 0
+        self._last_error = None
+
+    def write(self, path, data: bytes):
+        path = str(path)
+        fut = self._pool.submit(self._write, path, data)
+        with self._lock:
+            self._pending[path] = fut
+        fut.add_done_callback(lambda f, p=path: self._forget(p, f))
+        return fut
+
+    def wait(self, path, timeout=5.0) -> bool:
+        """Block until a pending write of `path` has finished. True if nothing failed."""
+        with self._lock:
+            fut = self._pending.get(str(path))
+        if fut is None:
+            return True
+        try:
+            fut.result(timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'written': self._written,
+                'failed': self._failed,
+                'last_error': self._last_error,
+            }
+
+    def _forget(self, path, fut):
+        error = fut.exception()
+        with self._lock:
+            if self._pending.get(path) is fut:
+                del self._pending[path]
+            if error is None:
+                self._written += 1
+            else:
+                self._failed += 1
+                self._last_error = f"{os.path.basename(path)}: {error}"
+        if error is not None:
+            print(f"[{self._name}] Background write of {path} failed: {error}")
+
+    @staticmethod
+    def _write(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.part'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,149 @@
+"""
+NAYAN-AI - Dynamic micro-batching for model inference
+Collects concurrent single-image requests for a few milliseconds (or until the
+batch is full), runs one batched forward pass and hands each row back to the
+thread that is waiting for it.
+"""
+
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Batch scheduler in front of a `predict_batch(np.ndarray) -> sequence` callable.
+
+    `predict_batch` receives an array of shape (N, ...) built by stacking the
+    submitted items and must return one result per row (e.g. an (N, C) array).
+    All forward passes run on a single worker thread, so the model itself is
+    never called concurrently.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=8, max_wait_ms=5.0, name='batcher'):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self._predict_batch = predict_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait_ms = float(max_wait_ms)
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._completed = 0
+        self._batches = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._queue_wait_ms_total = 0.0
+        self._infer_ms_total = 0.0
+
+    # ---------- public API ----------
+    def submit(self, item: np.ndarray) -> Future:
+        """Queue one item (without batch axis) and return a Future for its result."""
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put((item, fut, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._requests += 1
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return fut
+
+    def predict(self, item: np.ndarray, timeout=None):
+        """Blocking helper: submit one item and wait for its row of the batch output."""
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches = self._batches
+            completed = self._completed
+            return {
+                'name': self.name,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'requests': self._requests,
+                'batches': batches,
+                'errors': self._errors,
+                'mean_batch_size': (completed / batches) if batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                'mean_queue_wait_ms': (self._queue_wait_ms_total / completed) if completed else 0.0,
+                'mean_batch_infer_ms': (self._infer_ms_total / batches) if batches else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._batch_sizes.clear()
+            self._requests = 0
+            self._completed = 0
+            self._batches = 0
+            self._errors = 0
+            self._max_queue_depth = 0
+            self._queue_wait_ms_total = 0.0
+            self._infer_ms_total = 0.0
+
+    # ---------- worker ----------
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+            self._worker.start()
+
+    def _collect_batch(self):
+        """Block for the first item, then gather more until full or the wait budget expires."""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+
+            try:
+                x = np.stack([item for item, _, _ in batch], axis=0)
+                outputs = self._predict_batch(x)
+                if len(outputs) != len(batch):
+                    raise RuntimeError(
+                        f"predict_batch returned {len(outputs)} results for a batch of {len(batch)}"
+                    )
+                for (_, fut, _), out in zip(batch, outputs):
+                    fut.set_result(out)
+                failed = False
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                failed = True
+
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self._batches += 1
+                self._completed += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._infer_ms_total += (finished - started) * 1000.0
+                self._queue_wait_ms_total += sum((started - t) * 1000.0 for _, _, t in batch)
+                if failed:
+                    self._errors += 1
@@ -0,0 +1,124 @@
+"""
+NAYAN-AI - Background analysis jobs
+Long-running analyses (e.g. dry eye videos) run on a small worker pool so the
+request thread can answer 202 + job id immediately. Each job reports progress
+through a callback; `on_update(event, job)` is invoked for every state change
+so the app can forward it over Socket.IO, and `get(job_id)` serves polling.
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueue:
+    """Thread-pool job runner with pollable status; keeps the last `max_retained` jobs."""
+
+    def __init__(self, max_workers=2, max_retained=256, name='jobs', on_update=None):
+        self.name = name
+        self.max_workers = int(max_workers)
+        self.max_retained = int(max_retained)
+        self._on_update = on_update
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, kind=None, meta=None) -> str:
+        """Queue fn(report, *args); `report(progress, info=None)` updates the job while it runs.
+
+        fn's return value becomes the job result; an exception marks the job failed.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'kind': kind or self.name,
+            'state': 'queued',
+            'progress': 0.0,
+            'info': {},
+            'meta': dict(meta or {}),
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_retained:
+                old_id, old = next(iter(self._jobs.items()))
+                if old['state'] in ('queued', 'running'):
+                    break
+                del self._jobs[old_id]
+                self._futures.pop(old_id, None)
+        self._notify('queued', job_id)
+        fut = self._pool.submit(self._run, job_id, fn, args)
+        with self._lock:
+            self._futures[job_id] = fut
+        return job_id
+
+    def get(self, job_id):
+        """Snapshot of one job (dict) or None if unknown / evicted."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, info=dict(job['info']), meta=dict(job['meta'])) if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job has finished (or `timeout` expires) and return its snapshot."""
+        with self._lock:
+            fut = self._futures.get(job_id)
+        if fut is not None:
+            try:
+                fut.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = [job['state'] for job in self._jobs.values()]
+        return {
+            'name': self.name,
+            'max_workers': self.max_workers,
+            'retained': len(states),
+            **{state: states.count(state) for state in ('queued', 'running', 'done', 'failed')},
+        }
+
+    # ---------- worker ----------
+    def _run(self, job_id, fn, args):
+        self._update(job_id, 'running', state='running', started_at=time.time())
+
+        def report(progress, info=None):
+            fields = {'progress': round(float(progress), 4)}
+            if info:
+                fields['info'] = dict(info)
+            self._update(job_id, 'progress', **fields)
+
+        try:
+            result = fn(report, *args)
+        except Exception as e:
+            print(f"[JOBS] {self.name} job {job_id} failed: {e}")
+            self._update(job_id, 'failed', state='failed', error=str(e), finished_at=time.time())
+            return
+        self._update(job_id, 'done', state='done', progress=1.0, result=result, finished_at=time.time())
+
+    def _update(self, job_id, event, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+        self._notify(event, job_id)
+
+    def _notify(self, event, job_id):
+        if self._on_update is None:
+            return
+        job = self.get(job_id)
+        if job is None:
+            return
+        try:
+            self._on_update(event, job)
+        except Exception as e:
+            print(f"[JOBS] on_update({event}) failed: {e}")
@@ -0,0 +1,295 @@
+"""
+NAYAN-AI - Cataract model registry (hot-swap, rollback, shadow scoring)
+Holds up to three loaded model versions side by side:
+
+    live       serves patient traffic
+    previous   the model live replaced; kept warm for instant rollback
+    candidate  loaded and warmed, not yet serving; optionally shadow-scored
+
+Swaps are single reference assignments guarded by a lock and counted by a
+`generation` number, so a request that snapshots (generation, live) can tell
+whether a swap happened while it was in flight.
+
+Shadow scoring re-runs a sampled fraction of live inputs through the
+candidate on a background thread. Work is queued with put_nowait on a bounded
+queue and dropped when the queue is full, so it never blocks the request.
+"""
+
+import time
+import queue
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from cataract_inference import (
+    IMG_SIZE,
+    create_backend,
+    load_class_names,
+    probs_to_prediction,
+)
+
+
+class LoadedModel:
+    """A loaded + warmed inference backend and the class names it was trained with."""
+
+    def __init__(self, backend, class_names, artifacts_dir, load_seconds=None):
+        self.backend = backend
+        self.class_names = list(class_names)
+        self.artifacts_dir = Path(artifacts_dir)
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    @property
+    def version(self):
+        return self.backend.version
+
+    def predict_batch(self, x: np.ndarray) -> np.ndarray:
+        return self.backend.predict_batch(x)
+
+    def describe(self) -> dict:
+        info = self.backend.describe()
+        info.update({
+            'artifacts_dir': str(self.artifacts_dir),
+            'class_names': self.class_names,
+            'load_seconds': self.load_seconds,
+            'loaded_at': self.loaded_at,
+        })
+        return info
+
+
+def load_model(backend_name, artifacts_dir, warmup_runs=1) -> LoadedModel:
+    """Load labels + backend from `artifacts_dir` and run a few dummy predictions."""
+    t0 = time.perf_counter()
+    class_names = load_class_names(artifacts_dir)
+    backend = create_backend(backend_name, artifacts_dir)
+    print(f"Loading cataract model with '{backend.name}' backend from {artifacts_dir}")
+    backend.load()
+    dummy = np.zeros((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+    for _ in range(max(0, warmup_runs)):
+        backend.predict_batch(dummy)
+    return LoadedModel(backend, class_names, artifacts_dir, round(time.perf_counter() - t0, 3))
+
+
+class ModelRegistry:
+    """live / previous / candidate slots plus an asynchronous shadow scorer."""
+
+    def __init__(self, shadow_fraction=0.0, shadow_queue_size=32, name='cataract'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._live = None
+        self._previous = None
+        self._candidate = None
+        self._generation = 0
+        self._history = []
+
+        self._shadow_fraction = float(shadow_fraction)
+        self._shadow_queue = queue.Queue(maxsize=max(1, int(shadow_queue_size)))
+        self._shadow_worker = None
+        self._shadow_stats_lock = threading.Lock()
+        self._reset_shadow_counters()
+
+    # ---------- slots ----------
+    @property
+    def live(self):
+        return self._live
+
+    @property
+    def previous(self):
+        return self._previous
+
+    @property
+    def candidate(self):
+        return self._candidate
+
+    def snapshot(self):
+        """(generation, live) read together, for detecting a swap mid-request."""
+        with self._lock:
+            return self._generation, self._live
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def set_live(self, model: LoadedModel):
+        """Install the first live model (boot); an existing live model becomes `previous`."""
+        with self._lock:
+            if self._live is not None:
+                self._previous = self._live
+            self._live = model
+            self._swapped('set_live', model)
+
+    def stage(self, model: LoadedModel):
+        """Make `model` the candidate (replaces any earlier candidate) and reset shadow stats."""
+        with self._lock:
+            self._candidate = model
+        with self._shadow_stats_lock:
+            self._reset_shadow_counters()
+        print(f"[MODELS] Candidate {model.version} staged ({model.backend.name})")
+
+    def discard_candidate(self):
+        with self._lock:
+            model, self._candidate = self._candidate, None
+        return model
+
+    def promote(self) -> LoadedModel:
+        """candidate -> live, live -> previous. Raises ValueError without a candidate."""
+        with self._lock:
+            if self._candidate is None:
+                raise ValueError("No candidate model staged")
+            self._previous = self._live
+            self._live = self._candidate
+            self._candidate = None
+            self._swapped('promote', self._live)
+            return self._live
+
+    def rollback(self) -> LoadedModel:
+        """Swap live and previous. Raises ValueError without a previous model."""
+        with self._lock:
+            if self._previous is None:
+                raise ValueError("No previous model to roll back to")
+            self._live, self._previous = self._previous, self._live
+            self._swapped('rollback', self._live)
+            return self._live
+
+    def _swapped(self, action, model):
+        """Record a live change (caller holds self._lock)."""
+        self._generation += 1
+        self._history.append({
+            'action': action,
+            'model_version': model.version,
+            'backend': model.backend.name,
+            'generation': self._generation,
+            'at': time.time(),
+        })
+        del self._history[:-20]
+        print(f"[MODELS] {action}: live model is now {model.version} (generation {self._generation})")
+
+    # ---------- shadow scoring ----------
+    @property
+    def shadow_fraction(self) -> float:
+        return self._shadow_fraction
+
+    def set_shadow_fraction(self, fraction: float):
+        fraction = float(fraction)
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("shadow fraction must be between 0 and 1")
+        self._shadow_fraction = fraction
+
+    def maybe_shadow(self, x: np.ndarray, live_probs, live_model: LoadedModel, tag=None) -> bool:
+        """Queue `x` (1, 224, 224, 3) for the candidate with probability shadow_fraction.
+
+        Never blocks: returns False if not sampled, no candidate is staged, or
+        the shadow queue is full.
+        """
+        candidate = self._candidate
+        if candidate is None or self._shadow_fraction <= 0.0 or candidate is live_model:
+            return False
+        if random.random() >= self._shadow_fraction:
+            return False
+        self._ensure_shadow_worker()
+        try:
+            self._shadow_queue.put_nowait((x, np.asarray(live_probs), live_model, candidate, tag))
+        except queue.Full:
+            with self._shadow_stats_lock:
+                self._shadow['dropped'] += 1
+            return False
+        with self._shadow_stats_lock:
+            self._shadow['queued'] += 1
+        return True
+
+    def _ensure_shadow_worker(self):
+        if self._shadow_worker is not None and self._shadow_worker.is_alive():
+            return
+        with self._lock:
+            if self._shadow_worker is None or not self._shadow_worker.is_alive():
+                self._shadow_worker = threading.Thread(
+                    target=self._shadow_loop, name=f'{self.name}-shadow', daemon=True
+                )
+                self._shadow_worker.start()
+
+    def _shadow_loop(self):
+        while True:
+            x, live_probs, live_model, candidate, tag = self._shadow_queue.get()
+            try:
+                t0 = time.perf_counter()
+                probs = candidate.predict_batch(x)[0]
+                infer_ms = (time.perf_counter() - t0) * 1000.0
+            except Exception as e:
+                with self._shadow_stats_lock:
+                    self._shadow['errors'] += 1
+                print(f"[SHADOW] Candidate prediction failed: {e}")
+                continue
+
+            if candidate is not self._candidate:
+                continue  # candidate was replaced/promoted while queued
+            live_label, _, _ = probs_to_prediction(live_probs, live_model.class_names)
+            cand_label, _, _ = probs_to_prediction(probs, candidate.class_names)
+            agree = live_label == cand_label
+            abs_diff = (
+                float(np.max(np.abs(probs - live_probs))) if probs.shape == live_probs.shape else None
+            )
+
+            with self._shadow_stats_lock:
+                s = self._shadow
+                s['compared'] += 1
+                s['agreements'] += int(agree)
+                s['infer_ms_total'] += infer_ms
+                if abs_diff is not None:
+                    s['abs_prob_diff_total'] += abs_diff
+                    s['max_abs_prob_diff'] = max(s['max_abs_prob_diff'], abs_diff)
+                pair = f"{live_label}->{cand_label}"
+                s['transitions'][pair] = s['transitions'].get(pair, 0) + 1
+                compared, agreements = s['compared'], s['agreements']
+
+            if not agree:
+                print(f"[SHADOW] Disagreement{f' on {tag}' if tag else ''}: live={live_label} candidate={cand_label}")
+            if compared % 50 == 0:
+                print(f"[SHADOW] {compared} compared, agreement {agreements / compared:.1%}")
+
+    def _reset_shadow_counters(self):
+        self._shadow = {
+            'queued': 0,
+            'dropped': 0,
+            'errors': 0,
+            'compared': 0,
+            'agreements': 0,
+            'infer_ms_total': 0.0,
+            'abs_prob_diff_total': 0.0,
+            'max_abs_prob_diff': 0.0,
+            'transitions': {},
+        }
+
+    def shadow_stats(self) -> dict:
+        with self._shadow_stats_lock:
+            s = dict(self._shadow)
+            s['transitions'] = dict(s['transitions'])
+        compared = s['compared']
+        return {
+            'fraction': self._shadow_fraction,
+            'queue_depth': self._shadow_queue.qsize(),
+            'queued': s['queued'],
+            'dropped': s['dropped'],
+            'errors': s['errors'],
+            'compared': compared,
+            'agreements': s['agreements'],
+            'agreement_rate': (s['agreements'] / compared) if compared else None,
+            'mean_abs_prob_diff': (s['abs_prob_diff_total'] / compared) if compared else None,
+            'max_abs_prob_diff': s['max_abs_prob_diff'],
+            'mean_candidate_infer_ms': (s['infer_ms_total'] / compared) if compared else None,
+            'label_transitions': s['transitions'],
+        }
+
+    def describe(self) -> dict:
+        with self._lock:
+            live, previous, candidate = self._live, self._previous, self._candidate
+            generation, history = self._generation, list(self._history)
+        return {
+            'generation': generation,
+            'live': live.describe() if live else None,
+            'previous': previous.describe() if previous else None,
+            'candidate': candidate.describe() if candidate else None,
+            'shadow': self.shadow_stats(),
+            'history': history,
+        }
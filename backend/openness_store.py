@@ -0,0 +1,103 @@
+"""
+NAYAN-AI - Stored per-frame openness series
+The eye-openness signal of every analysed dry eye video is kept as a float32
+.npy (one file per video, memory-mapped on load) plus a small JSON sidecar,
+so blink thresholds can be re-tuned with blink_analysis.redetect() without
+decoding the videos again.
+
+Series are grouped by an extraction tag (openness metric / Canny thresholds,
+ROI scale and working width, target fps): changing how the signal is computed starts a new
+group instead of mixing incompatible series.
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import blink_analysis
+
+
+def extraction_tag(metric=None) -> str:
+    """Identifies the settings that produced a series (not the blink thresholds)."""
+    metric = metric or blink_analysis.OPENNESS_METRIC
+    if metric == 'canny':
+        metric = f"canny{blink_analysis.CANNY_LOW}-{blink_analysis.CANNY_HIGH}"
+    return (
+        f"{metric}"
+        f"_roi{blink_analysis.ROI_SCALE:g}w{blink_analysis.ROI_WORK_WIDTH}_fps{blink_analysis.TARGET_FPS}"
+    )
+
+
+class OpennessStore:
+    """Directory of `<tag>/<video stem>.npy` float32 series with `.json` sidecars."""
+
+    def __init__(self, root, tag=None):
+        self.root = Path(root)
+        self.tag = tag or extraction_tag()
+        self.dir = self.root / self.tag
+
+    def _paths(self, key):
+        stem = Path(str(key)).stem
+        return self.dir / f"{stem}.npy", self.dir / f"{stem}.json"
+
+    def save(self, key, series, **meta):
+        """Atomically write one series; `meta` (e.g. video_file, result, stop_reason) goes to the sidecar."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        npy_path, json_path = self._paths(key)
+        arr = np.asarray(series, dtype=np.float32)
+
+        tmp = npy_path.with_suffix('.npy.part')
+        with open(tmp, 'wb') as f:
+            np.save(f, arr)
+        os.replace(tmp, npy_path)
+
+        sidecar = {
+            'key': Path(str(key)).name,
+            'frames': int(len(arr)),
+            'target_fps': blink_analysis.TARGET_FPS,
+            'tag': self.tag,
+            'saved_at': time.time(),
+            **meta,
+        }
+        tmp = json_path.with_suffix('.json.part')
+        tmp.write_text(json.dumps(sidecar, default=float))
+        os.replace(tmp, json_path)
+        return npy_path
+
+    def has(self, key) -> bool:
+        return self._paths(key)[0].exists()
+
+    def load(self, key, mmap=True):
+        """The float32 series (read-only memmap by default), or None if not stored."""
+        npy_path, _ = self._paths(key)
+        if not npy_path.exists():
+            return None
+        return np.load(npy_path, mmap_mode='r' if mmap else None)
+
+    def meta(self, key) -> dict:
+        _, json_path = self._paths(key)
+        try:
+            return json.loads(json_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def is_partial(self, key) -> bool:
+        """True if the series stops before the end of the video (adaptive analysis, see
+        blink_analysis.PARTIAL_STOP_REASONS); older sidecars keep stop_reason in `result`."""
+        meta = self.meta(key)
+        reason = meta.get('stop_reason') or (meta.get('result') or {}).get('stop_reason')
+        return reason in blink_analysis.PARTIAL_STOP_REASONS
+
+    def keys(self):
+        if not self.dir.exists():
+            return []
+        return sorted(p.stem for p in self.dir.glob('*.npy'))
+
+    def iter_series(self, mmap=True):
+        for key in self.keys():
+            series = self.load(key, mmap=mmap)
+            if series is not None:
+                yield key, series
@@ -0,0 +1,160 @@
+"""
+NAYAN-AI - Content-hash prediction cache
+Results are keyed by (kind, sha256 of the upload bytes, version), where the
+version is the model fingerprint for DL predictions and the feature-engine
+version for image metrics. A bounded in-memory LRU sits in front of a
+persistent SQLite table, so byte-identical re-uploads (e.g. network retries)
+skip decoding and inference entirely.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_digest(data: bytes) -> str:
+    """Hex SHA-256 of the raw upload bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PredictionCache:
+    """Two-tier (LRU memory + SQLite) cache of JSON-serialisable result dicts."""
+
+    def __init__(self, db_path, max_entries=1024, enabled=True):
+        self.db_path = str(db_path)
+        self.max_entries = int(max_entries)
+        self.enabled = enabled
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._writes = 0
+
+        if self.enabled:
+            self._init_db()
+
+    # ---------- public API ----------
+    def get(self, kind: str, digest: str, version: str):
+        """Return a fresh copy of the cached dict, or None."""
+        if not self.enabled:
+            return None
+        key = (kind, digest, version)
+
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self._hits_memory += 1
+                return json.loads(payload)
+
+        payload = self._db_get(key)
+        with self._lock:
+            if payload is None:
+                self._misses += 1
+                return None
+            self._hits_disk += 1
+            self._remember(key, payload)
+        return json.loads(payload)
+
+    def put(self, kind: str, digest: str, version: str, result: dict):
+        if not self.enabled:
+            return
+        key = (kind, digest, version)
+        payload = json.dumps(result)
+        with self._lock:
+            self._remember(key, payload)
+            self._writes += 1
+        self._db_put(key, payload)
+
+    def invalidate_other_versions(self, kind: str, version: str) -> int:
+        """Drop every `kind` entry not produced by `version` (e.g. after a model change)."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            stale = [k for k in self._memory if k[0] == kind and k[2] != version]
+            for k in stale:
+                del self._memory[k]
+        with self._db_lock:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                cur = conn.execute(
+                    'DELETE FROM prediction_cache WHERE kind = ? AND version != ?', (kind, version)
+                )
+                conn.commit()
+                removed = cur.rowcount
+            finally:
+                conn.close()
+        if removed:
+            print(f"[CACHE] Invalidated {removed} stale '{kind}' entries (current version {version})")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk
+            lookups = hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'memory_entries': len(self._memory),
+                'max_memory_entries': self.max_entries,
+                'hits': hits,
+                'hits_memory': self._hits_memory,
+                'hits_disk': self._hits_disk,
+                'misses': self._misses,
+                'writes': self._writes,
+                'hit_rate': (hits / lookups) if lookups else 0.0,
+            }
+
+    # ---------- internals ----------
+    def _remember(self, key, payload):
+        """Insert into the LRU tier (caller holds self._lock)."""
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _init_db(self):
+        with self._db_lock:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                conn.execute('''CREATE TABLE IF NOT EXISTS prediction_cache (
+                    kind TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL,
+                    PRIMARY KEY (kind, digest, version)
+                )''')
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _db_get(self, key):
+        with self._db_lock:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                row = conn.execute(
+                    'SELECT payload FROM prediction_cache WHERE kind = ? AND digest = ? AND version = ?', key
+                ).fetchone()
+            finally:
+                conn.close()
+        return row[0] if row else None
+
+    def _db_put(self, key, payload):
+        with self._db_lock:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO prediction_cache (kind, digest, version, payload, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (*key, payload, time.time())
+                )
+                conn.commit()
+            finally:
+                conn.close()
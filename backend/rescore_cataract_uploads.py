@@ -0,0 +1,247 @@
+"""
+NAYAN-AI - Offline bulk re-scoring of stored cataract uploads
+After retraining cataract_mobilenetv2, re-runs the DL model over every
+uploads/cataract/ image referenced by cataract_results and writes the new
+label, confidence and model_version back in bulk transactions.
+
+Files are decoded on a thread pool while the previous batch is on the model;
+progress is checkpointed after every commit, so an interrupted run resumes
+where it stopped (for the same model version).
+
+Usage (from backend/, with the server stopped or idle):
+    python rescore_cataract_uploads.py                    # re-score everything
+    python rescore_cataract_uploads.py --only-stale       # skip rows already on this model
+    python rescore_cataract_uploads.py --batch-size 64 --workers 8 --backend onnx
+    python rescore_cataract_uploads.py --dry-run --limit 500
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cataract_inference import (
+    ARTIFACTS_DIR,
+    create_backend,
+    load_class_names,
+    preprocess_for_mobilenet,
+    probs_to_prediction,
+    is_cataract_risk_label,
+)
+from image_io import decode_image_bytes
+
+BASE_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BASE_DIR.parent
+UPLOAD_DIR = PROJECT_DIR / 'uploads' / 'cataract'
+DEFAULT_DB = BASE_DIR / 'nayan_ai.db'
+DEFAULT_CHECKPOINT = BASE_DIR / 'rescore_checkpoint.json'
+
+
+# ============== CHECKPOINT ==============
+def load_checkpoint(path: Path, model_version: str) -> int:
+    """Return the last committed cataract_results.id for this model version (0 = start over)."""
+    if not path.exists():
+        return 0
+    try:
+        state = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return 0
+    if state.get('model_version') != model_version:
+        print(f"[RESCORE] Checkpoint is for model {state.get('model_version')}, starting over")
+        return 0
+    return int(state.get('last_id', 0))
+
+
+def save_checkpoint(path: Path, model_version: str, last_id: int, totals: dict):
+    tmp_path = path.with_suffix(path.suffix + '.part')
+    tmp_path.write_text(json.dumps({
+        'model_version': model_version,
+        'last_id': last_id,
+        'updated_at': time.time(),
+        **totals,
+    }, indent=2), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+# ============== PIPELINE ==============
+def ensure_model_version_column(conn):
+    """Add cataract_results.model_version to databases the app has not migrated yet (as init_db() does)."""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(cataract_results)')}
+    if 'model_version' not in columns:
+        with conn:
+            conn.execute('ALTER TABLE cataract_results ADD COLUMN model_version TEXT')
+        print("[RESCORE] Added cataract_results.model_version column")
+
+
+def iter_rows(conn, after_id: int, model_version: str, only_stale: bool, limit=None):
+    """Yield (id, image_file, label) rows in id order."""
+    sql = 'SELECT id, image_file, label FROM cataract_results WHERE id > ? AND image_file IS NOT NULL'
+    params = [after_id]
+    if only_stale:
+        sql += ' AND (model_version IS NULL OR model_version != ?)'
+        params.append(model_version)
+    sql += ' ORDER BY id'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(int(limit))
+    # fetchall keeps the read cursor closed while the same connection writes.
+    yield from conn.execute(sql, params).fetchall()
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_input(upload_dir: Path, image_file: str, min_side):
+    """Read + decode + preprocess one stored upload; None if missing or unreadable."""
+    try:
+        data = (upload_dir / image_file).read_bytes()
+    except OSError:
+        return None
+    frame = decode_image_bytes(data, min_side=min_side)
+    if frame is None:
+        return None
+    return preprocess_for_mobilenet(frame)[0]
+
+
+def decoded_batches(rows, pool, upload_dir, batch_size, min_side, prefetch=2):
+    """Yield (last_row_id, ids, x, missing_ids) per chunk; up to `prefetch` chunks decode ahead."""
+    in_flight = deque()
+    chunks = _chunks(rows, batch_size)
+
+    def submit(chunk):
+        futures = [pool.submit(_load_input, upload_dir, image_file, min_side) for _, image_file, _ in chunk]
+        in_flight.append((chunk, futures))
+
+    for chunk in chunks:
+        submit(chunk)
+        if len(in_flight) >= prefetch:
+            break
+
+    while in_flight:
+        chunk, futures = in_flight.popleft()
+        next_chunk = next(chunks, None)
+        if next_chunk is not None:
+            submit(next_chunk)
+
+        ids, arrays, missing = [], [], []
+        for (row_id, _, _), fut in zip(chunk, futures):
+            x = fut.result()
+            if x is None:
+                missing.append(row_id)
+            else:
+                ids.append(row_id)
+                arrays.append(x)
+        x = np.stack(arrays, axis=0) if arrays else None
+        yield chunk[-1][0], ids, x, missing
+
+
+def rescore(args) -> int:
+    backend = create_backend(args.backend, args.artifacts_dir)
+    print(f"[RESCORE] Loading '{backend.name}' backend")
+    backend.load()
+    class_names = load_class_names(args.artifacts_dir)
+    model_version = backend.version
+    print(f"[RESCORE] Model version {model_version} ({backend.model_path})")
+
+    conn = sqlite3.connect(str(args.db), timeout=30)
+    ensure_model_version_column(conn)
+    after_id = 0 if args.restart else load_checkpoint(args.checkpoint, model_version)
+    if after_id:
+        print(f"[RESCORE] Resuming after cataract_results.id={after_id}")
+    rows = list(iter_rows(conn, after_id, model_version, args.only_stale, args.limit))
+    print(f"[RESCORE] {len(rows)} rows to score, batch size {args.batch_size}, {args.workers} decode workers")
+
+    totals = {'scored': 0, 'missing': 0, 'changed': 0}
+    pending_updates = []
+    last_id = after_id
+    batches_since_commit = 0
+    t_start = time.perf_counter()
+
+    def commit():
+        nonlocal pending_updates, batches_since_commit
+        if not args.dry_run and pending_updates:
+            with conn:
+                conn.executemany(
+                    'UPDATE cataract_results SET label = ?, confidence = ?, model_version = ? WHERE id = ?',
+                    pending_updates,
+                )
+        pending_updates = []
+        batches_since_commit = 0
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, model_version, last_id, totals)
+        elapsed = time.perf_counter() - t_start
+        done = totals['scored'] + totals['missing']
+        rate = totals['scored'] / elapsed if elapsed > 0 else 0.0
+        print(f"[RESCORE] {done}/{len(rows)} rows  {rate:.1f} images/s  "
+              f"changed={totals['changed']} missing={totals['missing']}")
+
+    old_labels = {row_id: label for row_id, _, label in rows}
+
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='rescore-decode') as pool:
+        for batch_last_id, ids, x, missing in decoded_batches(
+            rows, pool, args.uploads, args.batch_size, args.min_side
+        ):
+            if x is not None:
+                probs = backend.predict_batch(x)
+                for row_id, row in zip(ids, probs):
+                    pred_label, conf_percent, _ = probs_to_prediction(row, class_names)
+                    label = 'Possible Cataract Risk' if is_cataract_risk_label(pred_label) else 'Normal'
+                    totals['changed'] += int(old_labels.get(row_id) != label)
+                    pending_updates.append((label, conf_percent, model_version, row_id))
+            totals['scored'] += len(ids)
+            totals['missing'] += len(missing)
+            last_id = batch_last_id
+
+            batches_since_commit += 1
+            if batches_since_commit >= args.commit_every:
+                commit()
+        if batches_since_commit or not rows:
+            commit()
+
+    conn.close()
+    elapsed = time.perf_counter() - t_start
+    rate = totals['scored'] / elapsed if elapsed > 0 else 0.0
+    print(f"[RESCORE] Done: scored={totals['scored']} missing={totals['missing']} "
+          f"changed={totals['changed']} in {elapsed:.1f}s ({rate:.1f} images/s)"
+          + (" [dry run, nothing written]" if args.dry_run else ""))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=Path, default=DEFAULT_DB)
+    parser.add_argument('--uploads', type=Path, default=UPLOAD_DIR)
+    parser.add_argument('--artifacts-dir', type=Path, default=ARTIFACTS_DIR)
+    parser.add_argument('--backend', default=os.environ.get('NAYAN_CATARACT_BACKEND', 'keras'),
+                        help='keras, tflite, onnx or auto')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1), help='decode threads')
+    parser.add_argument('--commit-every', type=int, default=10, help='batches per DB transaction')
+    parser.add_argument('--min-side', type=int, default=int(os.environ.get('NAYAN_DECODE_MIN_SIDE', '0')),
+                        help='reduced JPEG decode of the DL input, as in the server (0 = full decode)')
+    parser.add_argument('--checkpoint', type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--only-stale', action='store_true', help='skip rows already scored by this model')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help='score but do not write to the DB')
+    args = parser.parse_args()
+    return rescore(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
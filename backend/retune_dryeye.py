@@ -0,0 +1,162 @@
+"""
+NAYAN-AI - Re-tune dry eye blink thresholds on stored openness series
+Every analysed video leaves its per-frame openness series in openness_series/
+(see openness_store.py). This tool re-runs the blink logic over all of them
+for a grid of THRESH_K / SMOOTH_WINDOW / MIN_BLINK_MS / MAX_BLINK_MS /
+REFRACTORY_MS values with blink_analysis.redetect(): no video is decoded, so a
+sweep over the whole archive takes seconds.
+
+Usage (from backend/):
+    python retune_dryeye.py                                   # current settings only
+    python retune_dryeye.py --thresh-k 0.55,0.6,0.65,0.7 --smooth-window 5,7,9
+    python retune_dryeye.py --thresh-k 0.6,0.65 --labels clinician.csv --out sweep.csv
+    python retune_dryeye.py --backfill                        # decode stored videos without a full series
+
+Series that stop early (adaptive analysis, see blink_analysis.PARTIAL_STOP_REASONS)
+are left out of the sweep: thresholds would be compared on truncated videos.
+"""
+
+import sys
+import csv
+import time
+import argparse
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+import blink_analysis
+from blink_analysis import openness_series, redetect
+from openness_store import OpennessStore, extraction_tag
+
+BASE_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BASE_DIR.parent
+DEFAULT_SERIES_DIR = BASE_DIR / 'openness_series'
+DEFAULT_VIDEO_DIR = PROJECT_DIR / 'uploads' / 'dryeye'
+
+PARAMS = ('thresh_k', 'smooth_window', 'min_blink_ms', 'max_blink_ms', 'refractory_ms')
+
+
+def _list(cast):
+    return lambda text: [cast(v) for v in text.split(',') if v.strip()]
+
+
+def backfill(store: OpennessStore, video_dir: Path, limit=None, metric=None):
+    """Decode videos without a full stored series yet (the only step that touches video).
+
+    Series cut short by adaptive analysis are decoded again in full.
+    """
+    videos = sorted(p for p in video_dir.glob('*') if p.suffix.lower() in ('.mp4', '.mov', '.avi', '.webm'))
+    missing = [p for p in videos if not store.has(p.name) or store.is_partial(p.name)][:limit]
+    print(f"[RETUNE] Backfilling {len(missing)} of {len(videos)} videos in {video_dir}")
+    for i, path in enumerate(missing, 1):
+        t0 = time.perf_counter()
+        try:
+            series = openness_series(path, metric=metric)
+        except Exception as e:
+            print(f"  {path.name}: {e}")
+            continue
+        max_frames = blink_analysis.MAX_VIDEO_SECONDS * blink_analysis.TARGET_FPS
+        store.save(path.name, series, video_file=path.name, result=redetect(series),
+                   stop_reason='max_duration' if len(series) >= max_frames else 'end_of_video')
+        print(f"  [{i}/{len(missing)}] {path.name}: {len(series)} frames in {time.perf_counter() - t0:.1f} s")
+
+
+def load_labels(path):
+    """{video stem: 1 (dry eye risk) / 0 (normal)} from a CSV with filename,label columns."""
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for rec in csv.DictReader(f):
+            name = rec.get('filename') or rec.get('video_file') or ''
+            label = (rec.get('label') or '').strip().lower()
+            if name and label:
+                labels[Path(name).stem] = int('risk' in label or label in ('1', 'dry eye', 'positive'))
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series-dir', type=Path, default=DEFAULT_SERIES_DIR)
+    parser.add_argument('--metric', default=blink_analysis.OPENNESS_METRIC,
+                        help=f"openness metric of the series ({', '.join(blink_analysis.OPENNESS_METRICS)})")
+    parser.add_argument('--backfill', action='store_true', help='first extract series for stored videos lacking one')
+    parser.add_argument('--include-partial', action='store_true',
+                        help='also sweep series that stop before the end of the video')
+    parser.add_argument('--videos', type=Path, default=DEFAULT_VIDEO_DIR)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--thresh-k', type=_list(float), default=[blink_analysis.THRESH_K])
+    parser.add_argument('--smooth-window', type=_list(int), default=[blink_analysis.SMOOTH_WINDOW])
+    parser.add_argument('--min-blink-ms', type=_list(int), default=[blink_analysis.MIN_BLINK_MS])
+    parser.add_argument('--max-blink-ms', type=_list(int), default=[blink_analysis.MAX_BLINK_MS])
+    parser.add_argument('--refractory-ms', type=_list(int), default=[blink_analysis.REFRACTORY_MS])
+    parser.add_argument('--labels', type=Path, help='reference labels CSV (filename,label)')
+    parser.add_argument('--out', type=Path, help='write one row per parameter set')
+    args = parser.parse_args()
+
+    store = OpennessStore(args.series_dir, tag=extraction_tag(args.metric))
+    if args.backfill:
+        backfill(store, args.videos, args.limit, args.metric)
+
+    t0 = time.perf_counter()
+    series, partial = [], 0
+    for key, s in store.iter_series():
+        if store.is_partial(key) and not args.include_partial:
+            partial += 1
+            continue
+        series.append((key, np.asarray(s, dtype=np.float64)))
+    print(f"[RETUNE] {len(series)} stored series ({store.tag}) loaded in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if partial:
+        print(f"[RETUNE] Skipped {partial} partial series (adaptive stop); --backfill decodes them in full")
+    if not series:
+        print("[RETUNE] Nothing to re-tune; analyse some videos or run with --backfill.")
+        return 1
+
+    labels = load_labels(args.labels) if args.labels else None
+    current = {key: redetect(s)['label'] for key, s in series}
+
+    grid = list(itertools.product(args.thresh_k, args.smooth_window, args.min_blink_ms,
+                                  args.max_blink_ms, args.refractory_ms))
+    rows = []
+    t0 = time.perf_counter()
+    for values in grid:
+        params = dict(zip(PARAMS, values))
+        results = {key: redetect(s, **params) for key, s in series}
+        risk = np.array([r['label'] == 'Dry Eye Risk' for r in results.values()])
+        row = {
+            **params,
+            'videos': len(results),
+            'mean_blink_rate_bpm': round(float(np.mean([r['blink_rate_bpm'] for r in results.values()])), 3),
+            'risk_fraction': round(float(risk.mean()), 4),
+            'label_changes_vs_current': sum(results[k]['label'] != current[k] for k in results),
+        }
+        if labels:
+            pairs = [(results[k]['label'] == 'Dry Eye Risk', labels[k]) for k in results if k in labels]
+            if pairs:
+                pred, truth = np.array(pairs, dtype=bool).T
+                row['labelled'] = len(pairs)
+                row['accuracy'] = round(float((pred == truth).mean()), 4)
+                row['sensitivity'] = round(float(pred[truth].mean()), 4) if truth.any() else None
+                row['specificity'] = round(float((~pred[~truth]).mean()), 4) if (~truth).any() else None
+        rows.append(row)
+    elapsed = time.perf_counter() - t0
+    print(f"[RETUNE] {len(grid)} parameter sets x {len(series)} videos in {elapsed * 1000:.0f} ms "
+          f"({elapsed * 1000 / max(len(grid) * len(series), 1):.2f} ms per video)")
+
+    columns = list(rows[0].keys())
+    for row in rows:
+        columns += [c for c in row if c not in columns]
+    print('  ' + '  '.join(f"{c:>14s}" for c in columns))
+    for row in rows:
+        print('  ' + '  '.join(f"{str(row.get(c, '')):>14s}" for c in columns))
+
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"[RETUNE] Wrote {len(rows)} rows to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+NAYAN-AI - Per-stage latency instrumentation
+`timer.span('cataract.decode')` times one stage of a request. Each stage keeps
+a fixed-size ring buffer of recent durations for p50/p95/p99, and the spans of
+the current request are collected (per thread / context) so they can be
+returned as a Server-Timing header.
+
+Recording a span costs two perf_counter() calls, a list append and a short
+lock hold, so it is cheap enough to leave on in production.
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import numpy as np
+
+_current_spans = contextvars.ContextVar('nayan_stage_spans', default=None)
+
+
+class _RingBuffer:
+    """Last `size` samples in a preallocated float64 array."""
+
+    __slots__ = ('values', 'count', 'total', 'max')
+
+    def __init__(self, size):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def window(self):
+        return self.values[:min(self.count, len(self.values))].copy()
+
+
+class StageTimer:
+    """Rolling per-stage latency histograms plus per-request span breakdowns."""
+
+    def __init__(self, window=2048, enabled=True):
+        self.window = int(window)
+        self.enabled = enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    # ---------- recording ----------
+    @contextmanager
+    def span(self, stage):
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - t0) * 1000.0)
+
+    def record(self, stage, duration_ms):
+        """Add one duration (ms) to `stage` and to the current request's breakdown."""
+        with self._lock:
+            buf = self._stages.get(stage)
+            if buf is None:
+                buf = self._stages[stage] = _RingBuffer(self.window)
+            buf.add(duration_ms)
+        spans = _current_spans.get()
+        if spans is not None:
+            spans.append((stage, duration_ms))
+
+    @contextmanager
+    def timed_lock(self, lock, stage):
+        """Acquire `lock`, recording the wait as `stage`, and hold it for the block."""
+        with self.span(stage):
+            lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    # ---------- per-request breakdown ----------
+    def begin_request(self):
+        _current_spans.set([] if self.enabled else None)
+
+    def end_request(self):
+        """Return and clear the spans recorded since begin_request()."""
+        spans = _current_spans.get()
+        _current_spans.set(None)
+        return spans or []
+
+    @staticmethod
+    def server_timing_header(spans):
+        """Format spans as an HTTP Server-Timing value (repeated stages are summed)."""
+        totals = {}
+        for stage, duration_ms in spans:
+            totals[stage] = totals.get(stage, 0.0) + duration_ms
+        return ', '.join(f"{stage.replace('.', '-')};dur={ms:.2f}" for stage, ms in totals.items())
+
+    # ---------- reporting ----------
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = {
+                stage: (buf.window(), buf.count, buf.total, buf.max) for stage, buf in self._stages.items()
+            }
+        out = {}
+        for stage, (window, count, total, max_ms) in sorted(snapshot.items()):
+            p50, p95, p99 = np.percentile(window, [50, 95, 99]) if len(window) else (0.0, 0.0, 0.0)
+            out[stage] = {
+                'count': count,
+                'mean_ms': round(total / count, 3) if count else 0.0,
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(max_ms, 3),
+                'window': len(window),
+            }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
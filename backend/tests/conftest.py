@@ -0,0 +1,20 @@
+"""Shared helpers for the backend tests. Run from backend/: python -m pytest tests"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from blink_reference import write_eye_video  # noqa: E402
+
+
+@pytest.fixture
+def eye_video(tmp_path):
+    """Factory: eye_video(blinks, seconds, **kw) -> Path of a synthetic blink video."""
+    def make(blinks, seconds, name='eye.mp4', **kw):
+        return write_eye_video(tmp_path / name, blinks, seconds, **kw)
+    return make
@@ -0,0 +1,181 @@
+"""Dry eye blink analysis: the fast paths must give the sequential reference results."""
+
+import numpy as np
+import pytest
+
+import blink_analysis
+from blink_analysis import (
+    BlinkDetector,
+    analyze_video,
+    analyze_video_parallel,
+    detect_blinks,
+    frame_roi,
+    normalize_roi,
+    openness_metric,
+    openness_series,
+    plan_segments,
+    redetect,
+)
+from blink_reference import eye_frames, legacy_detect, synthetic_series
+from openness_store import OpennessStore
+import retune_dryeye
+
+
+def _under_reported(monkeypatch, fraction):
+    """Make _sampling_plan report only `fraction` of the real frame count (as some containers do)."""
+    plan = blink_analysis._sampling_plan
+
+    def sampling_plan(cap):
+        frame_step, max_frames, expected_kept = plan(cap)
+        return frame_step, max_frames, int(expected_kept * fraction)
+    monkeypatch.setattr(blink_analysis, '_sampling_plan', sampling_plan)
+
+
+def test_adaptive_stop_survives_under_reported_frame_count(eye_video, monkeypatch):
+    # 7 blinks in the first 16 s of a 60 s video: 7 / min, Dry Eye Risk. Had the
+    # container's 24 s been trusted, the label would look settled as Normal at 16 s.
+    video = eye_video([1.0 + 2.5 * k for k in range(7)], seconds=60)
+    full = analyze_video(video, queue_size=0)
+    assert full['blink_count'] == 7
+    assert full['label'] == 'Dry Eye Risk'
+
+    _under_reported(monkeypatch, 0.4)
+    out = analyze_video(video, adaptive=True, queue_size=0)
+    assert out['label'] == full['label']
+    assert out['stop_reason'] != 'decided_normal'
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_settled_label_matches_full_run(seed):
+    fps = blink_analysis.TARGET_FPS
+    max_frames = int(blink_analysis.MAX_VIDEO_SECONDS * fps)
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(fps * 10, max_frames + 1))
+    series = synthetic_series(n, seed=seed, gap=[(2, 6), (3, 9), (5, 13), (8, 20)][seed % 4])
+    full = BlinkDetector()
+    for m in series:
+        full.update(float(m))
+
+    detector = BlinkDetector()
+    for m in series:
+        detector.update(float(m))
+        decided = detector.settled(max_frames)
+        if decided:
+            assert decided[0] == full.result()['label']
+            assert detector.result()['label'] == full.result()['label']
+            break
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_rolling_detector_matches_full_history_reference(seed):
+    # O(1) rolling mean / running median vs moving_average + np.median over the whole history.
+    n = int(np.random.default_rng(seed).integers(1, 1800))
+    series = synthetic_series(n, seed=seed, gap=[(2, 6), (5, 13), (0.3, 1)][seed % 3])
+    assert detect_blinks(series) == legacy_detect(series)
+
+
+REDETECT_PARAMS = [
+    {},
+    {'thresh_k': 0.55, 'smooth_window': 5},
+    {'thresh_k': 0.8, 'smooth_window': 3, 'refractory_ms': 100},
+    {'smooth_window': 11, 'min_blink_ms': 0, 'max_blink_ms': 1000},
+]
+
+
+@pytest.mark.parametrize('params', REDETECT_PARAMS)
+@pytest.mark.parametrize('seed', range(50))
+def test_redetect_matches_detector(seed, params):
+    # Stored series are float32; the vectorised re-detection must match the per-frame state machine.
+    n = int(np.random.default_rng(seed).integers(1, 1800))
+    series = synthetic_series(n, seed=seed).astype(np.float32)
+    assert redetect(series, **params) == detect_blinks(series, **params)
+
+
+def test_redetect_empty_series():
+    assert redetect(np.zeros(0, np.float32)) == detect_blinks([])
+
+
+def test_video_analysis_matches_full_history_reference(eye_video):
+    video = eye_video([0.8 + 2.7 * k for k in range(7)], seconds=20)
+    out = analyze_video(video, queue_size=0)
+    reference = legacy_detect(openness_series(video))
+    assert {k: v for k, v in out.items() if k in reference} == reference
+    assert out['blink_count'] == 7
+
+
+@pytest.fixture
+def process_pool():
+    yield
+    with blink_analysis._process_pool_lock:
+        if blink_analysis._process_pool is not None:
+            blink_analysis._process_pool.shutdown(wait=True)
+            blink_analysis._process_pool = None
+
+
+@pytest.mark.parametrize('expected_kept,workers', [(450, 4), (451, 3), (90, 8), (44, 2), (900, 1)])
+def test_plan_segments_cover_the_video(expected_kept, workers):
+    max_frames = int(blink_analysis.MAX_VIDEO_SECONDS * blink_analysis.TARGET_FPS)
+    segments = plan_segments(expected_kept, max_frames, workers)
+    assert segments[0][0] == 0 and segments[-1][1] == max_frames
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert 1 <= len(segments) <= workers
+
+
+@pytest.mark.parametrize('adaptive', [False, True])
+def test_segment_parallel_matches_sequential(eye_video, process_pool, adaptive):
+    video = eye_video([0.6 + 1.9 * k for k in range(7)], seconds=15)
+    reference = analyze_video(video, adaptive=adaptive, queue_size=0)
+    out = analyze_video_parallel(video, workers=3, adaptive=adaptive, queue_size=0)
+    reference.pop('analysis_sec')
+    out.pop('analysis_sec')
+    assert out == reference
+
+
+def test_segment_parallel_series_matches_sequential(eye_video, process_pool, tmp_path):
+    video = eye_video([1.0, 3.5, 6.0], seconds=10)
+    seq_store, par_store = OpennessStore(tmp_path / 'seq'), OpennessStore(tmp_path / 'par')
+    analyze_video(video, store=seq_store, queue_size=0)
+    analyze_video_parallel(video, workers=3, store=par_store, queue_size=0)
+    assert np.array_equal(seq_store.load(video.name), par_store.load(video.name))
+
+
+def test_adaptive_series_is_partial_and_backfilled(eye_video, tmp_path):
+    # A 12 s inter-blink interval settles Dry Eye Risk at 14 s of 20.
+    video = eye_video([1.0, 2.0, 14.0], seconds=20)
+    store = OpennessStore(tmp_path / 'series')
+    out = analyze_video(video, store=store, adaptive=True, queue_size=0)
+    assert out['stop_reason'] == 'decided_risk'
+    meta = store.meta(video.name)
+    assert meta['stop_reason'] == 'decided_risk' and meta['frames'] < meta['frames_expected']
+    assert store.is_partial(video.name)
+
+    retune_dryeye.backfill(store, video.parent)
+    assert not store.is_partial(video.name)
+    assert np.array_equal(store.load(video.name), openness_series(video).astype(np.float32))
+
+
+@pytest.mark.parametrize('width,height', [(100, 60), (224, 126), (320, 180), (448, 252), (1344, 756), (1345, 757)])
+def test_normalize_roi_fixed_width(width, height):
+    roi = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    gray = normalize_roi(roi)
+    assert gray.ndim == 2 and gray.dtype == np.uint8
+    assert gray.shape[1] == blink_analysis.ROI_WORK_WIDTH
+    assert abs(gray.shape[0] - height * blink_analysis.ROI_WORK_WIDTH / width) <= 1
+
+
+@pytest.mark.parametrize('size', [(640, 360), (1280, 720), (1920, 1080), (3840, 2160)])
+def test_openness_is_resolution_independent(size):
+    # The same eye recorded at any resolution scores like the 720p recording.
+    ref_open, ref_closed = (openness_metric(frame_roi(f)) for f in eye_frames((1280, 720)))
+    open_m, closed_m = (openness_metric(frame_roi(f)) for f in eye_frames(size))
+    assert open_m == pytest.approx(ref_open, rel=0.1)
+    assert closed_m / open_m == pytest.approx(ref_closed / ref_open, abs=0.05)
+    assert closed_m / open_m < blink_analysis.THRESH_K
+
+
+def test_blinks_do_not_depend_on_resolution(eye_video):
+    blinks = [0.8 + 2.7 * k for k in range(5)]
+    outs = [analyze_video(eye_video(blinks, seconds=14, size=size, name=f'eye_{size[1]}.mp4'), queue_size=0)
+            for size in ((640, 360), (1280, 720))]
+    assert outs[0]['blink_count'] == outs[1]['blink_count'] == len(blinks)
+    assert outs[0]['label'] == outs[1]['label']
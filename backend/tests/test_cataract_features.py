@@ -0,0 +1,95 @@
+"""ROI-first cataract metrics (CataractMetricEngine) vs the full-frame reference pipeline."""
+
+import cv2
+import numpy as np
+import pytest
+
+from cataract_features import (
+    BLUR_KSIZE,
+    CLAHE_CLIP_LIMIT,
+    CLAHE_TILE_GRID,
+    CataractMetricEngine,
+    RoiStatsIndex,
+    center_roi_rect,
+    preprocess_gray,
+    reference_metrics,
+    roi_grid,
+    roi_metrics,
+)
+
+# Relative tolerance on (contrast, sharpness, edge); see the cataract_features docstring.
+METRIC_REL_TOLERANCE = 5e-3
+
+
+def _eye_like_frame(h, w, seed):
+    """Smooth shading + iris-like disc + sensor noise, at an arbitrary (non tile-aligned) size."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 255, (h // 16 + 2, w // 16 + 2, 3), dtype=np.uint8)
+    frame = cv2.resize(base, (w, h), interpolation=cv2.INTER_CUBIC)
+    cv2.circle(frame, (w // 2 + int(rng.integers(-w // 10, w // 10 + 1)), h // 2), min(h, w) // 6, (60, 50, 40), -1)
+    return cv2.add(frame, rng.integers(0, 12, (h, w, 3), dtype=np.uint8))
+
+
+def _reference_roi(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID).apply(gray)
+    gray = cv2.GaussianBlur(gray, BLUR_KSIZE, 0)
+    x, y, rw, rh = center_roi_rect(gray.shape)
+    return gray[y:y + rh, x:x + rw]
+
+
+SIZES = [(480, 640), (481, 643), (720, 1280), (1000, 750), (1537, 2049), (64, 96), (3000, 4000)]
+
+
+@pytest.mark.parametrize('h,w', SIZES)
+@pytest.mark.parametrize('seed', range(3))
+def test_engine_matches_reference(h, w, seed):
+    frame = _eye_like_frame(h, w, seed)
+    engine = CataractMetricEngine()
+
+    roi = engine.preprocess_roi(frame)
+    reference_roi = _reference_roi(frame)
+    assert roi.shape == reference_roi.shape
+    diff = np.abs(roi.astype(np.int16) - reference_roi)
+    assert diff.max() <= 1
+    assert (diff > 0).mean() <= 0.02
+
+    for ref, new in zip(reference_metrics(frame), engine.compute(frame)):
+        assert abs(new - ref) <= METRIC_REL_TOLERANCE * max(abs(ref), 1e-9)
+
+
+def test_tiny_frame_falls_back_to_reference():
+    frame = _eye_like_frame(12, 10, 0)
+    assert CataractMetricEngine().compute(frame) == reference_metrics(frame)
+
+
+def _roi_positions(h, w):
+    """Interior, edge and corner rectangles, plus strips thinner than the 3 px filter support."""
+    rw, rh = w // 3, h // 4
+    cx, cy = (w - rw) // 2, (h - rh) // 2
+    return [
+        (cx, cy, rw, rh),
+        # edges
+        (0, cy, rw, rh), (w - rw, cy, rw, rh), (cx, 0, rw, rh), (cx, h - rh, rw, rh),
+        # corners
+        (0, 0, rw, rh), (w - rw, 0, rw, rh), (0, h - rh, rw, rh), (w - rw, h - rh, rw, rh),
+        (0, 0, w, h),
+        # minimal and thin
+        (5, 7, 3, 3), (w - 2, 3, 2, rh), (4, h - 1, rw, 1),
+    ]
+
+
+@pytest.mark.parametrize('h,w', [(480, 640), (481, 643), (64, 96)])
+@pytest.mark.parametrize('seed', range(3))
+def test_roi_stats_index_matches_per_roi_metrics(h, w, seed):
+    gray = preprocess_gray(_eye_like_frame(h, w, seed))
+    rects = _roi_positions(h, w) + [tuple(r) for r in roi_grid(gray.shape)[0]]
+    stats = RoiStatsIndex(gray).stats(rects)
+    for i, (x, y, rw, rh) in enumerate(rects):
+        roi = gray[y:y + rh, x:x + rw]
+        expected = roi_metrics(roi)
+        # Same pixels and filter responses; only summation order and float32 rounding differ.
+        assert stats['contrast'][i] == pytest.approx(expected[0], rel=1e-9, abs=1e-9)
+        assert stats['sharpness'][i] == pytest.approx(expected[1], rel=1e-9, abs=1e-9)
+        assert stats['edge'][i] == pytest.approx(expected[2], rel=1e-6, abs=1e-9)
+        assert stats['mean'][i] == pytest.approx(roi.mean(dtype=np.float64), rel=1e-12)
@@ -0,0 +1,82 @@
+"""Cataract inference backends: TFLite / ONNX Runtime must match Keras within tolerance.
+
+Builds a tiny MobileNet-shaped classifier in a temp artifacts dir, exports it
+the same way export_cataract_model.py does and compares the engines on random
+inputs. Skipped when TensorFlow (or the engine's exporter/runtime) is missing.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from cataract_inference import (
+    IMG_SIZE,
+    MODEL_BASENAME,
+    LABELS_FILENAME,
+    KerasBackend,
+    create_backend,
+    load_class_names,
+    probs_to_prediction,
+)
+
+tf = pytest.importorskip('tensorflow')
+
+import export_cataract_model  # noqa: E402  (imports TensorFlow helpers lazily)
+from export_cataract_model import CONF_TOLERANCE, PROB_TOLERANCE  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def artifacts(tmp_path_factory):
+    out = tmp_path_factory.mktemp('artifacts')
+    (out / LABELS_FILENAME).write_text(json.dumps({'class_names': ['cataract', 'normal']}), encoding='utf-8')
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(IMG_SIZE[1], IMG_SIZE[0], 3)),
+        tf.keras.layers.Rescaling(1.0 / 127.5, offset=-1.0),
+        tf.keras.layers.Conv2D(8, 3, strides=4, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(2, activation='softmax'),
+    ])
+    model.save(str(out / f'{MODEL_BASENAME}.h5'))
+    return out, model
+
+
+@pytest.fixture(scope='module')
+def inputs():
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 255, size=(6, IMG_SIZE[1], IMG_SIZE[0], 3)).astype(np.float32)
+
+
+def _export(fmt, model, artifacts_dir):
+    path = artifacts_dir / f'{MODEL_BASENAME}.{fmt}'
+    if fmt == 'tflite':
+        export_cataract_model.export_tflite(model, path)
+    else:
+        pytest.importorskip('tf2onnx')
+        pytest.importorskip('onnxruntime')
+        export_cataract_model.export_onnx(model, path)
+
+
+@pytest.mark.parametrize('fmt', ['tflite', 'onnx'])
+def test_backend_matches_keras(fmt, artifacts, inputs):
+    artifacts_dir, model = artifacts
+    _export(fmt, model, artifacts_dir)
+    class_names = load_class_names(artifacts_dir)
+
+    reference = KerasBackend(artifacts_dir)
+    reference.load()
+    engine = create_backend(fmt, artifacts_dir)
+    engine.load()
+
+    # Odd batch sizes exercise the TFLite tensor resize path.
+    for x in (inputs, inputs[:1], inputs[:3]):
+        ref_probs = reference.predict_batch(x)
+        probs = engine.predict_batch(x)
+        assert probs.shape == ref_probs.shape
+        assert np.max(np.abs(probs - ref_probs)) <= PROB_TOLERANCE
+        for ref_row, row in zip(ref_probs, probs):
+            ref_label, ref_conf, _ = probs_to_prediction(ref_row, class_names)
+            label, conf, _ = probs_to_prediction(row, class_names)
+            assert label == ref_label
+            assert abs(conf - ref_conf) <= CONF_TOLERANCE
@@ -0,0 +1,23 @@
+"""Bulk cataract re-scoring against databases the app has not migrated yet."""
+
+import sqlite3
+
+from rescore_cataract_uploads import ensure_model_version_column, iter_rows
+
+
+def test_old_database_gets_model_version_column(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.execute('''CREATE TABLE cataract_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id INTEGER NOT NULL,
+        image_file TEXT, label TEXT, confidence REAL)''')
+    conn.executemany('INSERT INTO cataract_results (patient_id, image_file, label) VALUES (1, ?, ?)',
+                     [('a.jpg', 'Normal'), ('b.jpg', 'Possible Cataract Risk')])
+    conn.commit()
+
+    ensure_model_version_column(conn)
+    ensure_model_version_column(conn)  # idempotent
+    assert [row[0] for row in iter_rows(conn, 0, 'v1', only_stale=True)] == [1, 2]
+
+    conn.execute("UPDATE cataract_results SET model_version = 'v1' WHERE id = 1")
+    assert [row[0] for row in iter_rows(conn, 0, 'v1', only_stale=True)] == [2]
+    conn.close()
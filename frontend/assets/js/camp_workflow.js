@@ -311,6 +311,21 @@ function handleDryeyeVideoSelect(e) {
     submitBtn.disabled = false;
 }
 
+// The dry eye upload answers 202 + job_id; poll until the background analysis finishes.
+async function waitForDryeyeJob(jobId) {
+    while (true) {
+        const response = await fetch(`${API_BASE}/dryeye/jobs/${jobId}`);
+        const job = await response.json();
+        if (job.state === 'done') {
+            return { success: true, ...job.result };
+        }
+        if (job.state === 'failed' || !job.success) {
+            return { success: false, message: job.error || job.message };
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function handleDryeyeSubmit() {
     const fileInput = document.getElementById('dryeyeVideo');
     const file = fileInput.files[0];
@@ -338,7 +353,10 @@ async function handleDryeyeSubmit() {
             body: formData
         });
         
-        const data = await response.json();
+        let data = await response.json();
+        if (data.success && data.job_id && !data.analysis) {
+            data = await waitForDryeyeJob(data.job_id);
+        }
         
         if (data.success) {
             screeningResults.dryeye = data.analysis;
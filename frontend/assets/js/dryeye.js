@@ -80,6 +80,7 @@ document.addEventListener('DOMContentLoaded', function() {
             body: formData
         })
             .then(response => response.json())
+            .then(data => (data.success && data.job_id && !data.analysis) ? waitForDryeyeJob(data.job_id) : data)
             .then(data => {
                 if (data.success) {
                     displayResults(data.analysis);
@@ -98,6 +99,27 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
+    // The upload answers 202 + job_id; poll until the background analysis finishes.
+    function waitForDryeyeJob(jobId) {
+        return new Promise((resolve, reject) => {
+            const poll = () => {
+                fetch(`${API_BASE}/dryeye/jobs/${jobId}`)
+                    .then(response => response.json())
+                    .then(job => {
+                        if (job.state === 'done') {
+                            resolve({ success: true, ...job.result });
+                        } else if (job.state === 'failed' || !job.success) {
+                            resolve({ success: false, message: job.error || job.message });
+                        } else {
+                            setTimeout(poll, 1000);
+                        }
+                    })
+                    .catch(reject);
+            };
+            poll();
+        });
+    }
+
     function displayResults(data) {
         const riskLabel = document.getElementById('riskLabel');
         const riskAlert = document.getElementById('riskAlert');